@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_headers
+~~~~~~~~~~~~~~~~~~~
+
+Benchmarks the work that hyper and its users do with the headers of every
+response, comparing HTTPHeaderMap and FrozenHTTPHeaderMap with the
+list-scanning implementation that HTTPHeaderMap replaced.
+
+Run with ``python bench/bench_headers.py``.
+"""
+from __future__ import print_function
+
+import timeit
+
+from hyper.common.headers import (
+    HTTPHeaderMap, FrozenHTTPHeaderMap, canonical_form
+)
+from hyper.common.util import to_bytestring, to_bytestring_tuple
+
+
+class ScanningHeaderMap(HTTPHeaderMap):
+    """
+    HTTPHeaderMap as it was before it grew an index: every lookup scans and
+    lower-cases every header, iterating splits every header into canonical
+    form again, and the length is found by iterating.
+    """
+    def __init__(self, *args, **kwargs):
+        self._items = []
+
+        for arg in args:
+            self._items.extend(map(lambda x: to_bytestring_tuple(*x), arg))
+
+        for k, v in kwargs.items():
+            self._items.append(to_bytestring_tuple(k, v))
+
+    def __getitem__(self, key):
+        key = to_bytestring(key)
+        values = []
+
+        for k, v in self._items:
+            if k.lower() == key.lower():
+                values.extend(x[1] for x in canonical_form(k, v))
+
+        if not values:
+            raise KeyError("Nonexistent header key: {}".format(key))
+
+        return values
+
+    def __iter__(self):
+        for pair in self._items:
+            for value in canonical_form(*pair):
+                yield value
+
+    def __len__(self):
+        size = 0
+        for _ in self:
+            size += 1
+
+        return size
+
+    def __contains__(self, key):
+        key = to_bytestring(key)
+        return any(key.lower() == k.lower() for k, _ in self._items)
+
+
+def response_headers(extra=0):
+    """
+    A plausible set of response headers, plus ``extra`` custom ones.
+    """
+    headers = [
+        (b':status', b'200'),
+        (b'Date', b'Mon, 01 Jan 2018 00:00:00 GMT'),
+        (b'Content-Type', b'text/html; charset=utf-8'),
+        (b'Content-Length', b'52341'),
+        (b'Cache-Control', b'private, max-age=0'),
+        (b'Expires', b'-1'),
+        (b'Server', b'bench'),
+        (b'Vary', b'Accept-Encoding, Cookie'),
+        (b'Set-Cookie', b'a=1; expires=Tue, 02 Jan 2018 00:00:00 GMT'),
+        (b'Set-Cookie', b'b=2; path=/'),
+        (b'Strict-Transport-Security', b'max-age=31536000'),
+        (b'X-Frame-Options', b'SAMEORIGIN'),
+        (b'X-Content-Type-Options', b'nosniff'),
+        (b'Content-Security-Policy', b"default-src 'self'; img-src *"),
+        (b'Alt-Svc', b'h2=":443"; ma=2592000'),
+    ]
+    headers.extend(
+        (('X-Custom-%d' % i).encode('ascii'), b'value')
+        for i in range(extra)
+    )
+    return headers
+
+
+def build(cls, headers):
+    """
+    Builds a header map, as is done for every response.
+    """
+    return cls(headers)
+
+
+def lookups(h):
+    """
+    The lookups made against the headers of a typical response.
+    """
+    h.get(b'content-encoding')
+    h.get(b'transfer-encoding')
+    h.get(b'content-length')
+    b'connection' in h
+    len(h)
+
+
+def iterate(h):
+    """
+    Reading all of the headers, as the CLI and logging do, a few times over.
+    """
+    for _ in range(3):
+        list(h.items())
+
+
+def main():
+    number = 10000
+    classes = (ScanningHeaderMap, HTTPHeaderMap, FrozenHTTPHeaderMap)
+
+    print("%-28s %12s %12s %12s" % ('case', 'scanning', 'indexed', 'frozen'))
+    for extra in (0, 50, 200):
+        headers = response_headers(extra)
+        maps = [cls(headers) for cls in classes]
+        cases = [
+            ('build, %d headers', lambda h: build(type(h), headers)),
+            ('lookups, %d headers', lookups),
+            ('iterate, %d headers', iterate),
+        ]
+
+        for name, case in cases:
+            results = []
+            for h in maps:
+                timer = timeit.Timer(lambda: case(h))
+                best = min(timer.repeat(repeat=3, number=number))
+                results.append(best / number * 1e6)
+
+            print("%-28s %10.2fus %10.2fus %10.2fus" % (
+                (name % len(headers),) + tuple(results)
+            ))
+
+
+if __name__ == '__main__':
+    main()
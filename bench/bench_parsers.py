@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_parsers
+~~~~~~~~~~~~~~~~~~~
+
+Benchmarks the HTTP/1.1 parser backends that are installed, parsing recorded
+response heads whole, and as they arrive when split across several reads.
+
+Run with ``python bench/bench_parsers.py``.
+"""
+from __future__ import print_function
+
+import timeit
+
+from hyper.http11.parser import available_backends, get_backend
+
+
+#: Recorded response heads, from small to large.
+RESPONSES = [
+    ('minimal', (
+        b'HTTP/1.1 204 No Content\r\n'
+        b'Date: Mon, 01 Jan 2018 00:00:00 GMT\r\n'
+        b'Server: nginx\r\n'
+        b'\r\n'
+    )),
+    ('api', (
+        b'HTTP/1.1 200 OK\r\n'
+        b'Date: Mon, 01 Jan 2018 00:00:00 GMT\r\n'
+        b'Content-Type: application/json; charset=utf-8\r\n'
+        b'Content-Length: 1523\r\n'
+        b'Connection: keep-alive\r\n'
+        b'Cache-Control: no-cache\r\n'
+        b'X-Request-Id: 5d8e3f2a-1b7c-4e9d-a6f0-2c3b4d5e6f70\r\n'
+        b'X-RateLimit-Limit: 5000\r\n'
+        b'X-RateLimit-Remaining: 4999\r\n'
+        b'X-RateLimit-Reset: 1514768400\r\n'
+        b'Vary: Accept-Encoding\r\n'
+        b'\r\n'
+    )),
+    ('browser', (
+        b'HTTP/1.1 200 OK\r\n'
+        b'Date: Mon, 01 Jan 2018 00:00:00 GMT\r\n'
+        b'Content-Type: text/html; charset=utf-8\r\n'
+        b'Transfer-Encoding: chunked\r\n'
+        b'Connection: keep-alive\r\n'
+        b'Cache-Control: private, max-age=0\r\n'
+        b'Expires: -1\r\n'
+        b'Server: bench\r\n'
+        b'Vary: Accept-Encoding, Cookie\r\n'
+        b'Set-Cookie: session=' + b'a' * 200 + b'; path=/; HttpOnly\r\n'
+        b'Set-Cookie: prefs=' + b'b' * 100 + b'; path=/\r\n'
+        b'Set-Cookie: tracking=' + b'c' * 300 + b'; Domain=.example.com\r\n'
+        b'Strict-Transport-Security: max-age=31536000\r\n'
+        b'X-Frame-Options: SAMEORIGIN\r\n'
+        b'X-Content-Type-Options: nosniff\r\n'
+        b'X-XSS-Protection: 1; mode=block\r\n'
+        b'Content-Security-Policy: default-src \'self\'; img-src *; '
+        b'script-src \'self\' https://cdn.example.com\r\n'
+        b'Alt-Svc: h2=":443"; ma=2592000\r\n'
+        b'Link: </style.css>; rel=preload; as=style, '
+        b'</app.js>; rel=preload; as=script\r\n'
+        b'\r\n'
+    )),
+]
+
+
+def parse_whole(parser, head):
+    """
+    Parses a response head that arrived in a single read.
+    """
+    parser.parse_response(memoryview(head))
+
+
+def parse_split(parser, head, reads=8):
+    """
+    Parses a response head that arrived over ``reads`` reads, as
+    HTTP11Connection does: every read appends to the buffer and the parser
+    is called again with all of it.
+    """
+    size = len(head) // reads + 1
+    for end in range(size, len(head), size):
+        parser.parse_response(memoryview(head[:end]))
+
+    parser.parse_response(memoryview(head))
+
+
+def main():
+    number = 10000
+    backends = available_backends()
+
+    print("%-28s" % 'case' + "".join("%16s" % name for name in backends))
+    for name, head in RESPONSES:
+        cases = [
+            ('%s, %d bytes' % (name, len(head)), parse_whole),
+            ('%s, 8 reads' % name, parse_split),
+        ]
+
+        for case_name, case in cases:
+            results = []
+            for backend in backends:
+                parser = get_backend(backend)[1]()
+                timer = timeit.Timer(lambda: case(parser, head))
+                best = min(timer.repeat(repeat=3, number=number))
+                results.append(best / number * 1e6)
+
+            print("%-28s" % case_name + "".join(
+                "%14.2fus" % result for result in results
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+bench/bench_stream
+~~~~~~~~~~~~~~~~~~
+
+Benchmarks reading a 1GB HTTP/2 response body in 16kB pieces, comparing the
+deque-based stream buffering with the list-based buffering it replaced.
+
+The DATA frames are handed straight to the stream, a batch at a time, as the
+connection would hand them over after each read from the socket. This leaves
+out the cost of parsing the frames, which is the same for both.
+
+Run with ``python bench/bench_stream.py``. Pass a size in MB to read a
+different amount of data.
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from hyper.common.headers import HTTPHeaderMap
+from hyper.http20.response import HTTP20Response
+from hyper.http20.stream import Stream
+from hyper.http20.window import BaseFlowControlManager
+
+# The size of the pieces the body is read in.
+READ_SIZE = 16384
+
+# The number of DATA frames that arrive with each read from the socket: about
+# a megabyte, as much as a large flow control window lets in at once.
+FRAMES_PER_READ = 64
+
+
+class DataEvent(object):
+    """
+    Stands in for the h2 event for a received DATA frame.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.flow_controlled_length = len(data)
+
+
+class NoCreditManager(BaseFlowControlManager):
+    """
+    A window manager that never sends WINDOWUPDATE frames, as there is no
+    connection for them to go to.
+    """
+    def increase_window_size(self, frame_size):
+        return 0
+
+
+class ListStream(Stream):
+    """
+    Stream as it was before its data was kept in a deque: reads wait until
+    enough data has arrived by summing the length of every chunk, and then
+    return all of it.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ListStream, self).__init__(*args, **kwargs)
+        self.data = []
+
+    def _read(self, amt=None):
+        def listlen(list):
+            return sum(map(len, list))
+
+        while (not self.remote_closed and
+                (amt is None or listlen(self.data) < amt)):
+            self._recv_cb(stream_id=self.stream_id)
+
+        data, self.data = list(self.data), []
+        return b''.join(data)
+
+    def _read_one_frame(self):
+        while not self.remote_closed and not self.data:
+            self._recv_cb(stream_id=self.stream_id)
+
+        try:
+            return self.data.pop(0)
+        except IndexError:
+            return None
+
+
+class ListResponse(HTTP20Response):
+    """
+    HTTP20Response as it was with ListStream, buffering the data read past
+    the amount asked for.
+    """
+    def _read_stream(self, amt):
+        if self._data_buffer:
+            read_amt = amt - len(self._data_buffer)
+            self._data_buffer += self._stream._read(read_amt)
+            return self._read_buffered(amt)
+
+        data = self._stream._read(amt)
+        if len(data) > amt:
+            self._data_buffer += memoryview(data)[amt:]
+            data = data[:amt]
+
+        return data
+
+
+def read_body(stream_class, response_class, body_size, frame_size):
+    """
+    Reads a body of ``body_size`` bytes, sent in frames of ``frame_size``
+    bytes, and returns how long it took.
+    """
+    frame = DataEvent(b'x' * frame_size)
+    frames = [body_size // frame_size]
+
+    def recv_cb(stream_id=0):
+        for _ in range(min(FRAMES_PER_READ, frames[0])):
+            stream.receive_data(frame)
+        frames[0] -= FRAMES_PER_READ
+        if frames[0] <= 0:
+            stream.remote_closed = True
+
+    stream = stream_class(
+        1, NoCreditManager(65535), None, None, recv_cb, lambda stream_id: None
+    )
+    stream.local_closed = True
+    response = response_class(HTTPHeaderMap([(b':status', b'200')]), stream)
+
+    start = time.time()
+    size = 0
+    while True:
+        data = response.read(READ_SIZE)
+        size += len(data)
+        if len(data) < READ_SIZE:
+            break
+
+    elapsed = time.time() - start
+    assert size == body_size // frame_size * frame_size
+    return elapsed
+
+
+def main():
+    body_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    body_size *= 1024 * 1024
+
+    print("%-28s %12s %12s" % ('case', 'list', 'deque'))
+    for frame_size in (16384, 10000):
+        results = []
+        for stream_class, response_class in ((ListStream, ListResponse),
+                                             (Stream, HTTP20Response)):
+            elapsed = read_body(
+                stream_class, response_class, body_size, frame_size
+            )
+            results.append(body_size / elapsed / 1024 / 1024)
+
+        print("%-28s %8.0fMB/s %8.0fMB/s" % (
+            ('%d byte frames' % frame_size,) + tuple(results)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ import logging
 
 from .common.connection import HTTPConnection
 from .http20.connection import HTTP20Connection
+from .http20.pool import HTTP20ConnectionPool, PoolManager
 from .http20.response import HTTP20Response, HTTP20Push
 from .http11.connection import HTTP11Connection
 from .http11.response import HTTP11Response
@@ -26,6 +27,8 @@ __all__ = [
     HTTP20Response,
     HTTP20Push,
     HTTP20Connection,
+    HTTP20ConnectionPool,
+    PoolManager,
     HTTP11Connection,
     HTTP11Response,
 ]
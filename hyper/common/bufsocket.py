@@ -10,10 +10,36 @@ allowing small reads from the network. This represents a potentially massive
 performance optimisation at the cost of burning some memory in the userspace
 process.
 """
+import errno
+import math
 import select
+import socket
 from .exceptions import ConnectionResetError, LineTooLongError
 
 
+# Not every platform supports MSG_DONTWAIT (notably Windows doesn't).
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)
+
+
+def _wait_for_read(sck, timeout):
+    """
+    Waits until the socket is readable, or ``timeout`` seconds have passed.
+    ``None`` waits forever, while zero returns immediately.
+
+    Where it's available this uses ``poll``, which unlike ``select`` copes
+    with file descriptors of any value.
+    """
+    if not hasattr(select, 'poll'):  # pragma: no cover
+        return bool(select.select([sck], [], [], timeout)[0])
+
+    poller = select.poll()
+    poller.register(sck, select.POLLIN)
+    if timeout is not None:
+        timeout = int(math.ceil(timeout * 1000))
+
+    return bool(poller.poll(timeout))
+
+
 class BufferedSocket(object):
     """
     A buffered socket wrapper.
@@ -23,7 +49,7 @@ class BufferedSocket(object):
     massive performance optimisation at the cost of burning some memory in the
     userspace process.
     """
-    def __init__(self, sck, buffer_size=1000):
+    def __init__(self, sck, buffer_size=1000, max_buffer_size=None):
         """
         Create the buffered socket.
 
@@ -32,11 +58,22 @@ class BufferedSocket(object):
             parameter should be set to an appropriate value for your use case.
             Small values of ``buffer_size`` increase the overhead of buffer
             management: large values cause more memory to be used.
+        :param max_buffer_size: (optional) The size in bytes that the backing
+            buffer may temporarily grow to when it fills up with data that
+            can't yet be consumed, such as a very long line. Once that data
+            has been consumed the buffer shrinks back to ``buffer_size``.
+            Defaults to ``buffer_size``, meaning the buffer never grows.
         """
         # The wrapped socket.
         self._sck = sck
 
-        # The buffer we're using.
+        # The size the buffer is created with and returns to, and the largest
+        # size it may grow to.
+        self._initial_buffer_size = buffer_size
+        self._max_buffer_size = max(buffer_size, max_buffer_size or 0)
+
+        # The buffer we're using. This is allocated once: when we run out of
+        # room at the end of it, the unread data is moved back to the start.
         self._backing_buffer = bytearray(buffer_size)
         self._buffer_view = memoryview(self._backing_buffer)
 
@@ -63,16 +100,48 @@ class BufferedSocket(object):
         """
         return self._index + self._bytes_in_buffer
 
+    @property
+    def _free_space(self):
+        """
+        The number of bytes that can be read into the buffer before it needs
+        to be compacted.
+        """
+        return self._buffer_size - self._buffer_end
+
     @property
     def can_read(self):
         """
         Whether or not there is more data to read from the socket.
         """
-        read = select.select([self._sck], [], [], 0)[0]
-        if read:
+        return self._tls_pending or _wait_for_read(self._sck, 0)
+
+    @property
+    def _tls_pending(self):
+        """
+        Whether a TLS socket is holding decrypted data. The OS can't see this
+        data, so it doesn't show up in ``poll`` or ``select``.
+        """
+        pending = getattr(self._sck, 'pending', None)
+        return pending is not None and pending() > 0
+
+    def wait_readable(self, timeout=None, buffered=True):
+        """
+        Blocks until there is data to read, either already buffered or on the
+        socket, or until ``timeout`` seconds have passed.
+
+        :param timeout: (optional) The maximum time to wait, in seconds. If
+            ``None``, waits indefinitely.
+        :param buffered: (optional) Whether data that's already in the buffer
+            counts. If ``False``, only waits for data from the socket, for
+            callers that leave incomplete data in the buffer until more
+            arrives.
+        :returns: ``True`` if data can be read, ``False`` if the wait timed
+            out.
+        """
+        if (buffered and self._bytes_in_buffer) or self._tls_pending:
             return True
 
-        return False
+        return _wait_for_read(self._sck, timeout)
 
     @property
     def buffer(self):
@@ -90,22 +159,54 @@ class BufferedSocket(object):
 
     def new_buffer(self):
         """
-        This method moves all the data in the backing buffer to the start of
-        a new, fresh buffer. This gives the ability to read much more data.
+        This method moves all the unread data in the buffer to the start of
+        the backing buffer. This gives the ability to read much more data.
+
+        The backing buffer is reused rather than reallocated, and only the
+        unread bytes are moved: if there are none, nothing is copied at all.
+        As a result, any ``memoryview`` previously returned by this object is
+        invalidated.
+        """
+        # If the buffer grew to hold a large message and that message has
+        # been consumed, this is our chance to give the memory back.
+        if (not self._bytes_in_buffer and
+                self._buffer_size > self._initial_buffer_size):
+            self._resize(self._initial_buffer_size)
+        elif self._index and self._bytes_in_buffer:
+            end = self._buffer_end
+            self._buffer_view[0:self._bytes_in_buffer] = (
+                self._buffer_view[self._index:end]
+            )
+
+        self._index = 0
+
+        return
+
+    def _grow(self):
+        """
+        Doubles the size of the buffer, up to the maximum size, to make room
+        for more data when it's full of data that can't yet be consumed.
+
+        :raises LineTooLongError: If the buffer is already at its maximum
+            size.
         """
-        def read_all_from_buffer():
-            end = self._index + self._bytes_in_buffer
-            return self._buffer_view[self._index:end]
+        if self._buffer_size >= self._max_buffer_size:
+            raise LineTooLongError()
+
+        self._resize(min(self._buffer_size * 2, self._max_buffer_size))
 
-        new_buffer = bytearray(self._buffer_size)
+    def _resize(self, size):
+        """
+        Moves the unread data into a new backing buffer of ``size`` bytes.
+        """
+        new_buffer = bytearray(size)
         new_buffer_view = memoryview(new_buffer)
-        new_buffer_view[0:self._bytes_in_buffer] = read_all_from_buffer()
+        new_buffer_view[0:self._bytes_in_buffer] = self.buffer
 
         self._index = 0
         self._backing_buffer = new_buffer
         self._buffer_view = new_buffer_view
-
-        return
+        self._buffer_size = size
 
     def recv(self, amt):
         """
@@ -123,22 +224,19 @@ class BufferedSocket(object):
 
         # If the amount of data we've been asked to read is less than the
         # remaining space in the buffer, we need to clear out the buffer and
-        # start over.
-        if amt > self._remaining_capacity:
+        # start over. If the buffer is empty doing so is free, so we always
+        # do it to get the most out of the next read.
+        if amt > self._remaining_capacity or not self._bytes_in_buffer:
             self.new_buffer()
 
         # If there's still some room in the buffer, opportunistically attempt
         # to read into it.
         # If we don't actually _need_ the data (i.e. there's enough in the
-        # buffer to satisfy the request), use select to work out if the read
-        # attempt will block. If it will, don't bother reading. If we need the
-        # data, always do the read.
+        # buffer to satisfy the request), only read what can be had without
+        # blocking. If we need the data, always do the read.
         if self._bytes_in_buffer >= amt:
-            should_read = select.select([self._sck], [], [], 0)[0]
+            self._recv_nowait()
         else:
-            should_read = True
-
-        if should_read:
             count = self._sck.recv_into(self._buffer_view[self._buffer_end:])
 
             # The socket just got closed. We should throw an exception if we
@@ -156,26 +254,107 @@ class BufferedSocket(object):
 
         return data
 
-    def fill(self):
+    def recv_into(self, buffer):
+        """
+        Read some data from the socket into a buffer.
+
+        If our buffer holds any data, only that is copied out. Otherwise,
+        buffers at least as large as ours are read into directly from the
+        socket, so large reads don't pass through our buffer.
+
+        :param buffer: A writable bytes-like object, such as a ``bytearray``.
+        :returns: The number of bytes read into ``buffer``.
+        """
+        view = memoryview(buffer)
+        amt = len(view)
+        if not amt:
+            return 0
+
+        if self._bytes_in_buffer:
+            amt = min(amt, self._bytes_in_buffer)
+
+        if self._bytes_in_buffer or amt < self._buffer_size:
+            data = self.recv(amt)
+            view[:len(data)] = data
+            return len(data)
+
+        count = self._sck.recv_into(view)
+        if not count:
+            raise ConnectionResetError()
+
+        return count
+
+    def fill(self, block=True):
         """
         Attempts to fill the buffer as much as possible. It will block for at
         most the time required to have *one* ``recv_into`` call return.
+
+        :param block: (optional) If ``False``, only reads data that is already
+            available, returning immediately if there is none.
+        :returns: The number of bytes read into the buffer.
         """
-        if not self._remaining_capacity:
+        # Compact the buffer when it's empty, which is free, or when doing so
+        # would at least double the space there is to read into.
+        if not self._bytes_in_buffer or self._index > self._free_space:
             self.new_buffer()
 
+        # If the buffer is full, the caller hasn't been able to consume any of
+        # it yet (e.g. it's a response head that isn't complete), so we need
+        # more room.
+        if not self._free_space:
+            self._grow()
+
+        if not block:
+            count = self._recv_nowait()
+            if count == 0:
+                raise ConnectionResetError()
+            return count or 0
+
         count = self._sck.recv_into(self._buffer_view[self._buffer_end:])
         if not count:
             raise ConnectionResetError()
 
         self._bytes_in_buffer += count
 
-        return
+        return count
+
+    def _recv_nowait(self):
+        """
+        Reads whatever data is available into the free space in the buffer,
+        without blocking.
+
+        Plain sockets without a timeout are read with a single non-blocking
+        ``recv_into``. Other sockets are polled first: TLS sockets don't
+        accept flags, and Python polls sockets that have a timeout before it
+        reads from them, whatever flags are passed.
+
+        :returns: The number of bytes read, which is zero if the remote peer
+            has closed the connection, or ``None`` if no data was available.
+        """
+        view = self._buffer_view[self._buffer_end:]
+        tls = hasattr(self._sck, 'pending')
+
+        if _MSG_DONTWAIT and not tls and self._sck.gettimeout() is None:
+            try:
+                count = self._sck.recv_into(view, 0, _MSG_DONTWAIT)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return None
+                raise
+        elif self.can_read:
+            count = self._sck.recv_into(view)
+        else:
+            return None
+
+        if count:
+            self._bytes_in_buffer += count
+
+        return count
 
     def readline(self):
         """
         Read up to a newline from the network and returns it. The implicit
-        maximum line length is the buffer size of the buffered socket.
+        maximum line length is the maximum buffer size of the buffered socket.
 
         Note that, unlike recv, this method absolutely *does* block until it
         can read the line.
@@ -207,7 +386,12 @@ class BufferedSocket(object):
         if self._index != 0:
             self.new_buffer()
 
-        while self._bytes_in_buffer < self._buffer_size:
+        while True:
+            # If we filled the buffer without ever getting a newline, make
+            # room for more. If we can't, it's time to throw an exception.
+            if not self._free_space:
+                self._grow()
+
             count = self._sck.recv_into(self._buffer_view[self._buffer_end:])
             if not count:
                 raise ConnectionResetError()
@@ -232,9 +416,5 @@ class BufferedSocket(object):
                 self._bytes_in_buffer -= length
                 return data
 
-        # If we got here, it means we filled the buffer without ever getting
-        # a newline. Time to throw an exception.
-        raise LineTooLongError()
-
     def __getattr__(self, name):
         return getattr(self._sck, name)
@@ -5,6 +5,8 @@ hyper/common/connection
 
 Hyper's HTTP/1.1 and HTTP/2 abstraction layer.
 """
+import threading
+
 from .exceptions import TLSUpgrade, HTTPUpgrade
 from ..http11.connection import HTTP11Connection
 from ..http20.connection import HTTP20Connection
@@ -85,6 +87,13 @@ class HTTPConnection(object):
             self._host, self._port, **self._h1_kwargs
         )
 
+        # Concurrency
+        #
+        # Use one lock (_upgrade_lock) to make the switch to HTTP/2 atomic.
+        # Once the backing connection is an HTTP20Connection it is never
+        # replaced, and requests go straight to it.
+        self._upgrade_lock = threading.Lock()
+
     def request(self, method, url, body=None, headers=None):
         """
         This will send a request to the server using the HTTP request method
@@ -105,28 +114,41 @@ class HTTPConnection(object):
 
         headers = headers or {}
 
-        try:
-            return self._conn.request(
+        conn = self._conn
+        if isinstance(conn, HTTP20Connection):
+            return conn.request(
                 method=method, url=url, body=body, headers=headers
             )
-        except TLSUpgrade as e:
-            # We upgraded in the NPN/ALPN handshake. We can just go straight to
-            # the world of HTTP/2. Replace the backing object and insert the
-            # socket into it.
-            assert e.negotiated in H2_NPN_PROTOCOLS
 
-            self._conn = HTTP20Connection(
-                self._host, self._port, **self._h2_kwargs
-            )
-            self._conn._sock = e.sock
-
-            # Because we skipped the connecting logic, we need to send the
-            # HTTP/2 preamble.
-            self._conn._send_preamble()
-
-            return self._conn.request(
-                method=method, url=url, body=body, headers=headers
-            )
+        # Concurrency
+        #
+        # Hold _upgrade_lock while the first request connects, so that
+        # requests made at the same time from other threads don't each open
+        # a connection and replace the backing object in turn.
+        with self._upgrade_lock:
+            try:
+                return self._conn.request(
+                    method=method, url=url, body=body, headers=headers
+                )
+            except TLSUpgrade as e:
+                # We upgraded in the NPN/ALPN handshake. We can just go
+                # straight to the world of HTTP/2. Replace the backing object
+                # and insert the socket into it.
+                assert e.negotiated in H2_NPN_PROTOCOLS
+
+                conn = HTTP20Connection(
+                    self._host, self._port, **self._h2_kwargs
+                )
+                conn._sock = e.sock
+
+                # Because we skipped the connecting logic, we need to send
+                # the HTTP/2 preamble.
+                conn._send_preamble()
+                self._conn = conn
+
+        return conn.request(
+            method=method, url=url, body=body, headers=headers
+        )
 
     def get_response(self, *args, **kwargs):
         """
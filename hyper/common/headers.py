@@ -42,10 +42,11 @@ class HTTPHeaderMap(collections.MutableMapping):
     unusual encodings) while ensuring that users are never confused about what
     type of data they will receive.
 
-    .. warning:: Note that this data structure makes none of the performance
-                 guarantees of a dictionary. Lookup and deletion is not an O(1)
-                 operation. Inserting a new value *is* O(1), all other
-                 operations are O(n), including *replacing* a header entirely.
+    .. warning:: Note that this data structure makes only some of the
+                 performance guarantees of a dictionary. Inserting a new
+                 value, lookup, membership tests and ``len()`` are O(1) in the
+                 number of headers, but deletion and *replacing* a header
+                 entirely are O(n).
     """
     def __init__(self, *args, **kwargs):
         # The meat of the structure. In practice, headers are an ordered list
@@ -63,11 +64,28 @@ class HTTPHeaderMap(collections.MutableMapping):
         # logic.
         self._items = []
 
+        # To avoid scanning the whole list on lookup, we also index the items
+        # by lower-cased header name. Each entry is the list of raw items with
+        # that name, in the order they appear in _items. We also keep count of
+        # the number of headers in canonical form, which is the length of the
+        # mapping.
+        self._index = {}
+        self._length = 0
+
+        # Splitting headers into canonical form is done lazily and the
+        # results are kept: _canonical holds the whole mapping in canonical
+        # form, and _values holds the canonical values for each lower-cased
+        # name that has been looked up. Any mutation discards the results that
+        # it affects.
+        self._canonical = None
+        self._values = {}
+
         for arg in args:
-            self._items.extend(map(lambda x: to_bytestring_tuple(*x), arg))
+            for item in arg:
+                self._append(to_bytestring_tuple(*item))
 
         for k, v in kwargs.items():
-            self._items.append(to_bytestring_tuple(k, v))
+            self._append(to_bytestring_tuple(k, v))
 
     def __getitem__(self, key):
         """
@@ -76,67 +94,70 @@ class HTTPHeaderMap(collections.MutableMapping):
         that comma-separated values are split into multiple values.
         """
         key = to_bytestring(key)
-        values = []
+        name = key.lower()
+        values = self._values.get(name)
 
-        for k, v in self._items:
-            if _keys_equal(k, key):
-                values.extend(x[1] for x in canonical_form(k, v))
+        if values is None:
+            items = self._index.get(name)
+            if not items:
+                raise KeyError("Nonexistent header key: {}".format(key))
 
-        if not values:
-            raise KeyError("Nonexistent header key: {}".format(key))
+            values = []
+            for k, v in items:
+                values.extend(x[1] for x in canonical_form(k, v))
+            self._values[name] = values
 
-        return values
+        # Hand out a copy, so that the cached values can't be changed.
+        return list(values)
 
     def __setitem__(self, key, value):
         """
         Unlike the dict __setitem__, this appends to the list of items.
         """
-        self._items.append(to_bytestring_tuple(key, value))
+        self._append(to_bytestring_tuple(key, value))
 
     def __delitem__(self, key):
         """
         Sadly, __delitem__ is kind of stupid here, but the best we can do is
-        delete all headers with a given key. To correctly achieve the 'KeyError
-        on missing key' logic from dictionaries, we need to do this slowly.
+        delete all headers with a given key.
         """
         key = to_bytestring(key)
-        indices = []
-        for (i, (k, v)) in enumerate(self._items):
-            if _keys_equal(k, key):
-                indices.append(i)
+        name = key.lower()
+        items = self._index.pop(name, None)
 
-        if not indices:
+        if not items:
             raise KeyError("Nonexistent header key: {}".format(key))
 
-        for i in indices[::-1]:
-            self._items.pop(i)
+        self._items = [i for i in self._items if i[0].lower() != name]
+        self._length -= sum(_canonical_length(*i) for i in items)
+        self._invalidate(name)
 
     def __iter__(self):
         """
         This mapping iterates like the list of tuples it is. The headers are
         returned in canonical form.
         """
-        for pair in self._items:
-            for value in canonical_form(*pair):
-                yield value
+        if self._canonical is None:
+            self._canonical = [
+                value
+                for pair in self._items
+                for value in canonical_form(*pair)
+            ]
+
+        return iter(self._canonical)
 
     def __len__(self):
         """
         The length of this mapping is the number of individual headers in
-        canonical form. Sadly, this is a somewhat expensive operation.
+        canonical form.
         """
-        size = 0
-        for _ in self:
-            size += 1
-
-        return size
+        return self._length
 
     def __contains__(self, key):
         """
         If any header is present with this key, returns True.
         """
-        key = to_bytestring(key)
-        return any(_keys_equal(key, k) for k, _ in self._items)
+        return to_bytestring(key).lower() in self._index
 
     def keys(self):
         """
@@ -188,24 +209,31 @@ class HTTPHeaderMap(collections.MutableMapping):
         existing headers with the same name.
         """
         key, value = to_bytestring_tuple(key, value)
-        indices = []
-        for (i, (k, v)) in enumerate(self._items):
-            if _keys_equal(k, key):
-                indices.append(i)
+        name = key.lower()
+        old_items = self._index.get(name)
 
         # If the key isn't present, this is easy: just append and abort early.
-        if not indices:
-            self._items.append((key, value))
+        if not old_items:
+            self._append((key, value))
             return
 
-        # Delete all but the first. I swear, this is the correct slicing
-        # syntax!
-        base_index = indices[0]
-        for i in indices[:0:-1]:
-            self._items.pop(i)
-
-        del self._items[base_index]
-        self._items.insert(base_index, (key, value))
+        # The new header takes the place of the first of the old ones: the
+        # rest are dropped.
+        new_item = (key, value)
+        items = []
+        for item in self._items:
+            if item[0].lower() != name:
+                items.append(item)
+            elif new_item is not None:
+                items.append(new_item)
+                new_item = None
+
+        self._items = items
+        self._index[name] = [(key, value)]
+        self._length += _canonical_length(key, value) - sum(
+            _canonical_length(*i) for i in old_items
+        )
+        self._invalidate(name)
 
     def merge(self, other):
         """
@@ -217,11 +245,36 @@ class HTTPHeaderMap(collections.MutableMapping):
             return
 
         if isinstance(other, HTTPHeaderMap):
-            self._items.extend(other.iter_raw())
+            for item in other.iter_raw():
+                self._append(item)
             return
 
         for k, v in other.items():
-            self._items.append(to_bytestring_tuple(k, v))
+            self._append(to_bytestring_tuple(k, v))
+
+    def _append(self, item):
+        """
+        Adds a raw ``(name, value)`` item to the end of the headers, keeping
+        the index up to date.
+        """
+        name = item[0].lower()
+        self._items.append(item)
+        self._index.setdefault(name, []).append(item)
+
+        if name in SPECIAL_SNOWFLAKES:
+            self._length += 1
+        else:
+            self._length += item[1].count(b',') + 1
+
+        self._invalidate(name)
+
+    def _invalidate(self, name):
+        """
+        Discards the canonical form of the headers, which has been cached, for
+        the mapping as a whole and for the lower-cased header ``name``.
+        """
+        self._canonical = None
+        self._values.pop(name, None)
 
     def __eq__(self, other):
         return self._items == other._items
@@ -236,14 +289,127 @@ class HTTPHeaderMap(collections.MutableMapping):
         return str(self)
 
 
+class FrozenHTTPHeaderMap(HTTPHeaderMap):
+    """
+    A read-only :class:`HTTPHeaderMap <hyper.common.headers.HTTPHeaderMap>`,
+    used for the headers of responses.
+
+    Because the headers can't change, their canonical form is only ever
+    computed once, no matter how many times they are looked up or iterated
+    over. Frozen header maps are also hashable.
+
+    Any attempt to modify the mapping raises ``TypeError``.
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("FrozenHTTPHeaderMap is read-only")
+
+    __setitem__ = __delitem__ = replace = merge = _read_only
+
+    def __hash__(self):
+        return hash(tuple(self._items))
+
+
+class LazyHTTPHeaderMap(FrozenHTTPHeaderMap):
+    """
+    A :class:`FrozenHTTPHeaderMap <hyper.common.headers.FrozenHTTPHeaderMap>`
+    built from the raw bytes of a HTTP/1.1 response head: a status line
+    followed by header lines, each ending in a newline.
+
+    The header lines aren't parsed up front. Looking up a single header
+    searches the raw head for it, so a response whose users only check one or
+    two headers never pays for parsing the rest. The head is only parsed in
+    full when something needs all of the headers, such as iteration or
+    ``len()``.
+    """
+    def __init__(self, head):
+        self._head = head
+        self._lower_head = None
+        self._canonical = None
+        self._values = {}
+
+    def __getattr__(self, name):
+        # The parsed form of the headers is only created when it's first
+        # needed. Until then, these attributes don't exist, and accessing any
+        # of them parses the head.
+        if name not in ('_items', '_index', '_length'):
+            raise AttributeError(name)
+
+        self._parse()
+        return self.__dict__[name]
+
+    def __getitem__(self, key):
+        if '_index' in self.__dict__:
+            return super(LazyHTTPHeaderMap, self).__getitem__(key)
+
+        key = to_bytestring(key)
+        name = key.lower()
+        values = self._values.get(name)
+
+        if values is None:
+            values = []
+            for value in self._find(name):
+                values.extend(x[1] for x in canonical_form(name, value))
+
+            if not values:
+                raise KeyError("Nonexistent header key: {}".format(key))
+            self._values[name] = values
+
+        return list(values)
+
+    def __contains__(self, key):
+        if '_index' in self.__dict__:
+            return super(LazyHTTPHeaderMap, self).__contains__(key)
+
+        name = to_bytestring(key).lower()
+        return name in self._values or bool(self._find(name))
+
+    def _find(self, name):
+        """
+        Finds the raw values of every header called ``name``, which must be in
+        lower case, without parsing the other headers.
+        """
+        if self._lower_head is None:
+            self._lower_head = self._head.lower()
+
+        needle = b'\n' + name + b':'
+        values = []
+        index = self._lower_head.find(needle)
+
+        while index != -1:
+            start = index + len(needle)
+            end = self._head.find(b'\n', start)
+            values.append(self._head[start:end].strip())
+            index = self._lower_head.find(needle, end)
+
+        return values
+
+    def _parse(self):
+        """
+        Parses all of the header lines in the head.
+        """
+        self._items = []
+        self._index = {}
+        self._length = 0
+
+        for line in self._head.split(b'\n')[1:]:
+            if not line.strip():
+                continue
+
+            name, value = line.split(b':', 1)
+            self._append((name, value.strip()))
+
+
+# Headers whose values may legitimately contain commas, and so must not be
+# split.
+SPECIAL_SNOWFLAKES = frozenset([b'set-cookie', b'set-cookie2'])
+
+
 def canonical_form(k, v):
     """
     Returns an iterable of key-value-pairs corresponding to the header in
     canonical form. This means that the header is split on commas unless for
     any reason it's a super-special snowflake (I'm looking at you Set-Cookie).
     """
-    SPECIAL_SNOWFLAKES = set([b'set-cookie', b'set-cookie2'])
-
     k = k.lower()
 
     if k in SPECIAL_SNOWFLAKES:
@@ -253,8 +419,12 @@ def canonical_form(k, v):
             yield k, sub_val.strip()
 
 
-def _keys_equal(x, y):
+def _canonical_length(k, v):
     """
-    Returns 'True' if the two keys are equal by the laws of HTTP headers.
+    Returns the number of key-value-pairs the header has in canonical form,
+    without building them.
     """
-    return x.lower() == y.lower()
+    if k.lower() in SPECIAL_SNOWFLAKES:
+        return 1
+
+    return v.count(b',') + 1
@@ -5,8 +5,15 @@ hyper/contrib
 
 Contains a few utilities for use with other HTTP libraries.
 """
+import logging
+import socket
+import threading
+import time
+
+from collections import OrderedDict
+
 try:
-    from requests.adapters import HTTPAdapter
+    from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
     from requests.models import Response
     from requests.structures import CaseInsensitiveDict
     from requests.utils import (
@@ -15,23 +22,65 @@ try:
     from requests.cookies import extract_cookies_to_jar
 except ImportError:  # pragma: no cover
     HTTPAdapter = object
+    DEFAULT_POOLSIZE = 10
 
 from hyper.common.connection import HTTPConnection
+from hyper.common.exceptions import ConnectionResetError
 from hyper.compat import urlparse, ssl
+from hyper.http20.connection import HTTP20Connection
+from hyper.http20.exceptions import ConnectionError
 from hyper.tls import init_context
 from hyper.common.util import to_native_string
 
+log = logging.getLogger(__name__)
+
 
 class HTTP20Adapter(HTTPAdapter):
     """
     A Requests Transport Adapter that uses hyper to send requests over
     HTTP/2. This implements some degree of connection pooling to maximise the
     HTTP/2 gain.
+
+    A single connection is kept for each server, as HTTP/2 carries many
+    requests at once on one connection. Before a connection is reused it is
+    checked for having been closed, or for the server having sent a GOAWAY
+    frame while it was idle; if it has, a new connection is opened.
+
+    Concurrency
+    -----------
+
+    This class is thread-safe. Requests sent at the same time from several
+    threads of one ``Session`` share a connection to each server, each on
+    its own stream.
+
+    :param window_manager: (optional) The class to use to manage flow control
+        windows on each connection.
+    :param pool_connections: (optional) The number of connections to keep.
+        When a connection to another server is needed, the least recently
+        used connection is closed once it has no open streams. Defaults to
+        10.
+    :param idle_timeout: (optional) How long, in seconds, to keep a
+        connection that has no open streams. ``None`` keeps connections until
+        they are evicted or closed. Defaults to 60.
     """
-    def __init__(self, window_manager=None, *args, **kwargs):
-        #: A mapping between HTTP netlocs and ``HTTP20Connection`` objects.
-        self.connections = {}
+    def __init__(self, window_manager=None, pool_connections=DEFAULT_POOLSIZE,
+                 idle_timeout=60, *args, **kwargs):
+        #: A mapping between HTTP netlocs and ``HTTP20Connection`` objects,
+        #: from the least to the most recently used.
+        self.connections = OrderedDict()
         self.window_manager = window_manager
+        self.pool_connections = pool_connections
+        self.idle_timeout = idle_timeout
+
+        # When each connection was last handed out, and the connections that
+        # have been evicted but still had open streams.
+        self._last_used = {}
+        self._evicted = []
+
+        # Concurrency
+        #
+        # Use one lock (_lock) to synchronize all access to the connections.
+        self._lock = threading.Lock()
 
     def get_connection(self, host, port, scheme, cert=None, verify=True,
                        proxy=None, timeout=None):
@@ -69,19 +118,45 @@ class HTTP20Adapter(HTTPAdapter):
                              if proxy_headers else None)
         connection_key = (host, port, scheme, cert, verify,
                           proxy_netloc, proxy_headers_key)
-        try:
-            conn = self.connections[connection_key]
-        except KeyError:
-            conn = HTTPConnection(
-                host,
-                port,
-                secure=secure,
-                window_manager=self.window_manager,
-                ssl_context=ssl_context,
-                proxy_host=proxy_netloc,
-                proxy_headers=proxy_headers,
-                timeout=timeout)
+        # Concurrency
+        #
+        # Hold _lock: the connections must not change between checking a
+        # connection and handing it out.
+        #
+        # I/O occurs while the lock is held, when connections are checked or
+        # closed; waiting threads will see a delay.
+        with self._lock:
+            self._close_idle_connections()
+
+            conn = self.connections.pop(connection_key, None)
+            if conn is not None and not self._connection_alive(conn):
+                log.debug("Replacing dead connection to %s:%s", host, port)
+                conn.close()
+                conn = None
+
+            if conn is None:
+                conn = HTTPConnection(
+                    host,
+                    port,
+                    secure=secure,
+                    window_manager=self.window_manager,
+                    ssl_context=ssl_context,
+                    proxy_host=proxy_netloc,
+                    proxy_headers=proxy_headers,
+                    timeout=timeout)
+
+            # The most recently used connection goes at the end.
             self.connections[connection_key] = conn
+            self._last_used[connection_key] = time.time()
+
+            # Evicted connections are closed once their streams are done.
+            while len(self.connections) > self.pool_connections:
+                key, evicted = self.connections.popitem(last=False)
+                del self._last_used[key]
+                if self._connection_idle(evicted):
+                    evicted.close()
+                else:
+                    self._evicted.append(evicted)
 
         return conn
 
@@ -109,13 +184,20 @@ class HTTP20Adapter(HTTPAdapter):
         selector += '?' + parsed.query if parsed.query else ''
         selector += '#' + parsed.fragment if parsed.fragment else ''
 
-        conn.request(
+        stream_id = conn.request(
             request.method,
             selector,
             request.body,
             request.headers
         )
-        resp = conn.get_response()
+
+        # Read the response from the request's own stream: other threads may
+        # have sent requests on this connection since. HTTP/1.1 requests
+        # don't have a stream.
+        if stream_id is None:
+            resp = conn.get_response()
+        else:
+            resp = conn.get_response(stream_id)
 
         r = self.build_response(request, resp)
 
@@ -200,6 +282,77 @@ class HTTP20Adapter(HTTPAdapter):
         return response
 
     def close(self):
-        for connection in self.connections.values():
-            connection.close()
-        self.connections.clear()
+        with self._lock:
+            for connection in self.connections.values():
+                connection.close()
+            for connection in self._evicted:
+                connection.close()
+            self.connections.clear()
+            self._last_used.clear()
+            self._evicted = []
+
+    def _close_idle_connections(self):
+        """
+        Closes the evicted connections that no longer have open streams, and
+        the connections that have been idle for longer than the idle timeout.
+        """
+        evicted = []
+        for conn in self._evicted:
+            if self._connection_idle(conn):
+                conn.close()
+            else:
+                evicted.append(conn)
+        self._evicted = evicted
+
+        if self.idle_timeout is None:
+            return
+
+        now = time.time()
+        for key, conn in list(self.connections.items()):
+            if (now - self._last_used[key] >= self.idle_timeout and
+                    self._connection_idle(conn)):
+                log.debug("Closing idle connection to %s:%s", key[0], key[1])
+                del self.connections[key]
+                del self._last_used[key]
+                conn.close()
+
+    @staticmethod
+    def _connection_idle(conn):
+        """
+        Whether a connection has no open streams. HTTP/1.1 connections don't
+        keep track of their responses, so they are always idle.
+        """
+        backing = conn._conn
+        if isinstance(backing, HTTP20Connection):
+            return not backing.streams
+        return True
+
+    @staticmethod
+    def _connection_alive(conn):
+        """
+        Cheaply checks that a connection can still be used: that it hasn't
+        been closed, and that nothing has arrived while it was idle that
+        ends it, such as a GOAWAY frame or, over HTTP/1.1, the server closing
+        the connection.
+        """
+        backing = conn._conn
+        sock = backing._sock
+
+        if not isinstance(backing, HTTP20Connection):
+            # An HTTP/1.1 connection with no socket connects when it's next
+            # used. One that's readable between requests has been closed.
+            return sock is None or not sock.wait_readable(0)
+
+        if sock is None or backing._reader_error is not None:
+            return False
+
+        # When there's no reader thread, frames sent while no stream was open
+        # are read here. A GOAWAY frame closes the connection.
+        if (backing._reader is None and not backing.streams and
+                sock.wait_readable(0)):
+            try:
+                backing._single_read(block=False)
+            except (ConnectionError, ConnectionResetError, socket.error):
+                return False
+
+        return backing._sock is not None
@@ -19,17 +19,13 @@ from .response import HTTP11Response
 from ..tls import wrap_socket, H2C_PROTOCOL
 from ..common.bufsocket import BufferedSocket
 from ..common.exceptions import TLSUpgrade, HTTPUpgrade, ProxyError
-from ..common.headers import HTTPHeaderMap
+from ..common.headers import HTTPHeaderMap, FrozenHTTPHeaderMap
 from ..common.util import (
     to_bytestring, to_host_port_tuple, to_native_string, HTTPVersion
 )
 from ..compat import bytes
 
-# We prefer pycohttpparser to the pure-Python interpretation
-try:  # pragma: no cover
-    from pycohttpparser.api import Parser
-except ImportError:  # pragma: no cover
-    from .parser import Parser
+from .parser import get_backend
 
 
 log = logging.getLogger(__name__)
@@ -95,13 +91,23 @@ class HTTP11Connection(object):
         and one also isn't provided in the ``proxy_host`` parameter,
         defaults to 8080.
     :param proxy_headers: (optional) The headers to send to a proxy.
+    :param lazy_headers: (optional) Whether to defer parsing response headers
+        until they're used. When enabled, responses keep the raw bytes of
+        their head, and looking up a header only searches for that header.
+        This is cheaper for applications that look at few of the headers of
+        each response. Defaults to ``False``.
+    :param parser_backend: (optional) The name of the HTTP/1.1 parser backend
+        to use, such as ``'python'``, ``'pycohttpparser'`` or
+        ``'httptools'``. If not provided, pycohttpparser is used if it's
+        installed, and hyper's pure-Python parser otherwise.
     """
 
     version = HTTPVersion.http11
 
     def __init__(self, host, port=None, secure=None, ssl_context=None,
                  proxy_host=None, proxy_port=None, proxy_headers=None,
-                 timeout=None, **kwargs):
+                 timeout=None, lazy_headers=False, parser_backend=None,
+                 **kwargs):
         if port is None:
             self.host, self.port = to_host_port_tuple(host, default_port=80)
         else:
@@ -140,15 +146,30 @@ class HTTP11Connection(object):
             self.proxy_port = None
         self.proxy_headers = proxy_headers
 
+        self._lazy_headers = lazy_headers
+
         #: The size of the in-memory buffer used to store data from the
         #: network. This is used as a performance optimisation. Increase buffer
         #: size to improve performance: decrease it to conserve memory.
         #: Defaults to 64kB.
         self.network_buffer_size = 65536
 
+        #: The size the in-memory network buffer may temporarily grow to in
+        #: order to hold a response head, or a chunk size line, that doesn't
+        #: fit in ``network_buffer_size`` bytes. Responses with larger heads
+        #: fail with :class:`LineTooLongError
+        #: <hyper.common.exceptions.LineTooLongError>`. This is also the
+        #: parser's ``max_head_size``. Defaults to 1MB.
+        self.max_network_buffer_size = 1048576
+
+        #: The name of the HTTP/1.1 parser backend in use.
+        self.parser_backend, parser_class = get_backend(parser_backend)
+
         #: The object used to perform HTTP/1.1 parsing. Needs to conform to
         #: the standard hyper parsing interface.
-        self.parser = Parser()
+        self.parser = parser_class(
+            max_head_size=self.max_network_buffer_size
+        )
 
         # timeout
         self._timeout = timeout
@@ -194,7 +215,9 @@ class HTTP11Connection(object):
                 sock, proto = wrap_socket(sock, self.host, self.ssl_context)
 
             log.debug("Selected protocol: %s", proto)
-            sock = BufferedSocket(sock, self.network_buffer_size)
+            sock = BufferedSocket(
+                sock, self.network_buffer_size, self.max_network_buffer_size
+            )
 
             # Set read timeout
             sock.settimeout(read_timeout)
@@ -279,16 +302,26 @@ class HTTP11Connection(object):
         method = self._current_request_method
         self._current_request_method = None
 
-        headers = HTTPHeaderMap()
+        # The buffer limit may have been changed since the parser was made.
+        self.parser.max_head_size = self.max_network_buffer_size
 
         response = None
         while response is None:
             # 'encourage' the socket to receive data.
             self._sock.fill()
-            response = self.parser.parse_response(self._sock.buffer)
+            if self._lazy_headers:
+                response = self.parser.parse_response(
+                    self._sock.buffer, lazy=True
+                )
+            else:
+                response = self.parser.parse_response(self._sock.buffer)
 
-        for n, v in response.headers:
-            headers[n.tobytes()] = v.tobytes()
+        if self._lazy_headers:
+            headers = response.headers
+        else:
+            headers = FrozenHTTPHeaderMap(
+                (n.tobytes(), v.tobytes()) for n, v in response.headers
+            )
 
         self._sock.advance_buffer(response.consumed)
 
@@ -470,6 +503,12 @@ class HTTP11Connection(object):
             self._sock.close()
         self._sock = None
 
+        # Forget any response head that was only partly received. Parsers
+        # other than hyper's own need not be resumable.
+        reset = getattr(self.parser, 'reset', None)
+        if reset is not None:
+            reset()
+
     # The following two methods are the implementation of the context manager
     # protocol.
     def __enter__(self):
@@ -7,7 +7,10 @@ This module contains hyper's pure-Python HTTP/1.1 parser. This module defines
 an abstraction layer for HTTP/1.1 parsing that allows for dropping in other
 modules if needed, in order to obtain speedups on your chosen platform.
 """
-from collections import namedtuple
+import re
+from collections import namedtuple, OrderedDict
+
+from ..common.headers import LazyHTTPHeaderMap
 
 
 Response = namedtuple(
@@ -15,6 +18,10 @@ Response = namedtuple(
 )
 
 
+# Matches the empty line that ends a response head.
+END_OF_HEAD = re.compile(b'\n\r?\n')
+
+
 class ParseError(Exception):
     """
     An invalid HTTP message was passed to the parser.
@@ -28,56 +35,382 @@ class Parser(object):
     This object is not thread-safe, and it does maintain state that is shared
     across parsing requests. For this reason, make sure that access to this
     object is synchronized if you use it across multiple threads.
+
+    Parsing is incremental: if a response head is incomplete, the parser
+    remembers how much of it has been parsed, and the next call to
+    :meth:`parse_response` resumes from there. Each call must therefore be
+    passed a buffer that starts at the same response as the previous call,
+    until a response is returned or :meth:`reset` is called.
+
+    :param max_headers: (optional) The largest number of header lines a
+        response head may contain. Defaults to 100.
+    :param max_head_size: (optional) The largest size, in bytes, that a
+        response head may be, including its status line. Defaults to 64kB.
     """
-    def __init__(self):
-        pass
+    def __init__(self, max_headers=100, max_head_size=65536):
+        #: The largest number of header lines a response head may contain.
+        #: Responses with more fail with :class:`ParseError
+        #: <hyper.http11.parser.ParseError>`.
+        self.max_headers = max_headers
+
+        #: The largest size, in bytes, that a response head may be. Responses
+        #: with larger heads fail with :class:`ParseError
+        #: <hyper.http11.parser.ParseError>` as soon as that many bytes have
+        #: been received without the head ending.
+        self.max_head_size = max_head_size
 
-    def parse_response(self, buffer):
+        self.reset()
+
+    def reset(self):
+        """
+        Discards any partially parsed response, so that the next call to
+        :meth:`parse_response` starts from scratch.
+        """
+        # The offset into the buffer at which parsing resumes. Everything
+        # before it is either a complete line that has already been parsed
+        # or, when parsing lazily, known not to end the response head.
+        self._offset = 0
+
+        # The status code, reason phrase and minor version, once the status
+        # line has been parsed.
+        self._status_line = None
+
+        # The header lines parsed so far.
+        self._headers = []
+
+    def parse_response(self, buffer, lazy=False):
         """
         Parses a single HTTP response from a buffer.
         :param buffer: A ``memoryview`` object wrapping a buffer containing a
             HTTP response.
+        :param lazy: (optional) If ``True``, the header lines aren't parsed.
+            Instead, only the response head is copied out of the buffer, and
+            the ``headers`` of the response are a :class:`LazyHTTPHeaderMap
+            <hyper.common.headers.LazyHTTPHeaderMap>` that parses them on
+            demand.
         :returns: A :class:`Response <hyper.http11.parser.Response>` object, or
             ``None`` if there is not enough data in the buffer.
         """
-        # Begin by copying the data out of the buffer. This is necessary
-        # because as much as possible we want to use the built-in bytestring
-        # methods, rather than looping over the data in Python.
-        temp_buffer = buffer.tobytes()
+        if lazy:
+            return self._parse_response_lazily(buffer)
 
-        index = temp_buffer.find(b'\n')
-        if index == -1:
-            return None
+        # Begin by copying the data we haven't parsed yet out of the buffer.
+        # This is necessary because as much as possible we want to use the
+        # built-in bytestring methods, rather than looping over the data in
+        # Python.
+        temp_buffer = buffer[self._offset:].tobytes()
+        index = 0
 
-        version, status, reason = (
-                temp_buffer[0:index].split(None, 2) + [b''])[:3]
-        if not version.startswith(b'HTTP/1.'):
-            raise ParseError("Not HTTP/1.X!")
+        if self._status_line is None:
+            index = temp_buffer.find(b'\n')
+            if index == -1:
+                self._check_head_size(len(temp_buffer))
+                return None
 
-        minor_version = int(version[7:])
-        status = int(status)
-        reason = memoryview(reason.strip())
+            self._status_line = self._parse_status_line(temp_buffer[:index])
 
-        # Chomp the newline.
-        index += 1
+            # Chomp the newline.
+            index += 1
 
         # Now, parse the headers out.
-        end_index = index
-        headers = []
+        headers = self._headers
 
         while True:
             end_index = temp_buffer.find(b'\n', index)
             if end_index == -1:
+                # Resume from the start of the incomplete line next time.
+                self._offset += index
+                self._check_head_size(self._offset + len(temp_buffer) - index)
                 return None
             elif (end_index - index) <= 1:
                 # Chomp the newline
                 end_index += 1
                 break
 
+            if len(headers) >= self.max_headers:
+                raise ParseError(
+                    "Response has more than %d headers" % self.max_headers
+                )
+
             name, value = temp_buffer[index:end_index].split(b':', 1)
             value = value.strip()
             headers.append((memoryview(name), memoryview(value)))
             index = end_index + 1
 
-        resp = Response(status, reason, minor_version, headers, end_index)
+        consumed = self._offset + end_index
+        self._check_head_size(consumed)
+
+        status, reason, minor_version = self._status_line
+        self.reset()
+
+        resp = Response(status, reason, minor_version, headers, consumed)
         return resp
+
+    def _parse_response_lazily(self, buffer):
+        """
+        Parses the status line of a single HTTP response from a buffer,
+        leaving the header lines to be parsed on demand.
+        """
+        # Find the end of the head without copying the buffer, and then copy
+        # out only the head.
+        try:
+            match = END_OF_HEAD.search(buffer, self._offset)
+        except TypeError:  # pragma: no cover
+            # Python 2's re doesn't accept memoryviews.
+            match = END_OF_HEAD.search(buffer.tobytes(), self._offset)
+
+        if match is None:
+            # The end of the head may straddle the end of the buffer, so
+            # resume the search just before it.
+            self._offset = max(len(buffer) - 2, 0)
+            self._check_head_size(len(buffer))
+            return None
+
+        self._check_head_size(match.end())
+        self.reset()
+
+        head = buffer[:match.end()].tobytes()
+
+        # Every line but the status line and the empty one is a header.
+        if head.count(b'\n') - 2 > self.max_headers:
+            raise ParseError(
+                "Response has more than %d headers" % self.max_headers
+            )
+
+        index = head.find(b'\n')
+        status, reason, minor_version = self._parse_status_line(head[:index])
+
+        return Response(
+            status, reason, minor_version, LazyHTTPHeaderMap(head),
+            match.end()
+        )
+
+    def _check_head_size(self, size):
+        """
+        Fails if a response head of ``size`` bytes is too large.
+        """
+        if size > self.max_head_size:
+            raise ParseError(
+                "Response head is larger than %d bytes" % self.max_head_size
+            )
+
+    def _parse_status_line(self, line):
+        """
+        Parses a status line, returning the status code, reason phrase and
+        minor version.
+        """
+        version, status, reason = (line.split(None, 2) + [b''])[:3]
+        if not version.startswith(b'HTTP/1.'):
+            raise ParseError("Not HTTP/1.X!")
+
+        minor_version = int(version[7:])
+        status = int(status)
+        reason = memoryview(reason.strip())
+
+        return status, reason, minor_version
+
+
+class _BackendParser(Parser):
+    """
+    The base class for adapters that present another HTTP/1.1 parser with
+    the same interface as :class:`Parser <hyper.http11.parser.Parser>`.
+
+    Subclasses implement ``_parse``, which parses a complete response head
+    from the buffer or returns ``None``. This class enforces the header
+    limits and builds lazy header maps on their behalf. Adapted parsers are
+    stateless, so they don't resume from where they stopped.
+    """
+    def parse_response(self, buffer, lazy=False):
+        """
+        Parses a single HTTP response from a buffer.
+
+        :param buffer: A ``memoryview`` object wrapping a buffer containing a
+            HTTP response.
+        :param lazy: (optional) If ``True``, the ``headers`` of the response
+            are a :class:`LazyHTTPHeaderMap
+            <hyper.common.headers.LazyHTTPHeaderMap>`.
+        :returns: A :class:`Response <hyper.http11.parser.Response>` object, or
+            ``None`` if there is not enough data in the buffer.
+        """
+        response = self._parse(buffer)
+        if response is None:
+            self._check_head_size(len(buffer))
+            return None
+
+        self._check_head_size(response.consumed)
+        if len(response.headers) > self.max_headers:
+            raise ParseError(
+                "Response has more than %d headers" % self.max_headers
+            )
+
+        if lazy:
+            head = buffer[:response.consumed].tobytes()
+            response = response._replace(headers=LazyHTTPHeaderMap(head))
+
+        return response
+
+
+class PycohttpparserParser(_BackendParser):
+    """
+    Parses HTTP/1.1 responses using `pycohttpparser`_, a wrapper around the
+    picohttpparser C library.
+
+    .. _pycohttpparser: https://pypi.python.org/pypi/pycohttpparser
+    """
+    def __init__(self, *args, **kwargs):
+        super(PycohttpparserParser, self).__init__(*args, **kwargs)
+
+        from pycohttpparser.api import Parser as _Parser
+        from pycohttpparser.api import ParseError as _ParseError
+        self._parser = _Parser()
+        self._error = _ParseError
+
+    def _parse(self, buffer):
+        try:
+            return self._parser.parse_response(buffer)
+        except self._error as e:
+            raise ParseError(str(e))
+
+
+class HttptoolsParser(_BackendParser):
+    """
+    Parses HTTP/1.1 responses using `httptools`_, a wrapper around the
+    http-parser and llhttp C libraries used by Node.js.
+
+    .. _httptools: https://pypi.python.org/pypi/httptools
+    """
+    def __init__(self, *args, **kwargs):
+        super(HttptoolsParser, self).__init__(*args, **kwargs)
+
+        import httptools
+        self._httptools = httptools
+
+        # Collects the reason phrase and headers from the httptools
+        # callbacks.
+        self._reason = []
+        self._headers = []
+
+    def _parse(self, buffer):
+        # httptools parses bodies too, so only the head is passed to it.
+        try:
+            match = END_OF_HEAD.search(buffer)
+        except TypeError:  # pragma: no cover
+            # Python 2's re doesn't accept memoryviews.
+            match = END_OF_HEAD.search(buffer.tobytes())
+
+        if match is None:
+            return None
+
+        self._reason = []
+        self._headers = []
+
+        parser = self._httptools.HttpResponseParser(self)
+        try:
+            parser.feed_data(buffer[:match.end()].tobytes())
+        except self._httptools.HttpParserUpgrade:
+            # The head of a 101 response was parsed: what follows it belongs
+            # to the new protocol.
+            pass
+        except self._httptools.HttpParserError as e:
+            raise ParseError(str(e))
+
+        version = parser.get_http_version()
+        if not version.startswith('1.'):
+            raise ParseError("Not HTTP/1.X!")
+
+        return Response(
+            parser.get_status_code(),
+            memoryview(b''.join(self._reason).strip()),
+            int(version[2:]),
+            self._headers,
+            match.end()
+        )
+
+    def on_status(self, status):
+        self._reason.append(status)
+
+    def on_header(self, name, value):
+        self._headers.append((memoryview(name), memoryview(value.strip())))
+
+
+# The HTTP/1.1 parser backends, by name. Each maps to a function that returns
+# the backend's parser class, raising ImportError if the backend isn't
+# installed.
+_backends = OrderedDict()
+
+#: The backends used, in order of preference, when one isn't explicitly
+#: selected.
+DEFAULT_BACKENDS = ('pycohttpparser', 'python')
+
+
+def register_backend(name, loader):
+    """
+    Registers a HTTP/1.1 parser backend, so that it can be selected by name.
+
+    :param name: The name of the backend.
+    :param loader: A callable that takes no arguments and returns the parser
+        class, raising ``ImportError`` if the backend is not installed. The
+        class must accept the same arguments as :class:`Parser
+        <hyper.http11.parser.Parser>` and provide its ``parse_response``
+        method.
+    :returns: Nothing.
+    """
+    _backends[name] = loader
+
+
+def available_backends():
+    """
+    Returns the names of the registered HTTP/1.1 parser backends that are
+    installed.
+    """
+    available = []
+    for name, loader in _backends.items():
+        try:
+            loader()
+        except ImportError:
+            continue
+        available.append(name)
+
+    return available
+
+
+def get_backend(name=None):
+    """
+    Returns the name and parser class of a HTTP/1.1 parser backend.
+
+    :param name: (optional) The name of the backend. If not provided, the
+        first installed backend in ``DEFAULT_BACKENDS`` is used.
+    :returns: A tuple of the backend name and its parser class.
+    :raises ValueError: If the backend isn't registered.
+    :raises ImportError: If the backend isn't installed.
+    """
+    if name is not None:
+        try:
+            loader = _backends[name]
+        except KeyError:
+            raise ValueError("Unknown HTTP/1.1 parser backend: %s" % name)
+
+        return name, loader()
+
+    for name in DEFAULT_BACKENDS:
+        try:
+            return name, _backends[name]()
+        except ImportError:
+            continue
+
+    raise ImportError("No HTTP/1.1 parser backend is installed")
+
+
+def _load_pycohttpparser():
+    import pycohttpparser.api  # noqa
+    return PycohttpparserParser
+
+
+def _load_httptools():
+    import httptools  # noqa
+    return HttptoolsParser
+
+
+register_backend('python', lambda: Parser)
+register_backend('pycohttpparser', _load_pycohttpparser)
+register_backend('httptools', _load_httptools)
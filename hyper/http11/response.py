@@ -7,17 +7,23 @@ Contains the HTTP/1.1 equivalent of the HTTPResponse object defined in
 httplib/http.client.
 """
 import logging
+import re
 import weakref
+from io import BytesIO
 import zlib
 import brotli
 
 from ..common.decoder import DeflateDecoder
 from ..common.exceptions import ChunkedDecodeError, InvalidResponseError
 from ..common.exceptions import ConnectionResetError
+from ..common.headers import FrozenHTTPHeaderMap
 from ..common.util import HTTPVersion
 
 log = logging.getLogger(__name__)
 
+# A chunk size, which is one or more hexadecimal digits.
+CHUNK_SIZE = re.compile(b'[0-9a-fA-F]+\\Z')
+
 
 class HTTP11Response(object):
     """
@@ -110,6 +116,16 @@ class HTTP11Response(object):
         self._buffered_data = b''
         self._chunker = None
 
+        # Whether close() has been called.
+        self._closed = False
+
+        # The state machine that decodes a chunked body, shared by every way
+        # of reading it.
+        if self._chunked and sock is not None:
+            self._chunked_decoder = ChunkedDecoder(sock)
+        else:
+            self._chunked_decoder = None
+
     def read(self, amt=None, decode_content=True):
         """
         Reads the response body, or up to the next ``amt`` bytes.
@@ -122,6 +138,11 @@ class HTTP11Response(object):
             ``True``, the actual amount of data returned may be different to
             the amount requested.
         """
+        # Data decoded by readinto() that didn't fit in its buffer comes
+        # first. Chunked reads keep their excess data in the same place.
+        if self._buffered_data and not self._chunked:
+            return self._read_buffered(amt, decode_content)
+
         # Return early if we've lost our connection.
         if self._sock is None:
             return b''
@@ -148,32 +169,8 @@ class HTTP11Response(object):
         if self._length is not None:
             amt = min(amt, self._length)
 
-        # Now, issue reads until we read that length. This is to account for
-        # the fact that it's possible that we'll be asked to read more than
-        # 65kB in one shot.
-        to_read = amt
-        chunks = []
-
-        # Ideally I'd like this to read 'while to_read', but I want to be
-        # defensive against the admittedly unlikely case that the socket
-        # returns *more* data than I want.
-        while to_read > 0:
-            chunk = self._sock.recv(amt).tobytes()
-
-            # If we got an empty read, but were expecting more, the remote end
-            # has hung up. Raise an exception if we were expecting more data,
-            # but if we were expecting the remote end to close then it's ok.
-            if not chunk:
-                if self._length is not None or not self._expect_close:
-                    self.close(socket_close=True)
-                    raise ConnectionResetError("Remote end hung up!")
-
-                break
-
-            to_read -= len(chunk)
-            chunks.append(chunk)
-
-        data = b''.join(chunks)
+        # Now, read that length straight into the bytestring we'll return.
+        data = self._read_exactly(amt)
         if self._length is not None:
             self._length -= len(data)
 
@@ -196,16 +193,120 @@ class HTTP11Response(object):
         # We're at the end. Close the connection. Explicit check for zero here
         # because self._length might be None.
         if end_of_request:
-            self.close(socket_close=self._expect_close)
+            self._release(socket_close=self._expect_close)
 
         return data
 
+    def readinto(self, b):
+        """
+        Reads up to ``len(b)`` bytes of the response body into ``b``, which
+        must be a writable bytes-like object such as a ``bytearray``. The body
+        is decoded, as it is by ``read()``.
+
+        This allows the response to be used as a raw stream by
+        :class:`io.BufferedReader`.
+
+        :param b: The buffer to read into.
+        :returns: The number of bytes read into ``b``. This is only ``0`` at
+            the end of the body, or if ``b`` is empty.
+        """
+        view = memoryview(b)
+        if not len(view):
+            return 0
+
+        # Decoded data can't be read straight into the buffer: it's decoded
+        # and then copied, keeping any data that doesn't fit.
+        if self._buffered_data or self._decompressobj is not None:
+            if self._buffered_data:
+                data, self._buffered_data = self._buffered_data, b''
+            else:
+                data = b''
+                while not data and self._sock is not None:
+                    data = self.read(len(view))
+
+            count = min(len(view), len(data))
+            view[:count] = data[:count]
+            self._buffered_data = data[count:] + self._buffered_data
+            return count
+
+        # Return early if we've lost our connection.
+        if self._sock is None:
+            return 0
+
+        if self._chunked:
+            data = self._chunked_decoder.read(len(view))
+            if data is None:
+                self._finish_chunked()
+                return 0
+
+            view[:len(data)] = data
+            return len(data)
+
+        amt = len(view)
+        if self._length is not None:
+            amt = min(amt, self._length)
+
+        count = 0
+        if amt:
+            try:
+                count = self._sock.recv_into(view[:amt])
+            except ConnectionResetError:
+                pass
+
+            # Unless we were expecting the remote end to close, it hanging up
+            # is an error.
+            if not count and (self._length is not None or
+                              not self._expect_close):
+                self._release(socket_close=True)
+                raise ConnectionResetError("Remote end hung up!")
+
+        if self._length is not None:
+            self._length -= count
+
+        if self._length == 0 or not count:
+            self._release(socket_close=self._expect_close)
+
+        return count
+
+    def readable(self):
+        """
+        Whether the response body can be read, which it always can.
+
+        :returns: ``True``.
+        """
+        return True
+
+    def seekable(self):
+        """
+        Whether the response body supports random access, which it doesn't.
+
+        :returns: ``False``.
+        """
+        return False
+
+    def flush(self):
+        """
+        Does nothing, as responses can't be written to. This is defined so
+        that the response can be closed by :mod:`io` wrappers.
+
+        :returns: Nothing.
+        """
+        pass
+
+    @property
+    def closed(self):
+        """
+        Whether the response has been closed by calling ``close()``.
+        """
+        return self._closed
+
     def read_chunked(self, decode_content=True):
         """
         Reads chunked transfer encoded bodies. This method returns a generator:
-        each iteration of which yields one chunk *unless* the chunks are
-        compressed, in which case it yields whatever the decompressor provides
-        for each chunk.
+        each iteration of which yields the data of one chunk *unless* the
+        chunks are compressed, in which case it yields whatever the
+        decompressor provides for each chunk. Chunks too large to fit in the
+        network buffer are yielded in several pieces.
 
         .. warning:: This may yield the empty string, without that being the
                      end of the body!
@@ -215,46 +316,42 @@ class HTTP11Response(object):
                 "Attempted chunked read of non-chunked body."
             )
 
+        for data in self._iter_chunked(decode_content):
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            yield data
+
+    def _iter_chunked(self, decode_content):
+        """
+        Implements the logic for reading a chunked body. This yields each
+        piece of the body as soon as it's read, without copying it: pieces
+        that aren't decompressed are ``memoryview`` slices of the socket's
+        buffer, and are only valid until the next piece is requested.
+        """
         # Return early if possible.
         if self._sock is None:
             return
 
-        while True:
-            # Read to the newline to get the chunk length. This is a
-            # hexadecimal integer.
-            chunk_length = int(self._sock.readline().tobytes().strip(), 16)
-            data = b''
+        decompress = decode_content and self._decompressobj
 
-            # If the chunk length is zero, consume the newline and then we're
-            # done. If we were decompressing data, return the remaining data.
-            if not chunk_length:
-                self._sock.readline()
+        while True:
+            data = self._chunked_decoder.read()
 
-                if decode_content and self._decompressobj:
+            # If the body is done, the trailers have been read. If we were
+            # decompressing data, return the remaining data.
+            if data is None:
+                if decompress:
                     yield self._decompressobj.flush()
 
-                self.close(socket_close=self._expect_close)
+                self._finish_chunked()
                 break
 
-            # Then read that many bytes.
-            while chunk_length > 0:
-                chunk = self._sock.recv(chunk_length).tobytes()
-                data += chunk
-                chunk_length -= len(chunk)
-
-            assert chunk_length == 0
-
-            # Now, consume the newline.
-            self._sock.readline()
-
             # We may need to decode the body.
-            if decode_content and self._decompressobj and data:
-                data = self._decompressobj.decompress(data)
+            if decompress:
+                data = self._decompressobj.decompress(data.tobytes())
 
             yield data
 
-        return
-
     def close(self, socket_close=False):
         """
         Close the response. This causes the Response to lose access to the
@@ -264,6 +361,15 @@ class HTTP11Response(object):
         :param socket_close: Whether to close the backing socket.
         :returns: Nothing.
         """
+        self._closed = True
+        self._release(socket_close)
+
+    def _release(self, socket_close=False):
+        """
+        Gives up the backing socket, as happens when the body has been read.
+        Unlike ``close()``, this doesn't mark the response as closed, so
+        reading it goes on reporting the end of the body.
+        """
         if socket_close and self._parent is not None:
             # The double call is necessary because we need to dereference the
             # weakref. If the weakref is no longer valid, that's fine, there's
@@ -292,7 +398,7 @@ class HTTP11Response(object):
             else:
                 chunks.append(chunk)
 
-        self.close(socket_close=True)
+        self._release(socket_close=True)
 
         # We may need to decompress the data.
         data = b''.join(chunks)
@@ -302,35 +408,118 @@ class HTTP11Response(object):
 
         return data
 
-    def _normal_read_chunked(self, amt, decode_content):
+    def _finish_chunked(self):
         """
-        Implements the logic for calling ``read()`` on a chunked response.
+        Finishes a chunked body once the trailers have been read.
+        """
+        if self._chunked_decoder.trailers:
+            self.trailers = FrozenHTTPHeaderMap(self._chunked_decoder.trailers)
+
+        self._release(socket_close=self._expect_close)
+
+    def _read_exactly(self, amt):
+        """
+        Reads ``amt`` bytes of the body, or as many as there are before the
+        remote end closes the connection if we expect it to.
+        """
+        # Without a content length, ``amt`` may be far more than the body,
+        # so it isn't allocated up front.
+        if self._length is None:
+            body = bytearray()
+            while len(body) < amt:
+                try:
+                    chunk = self._sock.recv(amt - len(body))
+                except ConnectionResetError:
+                    chunk = b''
+
+                # The remote end hanging up is only ok if we expected it to.
+                if not len(chunk):
+                    if not self._expect_close:
+                        self._release(socket_close=True)
+                        raise ConnectionResetError("Remote end hung up!")
+
+                    break
+
+                body += chunk
+
+            return bytes(body)
+
+        # The data is received straight into the bytestring that's returned.
+        # On Python 3, a BytesIO takes ownership of a bytestring nothing else
+        # refers to, lets it be written to through getbuffer(), and returns
+        # it from getvalue() without copying it.
+        body = BytesIO(b'\0' * amt)
+        try:
+            view = body.getbuffer()
+        except AttributeError:  # pragma: no cover
+            # Python 2's BytesIO can't be written to in place.
+            body = bytearray(amt)
+            view = memoryview(body)
+
+        received = 0
+        while received < amt:
+            count = self._sock.recv_into(view[received:])
+
+            # If we got an empty read, but were expecting more, the remote end
+            # has hung up.
+            if not count:
+                self._release(socket_close=True)
+                raise ConnectionResetError("Remote end hung up!")
+
+            received += count
+
+        del view
+        if isinstance(body, bytearray):  # pragma: no cover
+            return bytes(body[:received])
+
+        body.truncate(received)
+        return body.getvalue()
+
+    def _read_buffered(self, amt, decode_content):
+        """
+        Implements the logic for calling ``read()`` when ``readinto()`` has
+        decoded more data than it could return.
         """
-        # If we're doing a full read, read it as chunked and then just join
-        # the chunks together!
         if amt is None:
-            return self._buffered_data + b''.join(self.read_chunked())
+            data, self._buffered_data = self._buffered_data, b''
+            return data + self.read(decode_content=decode_content)
 
+        data = self._buffered_data[:amt]
+        self._buffered_data = self._buffered_data[amt:]
+        return data
+
+    def _normal_read_chunked(self, amt, decode_content):
+        """
+        Implements the logic for calling ``read()`` on a chunked response.
+        """
         if self._chunker is None:
-            self._chunker = self.read_chunked()
+            self._chunker = self._iter_chunked(decode_content)
+
+        # Collect the data in a single buffer, so that each piece of the body
+        # is copied once however many pieces there are.
+        data = bytearray(self._buffered_data)
 
-        # Otherwise, we have a certain amount of data we want to read.
-        current_amount = len(self._buffered_data)
+        # If we're doing a full read, read every remaining chunk.
+        if amt is None:
+            for chunk in self._chunker:
+                data += chunk
 
-        extra_data = [self._buffered_data]
-        while current_amount < amt:
+            self._buffered_data = b''
+            return bytes(data)
+
+        # Otherwise, we have a certain amount of data we want to read. Any
+        # excess is kept for the next read.
+        while len(data) < amt:
             try:
                 chunk = next(self._chunker)
             except StopIteration:
-                self.close(socket_close=self._expect_close)
                 break
 
-            current_amount += len(chunk)
-            extra_data.append(chunk)
+            data += chunk
 
-        data = b''.join(extra_data)
-        self._buffered_data = data[amt:]
-        return data[:amt]
+        self._buffered_data = bytes(data[amt:])
+        del data[amt:]
+        return bytes(data)
 
     # The following methods implement the context manager protocol.
     def __enter__(self):
@@ -339,3 +528,120 @@ class HTTP11Response(object):
     def __exit__(self, *args):
         self.close()
         return False  # Never swallow exceptions.
+
+
+class ChunkedDecoder(object):
+    """
+    A state machine that decodes a chunked transfer encoded body from a
+    :class:`BufferedSocket <hyper.common.bufsocket.BufferedSocket>`.
+
+    The body is returned as ``memoryview`` slices of the socket's buffer,
+    so the data is never copied or joined together by the decoder. Chunk
+    extensions are ignored, and trailers are collected in ``trailers``.
+    """
+    #: Expecting a line holding the size of the next chunk.
+    SIZE = 0
+
+    #: Within the data of a chunk.
+    DATA = 1
+
+    #: Expecting the empty line that ends the data of a chunk.
+    DATA_END = 2
+
+    #: Expecting a trailer, or the empty line that ends the body.
+    TRAILERS = 3
+
+    #: The body has been completely read.
+    DONE = 4
+
+    def __init__(self, sock):
+        self._sock = sock
+
+        #: The current state of the decoder.
+        self.state = self.SIZE
+
+        # The number of bytes of the current chunk that are yet to be read.
+        self._remaining = 0
+
+        #: The trailers that followed the body, as a list of name, value
+        #: tuples. This is only complete once the state is ``DONE``.
+        self.trailers = []
+
+    def read(self, amt=None):
+        """
+        Reads the next piece of the body.
+
+        Only the data of a single chunk is returned, so this may return less
+        than ``amt`` bytes even if more of the body follows.
+
+        :param amt: (optional) The most data to return. If not provided, as
+            much of the current chunk as is available is returned.
+        :returns: A ``memoryview`` of the data, which is only valid until the
+            socket is next read from, or ``None`` at the end of the body.
+        """
+        while self.state != self.DONE:
+            if self.state == self.DATA:
+                return self._read_data(amt)
+
+            line = self._sock.readline().tobytes()
+
+            if self.state == self.SIZE:
+                self._read_size(line)
+            elif self.state == self.DATA_END:
+                if line.strip():
+                    raise ChunkedDecodeError(
+                        "Chunk data is longer than the chunk size."
+                    )
+
+                self.state = self.SIZE
+            else:
+                self._read_trailer(line)
+
+        return None
+
+    def _read_size(self, line):
+        """
+        Handles a chunk size line, ignoring any chunk extensions.
+        """
+        size = line.split(b';', 1)[0].strip()
+
+        # int() also accepts signs, underscores and a 0x prefix, which a
+        # chunk size must not have.
+        if not CHUNK_SIZE.match(size):
+            raise ChunkedDecodeError("Invalid chunk size: %r" % size)
+
+        self._remaining = int(size, 16)
+        self.state = self.DATA if self._remaining else self.TRAILERS
+
+    def _read_data(self, amt):
+        """
+        Returns as much data from the current chunk as is available, up to
+        ``amt`` bytes.
+        """
+        if amt is None or amt > self._remaining:
+            amt = self._remaining
+
+        data = self._sock.recv(amt)
+        if not len(data):
+            raise ConnectionResetError("Remote end hung up!")
+
+        self._remaining -= len(data)
+        if not self._remaining:
+            self.state = self.DATA_END
+
+        return data
+
+    def _read_trailer(self, line):
+        """
+        Handles a line of the trailers, or the empty line that ends them.
+        """
+        if not line.strip():
+            self.state = self.DONE
+            return
+
+        try:
+            name, value = line.split(b':', 1)
+        except ValueError:
+            raise ChunkedDecodeError("Invalid trailer: %r" % line)
+
+        self.trailers.append((name.strip(), value.strip()))
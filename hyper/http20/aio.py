@@ -0,0 +1,711 @@
+# -*- coding: utf-8 -*-
+"""
+hyper/http20/aio
+~~~~~~~~~~~~~~~~
+
+Objects that build hyper's asyncio-native HTTP/2 abstraction.
+
+These objects mirror :class:`HTTP20Connection <hyper.HTTP20Connection>` and
+:class:`HTTP20Response <hyper.HTTP20Response>`, but perform all of their I/O
+on an asyncio event loop. A single task per connection reads from the
+network and hands events to the same :class:`Stream
+<hyper.http20.stream.Stream>` objects the synchronous connection uses, so one
+event loop can drive many concurrent streams without a thread per request.
+
+This module requires Python 3.5 or later.
+"""
+import asyncio
+import itertools
+import logging
+
+import h2.connection
+import h2.events
+import h2.settings
+
+from ..common.exceptions import ConnectionResetError
+from ..common.headers import FrozenHTTPHeaderMap
+from ..common.util import (
+    to_host_port_tuple, to_native_string, to_bytestring, HTTPVersion
+)
+from ..compat import unicode, bytes
+from ..tls import _default_context, H2_NPN_PROTOCOLS
+from .connection import _LockedObject, DEFAULT_WINDOW_SIZE
+from .exceptions import ConnectionError, StreamResetError
+from .response import HTTP20Response, strip_headers
+from .stream import Stream, FILE_BLOCK_SIZE
+from .window import FlowControlManager
+from . import errors
+
+log = logging.getLogger(__name__)
+
+
+class AsyncHTTP20Connection(object):
+    """
+    An object representing a single HTTP/2 connection to a server, driven by
+    asyncio.
+
+    This object offers the same request interface as
+    :class:`HTTP20Connection <hyper.HTTP20Connection>`, except that the
+    methods that perform I/O are coroutines. Requests may be issued from any
+    number of tasks running on the connection's event loop.
+
+    :param host: The host to connect to. This may be an IP address or a
+        hostname, and optionally may include a port: for example,
+        ``'http2bin.org'``, ``'http2bin.org:443'`` or ``'127.0.0.1'``.
+    :param port: (optional) The port to connect to. If not provided and one
+        also isn't provided in the ``host`` parameter, defaults to 443.
+    :param secure: (optional) Whether the request should use TLS. Defaults to
+        ``False`` for most requests, but to ``True`` for any request issued to
+        port 443.
+    :param window_manager: (optional) The class to use to manage flow control
+        windows. This needs to be a subclass of the
+        :class:`BaseFlowControlManager
+        <hyper.http20.window.BaseFlowControlManager>`. If not provided,
+        :class:`FlowControlManager <hyper.http20.window.FlowControlManager>`
+        will be used.
+    :param ssl_context: (optional) A class with custom certificate settings.
+        If not provided then hyper's default ``SSLContext`` is used instead.
+    :param timeout: (optional) The timeout for connecting and for waiting on
+        the server, in seconds. May be a ``(connect, read)`` tuple.
+    """
+
+    version = HTTPVersion.http20
+
+    def __init__(self, host, port=None, secure=None, window_manager=None,
+                 ssl_context=None, timeout=None, **kwargs):
+        if port is None:
+            self.host, self.port = to_host_port_tuple(host, default_port=443)
+        else:
+            self.host, self.port = host, port
+
+        if secure is not None:
+            self.secure = secure
+        elif self.port == 443:
+            self.secure = True
+        else:
+            self.secure = False
+
+        self.ssl_context = ssl_context
+
+        #: The size of the reads made from the network. Increase it to
+        #: improve throughput: decrease it to conserve memory. Defaults to
+        #: 64kB.
+        self.network_buffer_size = 65536
+
+        # timeout
+        self._timeout = timeout
+
+        # Serialises concurrent attempts to connect. This is created lazily,
+        # so that it belongs to the loop the connection is used from.
+        self._connect_lock = None
+
+        # Create the mutable state.
+        self.__wm_class = window_manager or FlowControlManager
+        self.__init_state()
+
+    def __init_state(self):
+        """
+        Initializes the 'mutable state' portions of the connection object, so
+        that it can be reused once closed.
+        """
+        self._conn = _LockedObject(h2.connection.H2Connection())
+
+        self.streams = {}
+        self.recent_stream = None
+        self.next_stream_id = 1
+        self.reset_streams = set()
+
+        # The asyncio streams used to talk to the server, and the task that
+        # reads from them.
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+
+        # Tasks waiting for data wait on an event keyed by stream ID (zero
+        # for the connection), set by the read task once it has handed
+        # events to the streams. If the read task dies, the exception it died
+        # with is saved so that the waiting tasks can re-raise it.
+        self._events = {}
+        self._read_error = None
+
+        # Instantiate a window manager.
+        self.window_manager = self.__wm_class(65535)
+
+    @property
+    def _read_timeout(self):
+        if isinstance(self._timeout, tuple):
+            return self._timeout[1]
+        return self._timeout
+
+    async def connect(self):
+        """
+        Connect to the server specified when the object was created. This is a
+        no-op if we're already connected.
+
+        :returns: Nothing.
+        """
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+
+            if isinstance(self._timeout, tuple):
+                connect_timeout = self._timeout[0]
+            else:
+                connect_timeout = self._timeout
+
+            if self.secure:
+                ssl_context = self.ssl_context or _default_context()
+                server_hostname = self.host
+            else:
+                ssl_context = None
+                server_hostname = None
+
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host,
+                    self.port,
+                    ssl=ssl_context,
+                    server_hostname=server_hostname,
+                ),
+                connect_timeout,
+            )
+
+            if self.secure:
+                ssl_object = writer.get_extra_info('ssl_object')
+                proto = ssl_object.selected_alpn_protocol()
+                log.debug("Selected ALPN protocol: %s", proto)
+                if proto not in H2_NPN_PROTOCOLS:
+                    writer.close()
+                    raise ConnectionError(
+                        "No suitable protocol found. Supported protocols: "
+                        "%s." % ','.join(H2_NPN_PROTOCOLS)
+                    )
+
+            self._reader, self._writer = reader, writer
+
+            # Send the preamble, then wait for the server's settings before
+            # letting anyone else on to the connection.
+            with self._conn as conn:
+                conn.initiate_connection()
+                conn.update_settings({h2.settings.ENABLE_PUSH: 0})
+            self._send_outstanding_data()
+
+            data = await asyncio.wait_for(
+                reader.read(self.network_buffer_size), self._read_timeout
+            )
+            if not data:
+                raise ConnectionResetError()
+            self._receive_data(data)
+
+            self._read_task = asyncio.ensure_future(self._read_loop(reader))
+
+    async def request(self, method, url, body=None, headers=None):
+        """
+        This will send a request to the server using the HTTP request method
+        ``method`` and the selector ``url``. If the ``body`` argument is
+        present, it should be string or bytes object of data to send after the
+        headers are finished. Strings are encoded as UTF-8. To use other
+        encodings, pass a bytes object.
+
+        :param method: The request method, e.g. ``'GET'``.
+        :param url: The URL to contact, e.g. ``'/path/segment'``.
+        :param body: (optional) The request body to send. Must be a bytestring
+            or a file-like object.
+        :param headers: (optional) The headers to send on the request.
+        :returns: A stream ID for the request.
+        """
+        headers = headers or {}
+
+        await self.connect()
+
+        # Concurrency
+        #
+        # There must be no awaits between creating the stream and sending its
+        # headers: otherwise another task could open a higher-numbered stream
+        # first, and this one would be refused by h2.
+        stream = self._new_stream()
+        stream.add_header(":method", method)
+        stream.add_header(":scheme", "https" if self.secure else "http")
+        stream.add_header(":authority", self.host)
+        stream.add_header(":path", url)
+        self.recent_stream = stream
+
+        default_headers = (':method', ':scheme', ':authority', ':path')
+        for name, value in headers.items():
+            is_default = to_native_string(name) in default_headers
+            stream.add_header(name, value, replace=is_default)
+
+        if body and isinstance(body, (unicode, bytes)):
+            body = to_bytestring(body)
+
+        stream.send_headers(end_stream=(body is None))
+
+        if body is not None:
+            await self._send_body(stream, body)
+
+        await self._writer.drain()
+
+        return stream.stream_id
+
+    async def get_response(self, stream_id=None):
+        """
+        Should be called after a request is sent to get a response from the
+        server. If sending multiple parallel requests, pass the stream ID of
+        the request whose response you want. Returns an
+        :class:`AsyncHTTP20Response <hyper.http20.aio.AsyncHTTP20Response>`
+        instance.
+
+        :param stream_id: (optional) The stream ID of the request for which to
+            get a response.
+        :returns: An :class:`AsyncHTTP20Response
+            <hyper.http20.aio.AsyncHTTP20Response>` object.
+        """
+        stream = self._get_stream(stream_id)
+
+        while stream.response_headers is None:
+            await self._wait_for_data(stream.stream_id)
+
+        # Find the Content-Length header if present.
+        stream._in_window_manager.document_size = (
+            int(stream.response_headers.get(b'content-length', [0])[0])
+        )
+
+        return AsyncHTTP20Response(stream.response_headers, stream, self)
+
+    def close(self, error_code=None):
+        """
+        Close the connection to the server.
+
+        :param error_code: (optional) The error code to reset all streams with.
+        :returns: Nothing.
+        """
+        for stream in list(self.streams.values()):
+            log.debug("Close stream %d" % stream.stream_id)
+            stream.close(error_code)
+
+        try:
+            with self._conn as conn:
+                conn.close_connection(error_code or 0)
+            self._send_outstanding_data()
+        except Exception as e:  # pragma: no cover
+            log.warn("GoAway frame could not be sent: %s" % e)
+
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+        self._wake_all()
+        self.__init_state()
+
+    def _get_stream(self, stream_id):
+        if stream_id is None:
+            return self.recent_stream
+        elif stream_id in self.reset_streams or stream_id not in self.streams:
+            raise StreamResetError("Stream forcefully closed")
+        else:
+            return self.streams[stream_id]
+
+    def _new_stream(self, stream_id=None, local_closed=False):
+        """
+        Returns a new stream object for this connection.
+        """
+        s = Stream(
+            stream_id or self.next_stream_id,
+            self.__wm_class(DEFAULT_WINDOW_SIZE),
+            self._conn,
+            self._send_outstanding_data,
+            self._recv_cb,
+            self._stream_close_cb,
+        )
+        s.local_closed = local_closed
+        self.streams[s.stream_id] = s
+        self.next_stream_id += 2
+
+        return s
+
+    async def _send_body(self, stream, body):
+        """
+        Sends a request body on a stream, waiting for the flow control window
+        to open as needed.
+        """
+        if not hasattr(body, 'read'):
+            await self._send_data(stream, body, final=True)
+            return
+
+        block = body.read(FILE_BLOCK_SIZE)
+        while True:
+            next_block = body.read(FILE_BLOCK_SIZE)
+            await self._send_data(stream, block, final=not next_block)
+            if not next_block:
+                break
+            block = next_block
+
+    async def _send_data(self, stream, data, final):
+        """
+        Sends a single block of data on a stream, split into frames no larger
+        than the flow control window and the maximum frame size allow.
+        """
+        view = memoryview(data)
+
+        while True:
+            with self._conn as conn:
+                window = conn.local_flow_control_window(stream.stream_id)
+                size = min(len(view), window, conn.max_outbound_frame_size)
+
+            if view and not size:
+                await self._wait_for_data(0)
+                continue
+
+            chunk, view = view[:size], view[size:]
+            end_stream = final and not view
+            with self._conn as conn:
+                conn.send_data(
+                    stream.stream_id, chunk, end_stream=end_stream
+                )
+            self._send_outstanding_data()
+            await self._writer.drain()
+
+            if not view:
+                break
+
+        if final:
+            stream.local_closed = True
+
+    def _send_outstanding_data(self, tolerate_peer_gone=False,
+                               send_empty=True):
+        """
+        Hands whatever data h2 has for the server to the transport. The
+        transport buffers it, so this never blocks.
+        """
+        with self._conn as conn:
+            data = conn.data_to_send()
+        if data and self._writer is not None:
+            self._writer.write(data)
+
+    def _recv_cb(self, stream_id=0):
+        """
+        The blocking read callback handed to streams. Asynchronous
+        connections only ever read from their read task, so streams must
+        never need this.
+        """
+        raise RuntimeError(
+            "Blocking reads are not supported on asynchronous connections."
+        )
+
+    def _stream_close_cb(self, stream_id):
+        """
+        Called by a stream when it is closing, so that state can be cleared.
+        """
+        self.streams.pop(stream_id, None)
+
+        event = self._events.pop(stream_id, None)
+        if event is not None:
+            event.set()
+
+    async def _wait_for_data(self, stream_id):
+        """
+        Waits until the read task has handled data for the given stream, or
+        for the connection if ``stream_id`` is zero.
+        """
+        if self._read_error is not None:
+            raise self._read_error
+
+        if self._writer is None:
+            raise ConnectionError('tried to read after connection close')
+
+        if stream_id:
+            self._get_stream(stream_id)
+
+        event = self._events.get(stream_id)
+        if event is None:
+            event = self._events[stream_id] = asyncio.Event()
+
+        await asyncio.wait_for(event.wait(), self._read_timeout)
+        event.clear()
+
+    def _wake(self, stream_ids):
+        """
+        Wakes the tasks waiting on the given streams and on the connection.
+        """
+        for stream_id in itertools.chain(stream_ids, [0]):
+            event = self._events.get(stream_id)
+            if event is not None:
+                event.set()
+
+    def _wake_all(self):
+        for event in self._events.values():
+            event.set()
+
+    async def _read_loop(self, reader):
+        """
+        The body of the read task. Reads from the network and dispatches the
+        resulting events until the connection is closed or the read fails.
+        """
+        try:
+            while self._reader is reader:
+                data = await reader.read(self.network_buffer_size)
+                if not data:
+                    raise ConnectionResetError()
+                self._wake(self._receive_data(data))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self._reader is reader:
+                log.debug("Read task stopped: %r", e)
+                self._read_error = e
+        finally:
+            self._wake_all()
+
+    def _receive_data(self, data):
+        """
+        Hands some data received from the server to the h2 connection object,
+        and the resulting events to the streams.
+
+        :returns: The set of IDs of the streams that received events.
+        """
+        with self._conn as conn:
+            events = conn.receive_data(data)
+        stream_ids = set(getattr(e, 'stream_id', 0) for e in events)
+        stream_ids.discard(0)
+
+        for event in events:
+            if isinstance(event, h2.events.DataReceived):
+                self._adjust_receive_window(event.flow_controlled_length)
+                self.streams[event.stream_id].receive_data(event)
+            elif isinstance(event, h2.events.PushedStreamReceived):
+                # We never enable push, so just refuse the stream.
+                with self._conn as conn:
+                    conn.reset_stream(event.pushed_stream_id, error_code=7)
+                self.reset_streams.add(event.pushed_stream_id)
+            elif isinstance(event, h2.events.ResponseReceived):
+                self.streams[event.stream_id].receive_response(event)
+            elif isinstance(event, h2.events.TrailersReceived):
+                self.streams[event.stream_id].receive_trailers(event)
+            elif isinstance(event, h2.events.StreamEnded):
+                self.streams[event.stream_id].receive_end_stream(event)
+            elif isinstance(event, h2.events.StreamReset):
+                if event.stream_id not in self.reset_streams:
+                    self.reset_streams.add(event.stream_id)
+                    self.streams[event.stream_id].receive_reset(event)
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self._connection_terminated(event)
+            else:
+                log.info("Received unhandled event %s", event)
+
+        self._send_outstanding_data()
+
+        return stream_ids
+
+    def _adjust_receive_window(self, frame_len):
+        """
+        Adjusts the window size in response to receiving a DATA frame of length
+        ``frame_len``. May send a WINDOWUPDATE frame if necessary.
+        """
+        increment = self.window_manager._handle_frame(frame_len)
+
+        if increment:
+            with self._conn as conn:
+                conn.increment_flow_control_window(increment)
+
+    def _connection_terminated(self, event):
+        """
+        Handles a GOAWAY from the server. If the error code is zero this is a
+        graceful shutdown: otherwise, raise an exception.
+        """
+        self.close()
+
+        if event.error_code != 0:
+            try:
+                name, number, description = errors.get_data(event.error_code)
+            except ValueError:
+                error_string = "Encountered error code %d" % event.error_code
+            else:
+                error_string = (
+                    "Encountered error %s %s: %s" % (name, number, description)
+                )
+
+            raise ConnectionError(error_string)
+
+    # The following two methods are the implementation of the asynchronous
+    # context manager protocol.
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, tb):
+        self.close()
+        return False  # Never swallow exceptions.
+
+
+class AsyncHTTP20Response(HTTP20Response):
+    """
+    An ``AsyncHTTP20Response`` wraps the HTTP/2 response from the server on
+    an :class:`AsyncHTTP20Connection <hyper.http20.aio.AsyncHTTP20Connection>`.
+    It behaves like :class:`HTTP20Response <hyper.HTTP20Response>`, except
+    that the methods that wait for the server are coroutines.
+    """
+    def __init__(self, headers, stream, connection):
+        super(AsyncHTTP20Response, self).__init__(headers, stream)
+
+        # The connection whose read task feeds our stream.
+        self._connection = connection
+
+    async def trailers(self):
+        """
+        Trailers on the HTTP message, if any.
+
+        .. warning:: Note that this method requires that the stream is
+                     totally exhausted. This means that, if you have not
+                     completely read from the stream, all stream data will be
+                     read into memory.
+        """
+        if self._trailers is None:
+            while not self._stream.remote_closed:
+                await self._connection._wait_for_data(self._stream.stream_id)
+
+            trailers = self._stream.response_trailers or FrozenHTTPHeaderMap()
+            strip_headers(trailers)
+            self._trailers = FrozenHTTPHeaderMap(trailers.iter_raw())
+
+        return self._trailers
+
+    async def read(self, amt=None, decode_content=True):
+        """
+        Reads the response body, or up to the next ``amt`` bytes.
+
+        :param amt: (optional) The amount of data to read. If not provided, all
+            the data will be read from the response.
+        :param decode_content: (optional) If ``True``, will transparently
+            decode the response data.
+        :returns: The read data. Note that if ``decode_content`` is set to
+            ``True``, the actual amount of data returned may be different to
+            the amount requested.
+        """
+        if self._decoded_data:
+            if amt is not None:
+                return self._read_decoded(amt, decode_content)
+
+            data, self._decoded_data = self._decoded_data, b''
+            return data + await self.read(decode_content=decode_content)
+
+        stream = self._stream
+
+        def buffered():
+            return len(self._data_buffer) + stream._data_size
+
+        while not stream.remote_closed and (amt is None or buffered() < amt):
+            await self._connection._wait_for_data(stream.stream_id)
+
+        self._data_buffer += b''.join(stream._take_data())
+
+        if amt is None:
+            data = bytes(self._data_buffer)
+            self._data_buffer = bytearray()
+        else:
+            data = self._read_buffered(amt)
+        response_complete = stream.remote_closed and not self._data_buffer
+
+        if decode_content and self._decompressobj and data:
+            data = self._decompressobj.decompress(data)
+
+        if response_complete:
+            if decode_content and self._decompressobj:
+                data += self._decompressobj.flush()
+
+            self._release()
+
+        return data
+
+    async def readinto(self, b):
+        """
+        Reads up to ``len(b)`` bytes of the response body into ``b``, which
+        must be a writable bytes-like object such as a ``bytearray``. The body
+        is decoded, as it is by ``read()``.
+
+        :param b: The buffer to read into.
+        :returns: The number of bytes read into ``b``. This is only ``0`` at
+            the end of the body, or if ``b`` is empty.
+        """
+        view = memoryview(b)
+        if not len(view):
+            return 0
+
+        data = self._decoded_data
+        while not data and not self._body_complete:
+            data = await self.read(len(view))
+
+        return self._readinto_decoded(view, data)
+
+    def read_chunked(self, decode_content=True):
+        """
+        Reads chunked transfer encoded bodies. This method returns an
+        asynchronous iterator: each iteration of which yields one data frame
+        *unless* the frames contain compressed data and ``decode_content`` is
+        ``True``, in which case it yields whatever the decompressor provides
+        for each chunk.
+
+        .. warning:: This may yield the empty string, without that being the
+                     end of the body!
+        """
+        return _ChunkIterator(self, decode_content)
+
+    async def _read_one_frame(self):
+        """
+        Waits for a single data frame on the stream and returns it, or
+        ``None`` if the stream has ended.
+        """
+        stream = self._stream
+
+        while not stream.remote_closed and not stream.data:
+            await self._connection._wait_for_data(stream.stream_id)
+
+        return stream._take_frame()
+
+    # The following two methods are the implementation of the asynchronous
+    # context manager protocol.
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+        return False  # Never swallow exceptions.
+
+
+class _ChunkIterator(object):
+    """
+    The asynchronous iterator returned by
+    :meth:`AsyncHTTP20Response.read_chunked()
+    <hyper.http20.aio.AsyncHTTP20Response.read_chunked>`.
+    """
+    def __init__(self, response, decode_content):
+        self._response = response
+        self._decode_content = decode_content
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+
+        response = self._response
+        decompressobj = self._decode_content and response._decompressobj
+
+        data = await response._read_one_frame()
+        if data is None:
+            self._done = True
+            response.close()
+
+            if decompressobj:
+                return decompressobj.flush()
+
+            raise StopAsyncIteration
+
+        if decompressobj:
+            data = decompressobj.decompress(data)
+
+        return data
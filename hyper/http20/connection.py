@@ -17,25 +17,41 @@ from ..common.headers import HTTPHeaderMap
 from ..common.util import (
     to_host_port_tuple, to_native_string, to_bytestring, HTTPVersion
 )
-from ..compat import unicode, bytes
+from ..compat import unicode, bytes, is_py2
 from ..http11.connection import _create_tunnel
 from .stream import Stream
 from .response import HTTP20Response, HTTP20Push
 from .window import FlowControlManager
-from .exceptions import ConnectionError, StreamResetError
+from .exceptions import (
+    ConnectionError, StreamResetError, TooManyStreamsError
+)
 from . import errors
 
 import errno
 import logging
 import socket
+import struct
 import time
 import threading
 import itertools
+from contextlib import contextmanager
 
 log = logging.getLogger(__name__)
 
 DEFAULT_WINDOW_SIZE = 65535
 
+# The length of an HTTP/2 frame header, which starts with the length of the
+# frame's payload as a 24-bit integer.
+FRAME_HEADER_LENGTH = 9
+
+# How often, in seconds, the background reader thread wakes up to check
+# whether its connection has been closed underneath it.
+READER_POLL_INTERVAL = 1.0
+
+# The opaque data of the PING frames sent to measure the round trip time for
+# flow control managers.
+PROBE_PING_DATA = b'hyperbdp'
+
 TRANSIENT_SSL_ERRORS = (ssl.SSL_ERROR_WANT_READ, ssl.SSL_ERROR_WANT_WRITE)
 
 
@@ -95,6 +111,37 @@ class HTTP20Connection(object):
         and one also isn't provided in the ``proxy_host`` parameter, defaults
         to 8080.
     :param proxy_headers: (optional) The headers to send to a proxy.
+    :param reader_thread: (optional) Whether to read from the socket in a
+        dedicated background thread. When enabled, that thread owns the
+        socket and hands incoming data to the streams, so that threads waiting
+        on different streams are not serialised behind whichever thread is
+        currently blocked reading. Defaults to ``False``.
+    :param settings: (optional) The HTTP/2 settings to send to the server, as
+        a dictionary mapping setting codes from :mod:`h2.settings` to their
+        values: for example, ``{h2.settings.INITIAL_WINDOW_SIZE: 2**24}``.
+        ``INITIAL_WINDOW_SIZE``, ``MAX_FRAME_SIZE``, ``HEADER_TABLE_SIZE``,
+        ``MAX_CONCURRENT_STREAMS`` and ``MAX_HEADER_LIST_SIZE`` may be set.
+        ``ENABLE_PUSH`` is always set from ``enable_push``. If the initial
+        window size is larger than the default of 65535 bytes, the connection
+        window is opened to match as soon as the connection is made.
+    :param credit_on_read: (optional) Whether to return flow control credit
+        to the server only as response data is read, rather than as it
+        arrives. The server then can't send more data than the receive windows
+        allow until the application reads what it has already sent, which
+        keeps slow readers from buffering unbounded amounts of data. Defaults
+        to ``False``.
+    :param max_buffered_bytes: (optional) The most response data, in bytes,
+        that may be buffered on the connection at once, counting both the
+        data that has arrived and the data the server may still send. Enables
+        ``credit_on_read``. It may not be smaller than 65535 bytes, the size
+        of the connection window before any credit is returned. Defaults to
+        ``None``, which leaves buffering bounded only by the window managers.
+    :param stream_wait_timeout: (optional) How long, in seconds, a new request
+        waits for a stream when the server's limit on concurrent streams has
+        been reached. Requests wait until one of the open streams closes, and
+        raise :class:`TooManyStreamsError
+        <hyper.http20.exceptions.TooManyStreamsError>` if none does in time.
+        Defaults to ``None``, which waits for as long as it takes.
     """
 
     version = HTTPVersion.http20
@@ -102,7 +149,9 @@ class HTTP20Connection(object):
     def __init__(self, host, port=None, secure=None, window_manager=None,
                  enable_push=False, ssl_context=None, proxy_host=None,
                  proxy_port=None, force_proto=None, proxy_headers=None,
-                 timeout=None, **kwargs):
+                 timeout=None, reader_thread=False, settings=None,
+                 credit_on_read=False, max_buffered_bytes=None,
+                 stream_wait_timeout=None, **kwargs):
         """
         Creates an HTTP/2 connection to a specific server.
         """
@@ -141,12 +190,40 @@ class HTTP20Connection(object):
 
         self.force_proto = force_proto
 
+        self._use_reader_thread = reader_thread
+
+        # The settings sent to the server, and the size they give the receive
+        # windows of new streams.
+        self._settings = dict(settings or {})
+        self._initial_window_size = self._settings.get(
+            h2.settings.INITIAL_WINDOW_SIZE, DEFAULT_WINDOW_SIZE
+        )
+
+        # Whether flow control credit is returned as data is read, and the
+        # limit on the data buffered on the connection if there is one.
+        if (max_buffered_bytes is not None and
+                max_buffered_bytes < DEFAULT_WINDOW_SIZE):
+            raise ValueError(
+                "max_buffered_bytes must be at least %d" % DEFAULT_WINDOW_SIZE
+            )
+        self._credit_on_read = credit_on_read or max_buffered_bytes is not None
+        self._max_buffered_bytes = max_buffered_bytes
+
+        # How long new requests wait for the server to allow another stream.
+        self._stream_wait_timeout = stream_wait_timeout
+
         # Concurrency
         #
         # Use one universal lock (_lock) to synchronize all interaction
         # with global connection state, _send_cb and _recv_cb.
         self._lock = threading.RLock()
 
+        # While the connection is "corked", h2 output is left queued in the
+        # H2Connection rather than written out after every operation. It is
+        # written in a single call when the outermost cork is removed. The
+        # depth is only changed with _lock held.
+        self._cork_depth = 0
+
         # Create the mutable state.
         self.__wm_class = window_manager or FlowControlManager
         self.__init_state()
@@ -190,11 +267,42 @@ class HTTP20Connection(object):
         self.reset_streams = set()
         self.recent_recv_streams = set()
 
+        # The IDs of the streams we've created but not yet sent headers on.
+        # They don't count against the server's limit on concurrent streams
+        # until they're opened, so they're counted here instead.
+        self._unopened_streams = set()
+
         # The socket used to send data.
         self._sock = None
 
-        # Instantiate a window manager.
-        self.window_manager = self.__wm_class(65535)
+        # Received data is handed to h2 a frame at a time. When the last frame
+        # handed over was incomplete, this is how much of it is still to come.
+        self._partial_frame_length = 0
+
+        # When the PING frame of a flow control probe was sent, if one is
+        # under way.
+        self._probe_sent_at = None
+
+        # Instantiate a window manager. The connection window starts at the
+        # default size, and is opened to the initial stream window size if
+        # that's larger, as far as the buffering limit allows.
+        window_size = max(self._initial_window_size, DEFAULT_WINDOW_SIZE)
+        if self._max_buffered_bytes is not None:
+            window_size = min(window_size, self._max_buffered_bytes)
+        self.window_manager = self.__wm_class(window_size)
+
+        # The credit the window manager has handed out but which is being
+        # held back to keep the connection under its buffering limit.
+        self._withheld_credit = 0
+
+        # The background reader thread, if one is in use. Threads waiting for
+        # data wait on a condition (keyed by stream ID, zero for the
+        # connection) that the reader notifies once it has dispatched events.
+        # If the reader dies, the exception it died with is saved so that the
+        # waiting threads can re-raise it.
+        self._reader = None
+        self._reader_error = None
+        self._read_conditions = {}
 
         return
 
@@ -256,16 +364,7 @@ class HTTP20Connection(object):
             # to use absolute URI when proxying.
 
             stream_id = self.putrequest(method, url)
-
-            default_headers = (':method', ':scheme', ':authority', ':path')
-            all_headers = headers.items()
-            if self.proxy_host and not self.secure:
-                proxy_headers = self.proxy_headers or {}
-                all_headers = itertools.chain(all_headers,
-                                              proxy_headers.items())
-            for name, value in all_headers:
-                is_default = to_native_string(name) in default_headers
-                self.putheader(name, value, stream_id, replace=is_default)
+            self._put_request_headers(stream_id, headers)
 
             # Convert the body to bytes if needed.
             if body and isinstance(body, (unicode, bytes)):
@@ -275,6 +374,73 @@ class HTTP20Connection(object):
 
             return stream_id
 
+    def request_many(self, requests):
+        """
+        Sends several requests to the server at once. The header blocks of all
+        the requests are encoded together and written to the network in a
+        single write, followed by any request bodies. This is considerably
+        cheaper than calling :meth:`request() <hyper.HTTP20Connection.request>`
+        once per request when fanning out many requests at a time.
+
+        Concurrency
+        -----------
+
+        This method is thread-safe.
+
+        :param requests: An iterable of ``(method, url, body, headers)``
+            tuples, with the same meanings as the arguments to
+            :meth:`request() <hyper.HTTP20Connection.request>`. ``body`` and
+            ``headers`` may be ``None``.
+        :returns: A list of the stream IDs of the requests, in the order the
+            requests were provided.
+        """
+        self.connect()
+
+        # Concurrency
+        #
+        # Hold _lock for the same reasons as in request(): the streams must
+        # be opened and their headers sent in stream ID order. The connection
+        # is corked so that the header blocks go out together.
+        with self._corked():
+            pending = []
+
+            for method, url, body, headers in requests:
+                stream_id = self.putrequest(method, url)
+                self._put_request_headers(stream_id, headers or {})
+
+                if body and isinstance(body, (unicode, bytes)):
+                    body = to_bytestring(body)
+
+                stream = self.streams[stream_id]
+                stream.send_headers(end_stream=not body)
+                self._unopened_streams.discard(stream_id)
+                pending.append((stream, body))
+
+            # Bodies may have to wait for flow control window, so get the
+            # headers onto the wire first.
+            self._flush_outstanding_data(send_empty=False)
+
+            for stream, body in pending:
+                if body:
+                    stream.send_data(body, final=True)
+
+            return [stream.stream_id for stream, _ in pending]
+
+    def _put_request_headers(self, stream_id, headers):
+        """
+        Adds the user's headers, and any proxy headers we need, to a request
+        started with ``putrequest``.
+        """
+        default_headers = (':method', ':scheme', ':authority', ':path')
+        all_headers = headers.items()
+        if self.proxy_host and not self.secure:
+            proxy_headers = self.proxy_headers or {}
+            all_headers = itertools.chain(all_headers,
+                                          proxy_headers.items())
+        for name, value in all_headers:
+            is_default = to_native_string(name) in default_headers
+            self.putheader(name, value, stream_id, replace=is_default)
+
     def _get_stream(self, stream_id):
         if stream_id is None:
             return self.recent_stream
@@ -402,9 +568,7 @@ class HTTP20Connection(object):
 
         with self._conn as conn:
             conn.initiate_upgrade_connection()
-            conn.update_settings(
-                {h2.settings.ENABLE_PUSH: int(self._enable_push)}
-            )
+            self._update_settings(conn)
         self._send_outstanding_data()
 
         # The server will also send an initial settings frame, so get it.
@@ -414,6 +578,7 @@ class HTTP20Connection(object):
         self.recent_stream = s
 
         self._recv_cb()
+        self._start_reader()
 
     def _send_preamble(self):
         """
@@ -423,13 +588,128 @@ class HTTP20Connection(object):
         # connection, followed by an initial settings frame.
         with self._conn as conn:
             conn.initiate_connection()
-            conn.update_settings(
-                {h2.settings.ENABLE_PUSH: int(self._enable_push)}
-            )
+            self._update_settings(conn)
         self._send_outstanding_data()
 
         # The server will also send an initial settings frame, so get it.
         self._recv_cb()
+        self._start_reader()
+
+    def _update_settings(self, conn):
+        """
+        Queues the settings frame sent when the connection is made, followed
+        by a WINDOW_UPDATE frame if the connection window needs opening.
+        """
+        settings = dict(self._settings)
+        settings[h2.settings.ENABLE_PUSH] = int(self._enable_push)
+        conn.update_settings(settings)
+
+        window_size = self.window_manager.initial_window_size
+        if window_size > DEFAULT_WINDOW_SIZE:
+            increment = window_size - DEFAULT_WINDOW_SIZE
+            conn.increment_flow_control_window(increment)
+
+    def _start_reader(self):
+        """
+        Starts the background reader thread, if this connection uses one.
+        """
+        if not self._use_reader_thread or self._reader is not None:
+            return
+
+        self._reader = threading.Thread(
+            target=self._reader_loop,
+            args=(self._sock,),
+            name='hyper-h2-reader-%s:%s' % (self.host, self.port),
+        )
+        self._reader.daemon = True
+        self._reader.start()
+
+    def _reader_loop(self, sock):
+        """
+        The body of the background reader thread. Reads from ``sock`` and
+        dispatches the resulting events until the connection is closed or the
+        read fails.
+        """
+        try:
+            while self._sock is sock:
+                # Buffered data is ignored: it can only be the start of a
+                # frame header, and reading the rest of it would block while
+                # holding the lock.
+                if sock.wait_readable(READER_POLL_INTERVAL, buffered=False):
+                    self._wake_readers(self._single_read(sock=sock))
+        except Exception as e:
+            # Concurrency
+            #
+            # Hold _lock: only record the failure if the connection hasn't
+            # been closed (and possibly reopened) in the meantime.
+            with self._lock:
+                if self._sock is sock:
+                    log.debug("Reader thread stopped: %r", e)
+                    self._reader_error = e
+        finally:
+            self._wake_readers()
+
+    def _wake_readers(self, stream_ids=None):
+        """
+        Wakes threads waiting on the background reader. If ``stream_ids`` is
+        provided, only waiters on those streams and on the connection itself
+        are woken: otherwise, everybody is.
+        """
+        # Concurrency
+        #
+        # Hold _lock: the read conditions share it, and the pending-read set
+        # must not change underneath a waiter that is about to sleep.
+        with self._lock:
+            if stream_ids is None:
+                conditions = list(self._read_conditions.values())
+            else:
+                self.recent_recv_streams.add(0)
+                conditions = [
+                    self._read_conditions[stream_id]
+                    for stream_id in stream_ids | set([0])
+                    if stream_id in self._read_conditions
+                ]
+
+            for condition in conditions:
+                condition.notify_all()
+
+    def _wait_for_reader(self, stream_id):
+        """
+        Used in place of reading from the socket when the background reader
+        thread owns it. Blocks until the reader has handled data for the
+        stream, or for the connection if ``stream_id`` is zero.
+        """
+        if isinstance(self._timeout, tuple):
+            read_timeout = self._timeout[1]
+        else:
+            read_timeout = self._timeout
+
+        # Concurrency
+        #
+        # The condition wraps _lock, so waiting releases it (however many
+        # times this thread has acquired it) and the reader can get on with
+        # dispatching data and sending any frames it needs to.
+        with self._lock:
+            if self._reader_error is not None:
+                raise self._reader_error
+
+            if self._sock is None:
+                raise ConnectionError('tried to read after connection close')
+
+            if stream_id in self.recent_recv_streams:
+                self.recent_recv_streams.discard(stream_id)
+                return
+
+            if stream_id:
+                self._get_stream(stream_id)
+
+            condition = self._read_conditions.get(stream_id)
+            if condition is None:
+                condition = threading.Condition(self._lock)
+                self._read_conditions[stream_id] = condition
+
+            if not condition.wait(read_timeout):
+                raise socket.timeout('timed out')
 
     def close(self, error_code=None):
         """
@@ -450,26 +730,47 @@ class HTTP20Connection(object):
         # of new streams while the connection is being closed.
         #
         # I/O occurs while the lock is held; waiting threads will see a delay.
-        with self._lock:
+        with self._corked(tolerate_peer_gone=True):
             # Close all streams
             for stream in list(self.streams.values()):
                 log.debug("Close stream %d" % stream.stream_id)
                 stream.close(error_code)
 
-            # Send GoAway frame to the server
+            # Send GoAway frame to the server, along with any stream resets.
+            # The socket is about to go away, so this is flushed even if an
+            # outer caller has corked the connection.
             try:
                 with self._conn as conn:
                     conn.close_connection(error_code or 0)
-                self._send_outstanding_data(tolerate_peer_gone=True)
+                self._flush_outstanding_data(tolerate_peer_gone=True)
             except Exception as e:  # pragma: no cover
                 log.warn("GoAway frame could not be sent: %s" % e)
 
             if self._sock is not None:
                 self._sock.close()
+            self._wake_readers()
             self.__init_state()
 
     def _send_outstanding_data(self, tolerate_peer_gone=False,
                                send_empty=True):
+        """
+        Writes out whatever h2 has queued for sending, unless the connection
+        is corked, in which case the data stays queued until it is uncorked.
+        """
+        # Concurrency
+        #
+        # Hold _lock; the cork depth is only meaningful with the lock held.
+        with self._lock:
+            if self._cork_depth:
+                return
+
+            self._flush_outstanding_data(tolerate_peer_gone, send_empty)
+
+    def _flush_outstanding_data(self, tolerate_peer_gone=False,
+                                send_empty=True):
+        """
+        Writes out whatever h2 has queued for sending, regardless of corking.
+        """
         # Concurrency
         #
         # Hold _lock; getting and writing data from _conn is synchronized
@@ -481,6 +782,54 @@ class HTTP20Connection(object):
             if data or send_empty:
                 self._send_cb(data, tolerate_peer_gone=tolerate_peer_gone)
 
+    @contextmanager
+    def _corked(self, tolerate_peer_gone=False):
+        """
+        A context manager that holds back writes to the network for its
+        duration. Everything h2 queued in the meantime is written in one call
+        when the outermost ``_corked`` block exits, rather than in one call
+        per frame. Corks nest.
+
+        The lock is held for the duration of the block.
+        """
+        with self._lock:
+            self._cork_depth += 1
+            try:
+                yield
+            finally:
+                self._cork_depth -= 1
+
+            # Only flush on a clean exit: if the block raised, the queued data
+            # is written with whatever is sent next.
+            if not self._cork_depth and self._sock is not None:
+                self._send_outstanding_data(
+                    tolerate_peer_gone=tolerate_peer_gone, send_empty=False
+                )
+
+    @contextmanager
+    def _uncorked(self):
+        """
+        A context manager that flushes any corked data and lifts the cork for
+        its duration. This must wrap anything that blocks waiting for the
+        remote peer, as the peer may be waiting on the data we're holding
+        back.
+        """
+        # Concurrency
+        #
+        # Hold _lock; the cork belongs to whichever thread holds the lock, so
+        # it's lifted here in case this thread gives up the lock while it
+        # waits (e.g. for the reader thread) and lets another thread write.
+        with self._lock:
+            depth, self._cork_depth = self._cork_depth, 0
+            try:
+                if depth and self._sock is not None:
+                    self._flush_outstanding_data(
+                        tolerate_peer_gone=True, send_empty=False
+                    )
+                yield
+            finally:
+                self._cork_depth = depth
+
     def putrequest(self, method, selector, **kwargs):
         """
         This should be the first call for sending a given HTTP request to a
@@ -493,12 +842,26 @@ class HTTP20Connection(object):
         This method is thread-safe. It can be called from multiple threads,
         and each thread should receive a unique stream ID.
 
+        If the server's limit on concurrent streams has been reached, this
+        waits for one of the open streams to close.
+
         :param method: The request method, e.g. ``'GET'``.
         :param selector: The path selector.
         :returns: A stream ID for the request.
         """
         # Create a new stream.
-        s = self._new_stream()
+        #
+        # Concurrency
+        #
+        # Hold _lock: no other thread may take the free stream between the
+        # wait and the stream's creation.
+        #
+        # I/O may occur while the lock is held; waiting threads may see a
+        # delay.
+        with self._lock:
+            self._wait_for_stream()
+            s = self._new_stream()
+            self._unopened_streams.add(s.stream_id)
 
         # To this stream we need to immediately add a few headers that are
         # HTTP/2 specific. These are: ":method", ":scheme", ":authority" and
@@ -566,16 +929,18 @@ class HTTP20Connection(object):
         # Concurrency:
         #
         # Hold _lock: synchronize access to the connection's HPACK
-        # encoder and decoder and the subsquent write to the connection
-        with self._lock:
+        # encoder and decoder and the subsquent write to the connection.
+        #
+        # The connection is corked so that the headers and as much of the
+        # body as the flow control window allows go out in a single write.
+        with self._corked():
             stream.send_headers(headers_only)
+            self._unopened_streams.discard(stream.stream_id)
 
             # Send whatever data we have.
             if message_body is not None:
                 stream.send_data(message_body, final)
 
-            self._send_outstanding_data()
-
         return
 
     def send(self, data, final=False, stream_id=None):
@@ -597,6 +962,52 @@ class HTTP20Connection(object):
 
         return
 
+    def _stream_usage(self):
+        """
+        Returns the number of streams that count against the server's limit
+        on concurrent streams, and that limit.
+        """
+        with self._conn as conn:
+            return (
+                conn.open_outbound_streams + len(self._unopened_streams),
+                conn.remote_settings.max_concurrent_streams,
+            )
+
+    def _send_window(self):
+        """
+        Returns how much data the connection's flow control window allows to
+        be sent.
+        """
+        with self._conn as conn:
+            return conn.outbound_flow_control_window
+
+    def _wait_for_stream(self):
+        """
+        Blocks until the server's limit on concurrent streams allows another
+        stream to be opened, reading from the connection in the meantime.
+        """
+        if self._stream_wait_timeout is not None:
+            deadline = time.time() + self._stream_wait_timeout
+
+        # Concurrency
+        #
+        # Hold _lock: the streams that are open can't change between the
+        # check and the caller creating its stream. Waiting for the reader
+        # thread releases it.
+        with self._lock:
+            while True:
+                open_streams, limit = self._stream_usage()
+                if open_streams < limit:
+                    return
+
+                if (self._stream_wait_timeout is not None and
+                        time.time() >= deadline):
+                    raise TooManyStreamsError(
+                        "Server allows only %d concurrent streams" % limit
+                    )
+
+                self._recv_cb()
+
     def _new_stream(self, stream_id=None, local_closed=False):
         """
         Returns a new stream object for this connection.
@@ -610,11 +1021,12 @@ class HTTP20Connection(object):
         with self._lock:
             s = Stream(
                 stream_id or self.next_stream_id,
-                self.__wm_class(DEFAULT_WINDOW_SIZE),
+                self.__wm_class(self._initial_window_size),
                 self._conn,
                 self._send_outstanding_data,
                 self._recv_cb,
                 self._stream_close_cb,
+                self._adjust_receive_window if self._credit_on_read else None,
             )
             s.local_closed = local_closed
             self.streams[s.stream_id] = s
@@ -645,6 +1057,9 @@ class HTTP20Connection(object):
         """
         Adjusts the window size in response to receiving a DATA frame of length
         ``frame_len``. May send a WINDOWUPDATE frame if necessary.
+
+        When credit is returned on read, this is instead called as the data is
+        read, and with the padding of each DATA frame as it arrives.
         """
         # Concurrency
         #
@@ -654,8 +1069,23 @@ class HTTP20Connection(object):
         # I/O may occur while the lock is held; waiting threads may see a
         # delay.
         with self._lock:
+            if (self._probe_sent_at is None and
+                    self.window_manager.wants_probe()):
+                self._start_probe()
+
             increment = self.window_manager._handle_frame(frame_len)
 
+            # Everything that's buffered or may still arrive was credited by
+            # the window manager at some point, so holding back whatever it
+            # hands out beyond the limit keeps the buffered data under it.
+            if self._max_buffered_bytes is not None:
+                withheld = max(
+                    self.window_manager.window_size - self._max_buffered_bytes,
+                    0
+                )
+                increment += self._withheld_credit - withheld
+                self._withheld_credit = withheld
+
             if increment:
                 with self._conn as conn:
                     conn.increment_flow_control_window(increment)
@@ -663,10 +1093,65 @@ class HTTP20Connection(object):
 
         return
 
-    def _single_read(self):
+    def _start_probe(self):
+        """
+        Sends a PING frame to measure the round trip time for the flow control
+        managers, and tells them that the probe has started.
+        """
+        # Concurrency
+        #
+        # Hold _lock: the probe state and the set of streams must not change
+        # underneath us.
+        with self._lock:
+            with self._conn as conn:
+                conn.ping(PROBE_PING_DATA)
+            self._send_outstanding_data(tolerate_peer_gone=True)
+            self._probe_sent_at = time.time()
+
+            for manager in self._window_managers():
+                manager.probe_started()
+
+    def _finish_probe(self, event):
+        """
+        Tells the flow control managers the round trip time measured by a
+        probe, if ``event`` acknowledges the probe's PING frame.
+        """
+        # Concurrency
+        #
+        # Hold _lock: the probe state and the set of streams must not change
+        # underneath us.
+        with self._lock:
+            if (event.ping_data != PROBE_PING_DATA or
+                    self._probe_sent_at is None):
+                return
+
+            rtt = time.time() - self._probe_sent_at
+            self._probe_sent_at = None
+
+            for manager in self._window_managers():
+                manager.probe_finished(rtt)
+
+    def _window_managers(self):
+        """
+        Returns the flow control managers of the connection and of its open
+        streams.
+        """
+        return [self.window_manager] + [
+            stream._in_window_manager for stream in self.streams.values()
+        ]
+
+    def _single_read(self, block=True, sock=None):
         """
         Performs a single read from the socket and hands the data off to the
         h2 connection object.
+
+        :param block: (optional) If ``False``, only reads data that is already
+            available, rather than waiting for some to arrive.
+        :param sock: (optional) The socket the caller expects to read from.
+            If the connection has since been closed or reopened with another
+            socket, nothing is read.
+        :returns: The set of IDs of the streams that received events, or
+            ``None`` if ``block`` is ``False`` and there was nothing to read.
         """
         # Begin by reading what we can from the socket.
         #
@@ -676,22 +1161,94 @@ class HTTP20Connection(object):
         #
         # I/O occurs while the lock is held; waiting threads will see a delay.
         with self._lock:
+            if sock is not None and self._sock is not sock:
+                return set()
             if self._sock is None:
                 raise ConnectionError('tried to read after connection close')
-            self._sock.fill()
-            data = self._sock.buffer.tobytes()
-            self._sock.advance_buffer(len(data))
+            if block:
+                self._sock.fill()
+            elif not self._sock.fill(block=False):
+                return None
+
+            # h2 copies the data it's given into its own buffer, so it can be
+            # fed straight from the socket buffer. Feeding it a frame at a
+            # time stops it copying what's left of its buffer after each one.
+            data = self._sock.buffer
+            ends = self._frame_ends(data)
+            self._sock.advance_buffer(ends[-1] if ends else 0)
+
+            events = []
+            start = 0
             with self._conn as conn:
-                events = conn.receive_data(data)
+                for end in ends:
+                    frame = data[start:end]
+                    if is_py2:  # pragma: no cover
+                        frame = frame.tobytes()
+                    events.extend(conn.receive_data(frame))
+                    start = end
             stream_ids = set(getattr(e, 'stream_id', -1) for e in events)
             stream_ids.discard(-1)  # sentinel
             stream_ids.discard(0)  # connection events
             self.recent_recv_streams |= stream_ids
 
+        # Concurrency
+        #
+        # Cork the connection while events are dispatched, so that window
+        # updates, resets and acknowledgements they trigger are written
+        # together once dispatch is complete.
+        with self._corked(tolerate_peer_gone=True):
+            self._handle_events(events)
+
+        return stream_ids
+
+    def _frame_ends(self, data):
+        """
+        Finds where the frames in some received data end, so that they can be
+        handed to h2 one by one. A frame that's incomplete is included if its
+        header has been received, in which case it ends where the data does.
+        """
+        ends = []
+        position = min(self._partial_frame_length, len(data))
+        self._partial_frame_length -= position
+        if position:
+            ends.append(position)
+
+        while len(data) - position >= FRAME_HEADER_LENGTH:
+            length = struct.unpack(
+                '>I', b'\x00' + data[position:position + 3].tobytes()
+            )[0]
+            position += FRAME_HEADER_LENGTH + length
+
+            if position > len(data):
+                self._partial_frame_length = position - len(data)
+                position = len(data)
+
+            ends.append(position)
+
+        return ends
+
+    def _receive_data(self, event):
+        """
+        Hands a chunk of received data to its stream, and adjusts the
+        connection window to match.
+        """
+        # When credit is returned on read, the stream returns the credit for
+        # the data itself, and only the padding is accounted for here.
+        size = event.flow_controlled_length
+        if self._credit_on_read:
+            size -= len(event.data)
+
+        self._adjust_receive_window(size)
+        self.streams[event.stream_id].receive_data(event)
+
+    def _handle_events(self, events):
+        """
+        Hands the events produced by the h2 connection object off to the
+        relevant streams.
+        """
         for event in events:
             if isinstance(event, h2.events.DataReceived):
-                self._adjust_receive_window(event.flow_controlled_length)
-                self.streams[event.stream_id].receive_data(event)
+                self._receive_data(event)
             elif isinstance(event, h2.events.PushedStreamReceived):
                 if self._enable_push:
                     self._new_stream(event.pushed_stream_id, local_closed=True)
@@ -712,6 +1269,8 @@ class HTTP20Connection(object):
                 if event.stream_id not in self.reset_streams:
                     self.reset_streams.add(event.stream_id)
                     self.streams[event.stream_id].receive_reset(event)
+            elif isinstance(event, h2.events.PingAcknowledged):
+                self._finish_probe(event)
             elif isinstance(event, h2.events.ConnectionTerminated):
                 # If we get GoAway with error code zero, we are doing a
                 # graceful shutdown and all is well. Otherwise, throw an
@@ -739,8 +1298,6 @@ class HTTP20Connection(object):
             else:
                 log.info("Received unhandled event %s", event)
 
-        self._send_outstanding_data(tolerate_peer_gone=True, send_empty=False)
-
     def _recv_cb(self, stream_id=0):
         """
         This is the callback used by streams to read data from the connection.
@@ -753,10 +1310,17 @@ class HTTP20Connection(object):
         This is generally called by a stream, not by the connection itself, and
         it's likely that streams will read a frame that doesn't belong to them.
 
+        If the connection has a background reader thread, this instead
+        waits for that thread to hand over some data.
+
         :param stream_id: (optional) The stream ID of the stream reading data
             from the connection.
 
         """
+        if self._reader is not None:
+            with self._uncorked():
+                return self._wait_for_reader(stream_id)
+
         # Begin by reading what we can from the socket.
         #
         # Concurrency
@@ -766,10 +1330,12 @@ class HTTP20Connection(object):
         #
         # The lock here looks broad, but is needed to ensure correct behavior
         # when there are multiple readers of the same stream.  It is
-        # re-acquired in the calls to self._single_read.
+        # re-acquired in the calls to self._single_read. It is taken by
+        # _uncorked, which first writes out anything held back by a cork: the
+        # remote peer may be waiting on it before it sends anything back.
         #
         # I/O occurs while the lock is held; waiting threads will see a delay.
-        with self._lock:
+        with self._uncorked():
             log.debug('recv for stream %d with %s already present',
                       stream_id,
                       self.recent_recv_streams)
@@ -783,16 +1349,19 @@ class HTTP20Connection(object):
             if stream_id:
                 self._get_stream(stream_id)
 
-            # TODO: Re-evaluate this.
+            # Having waited for some data, drain whatever else has already
+            # arrived. Each of these reads is non-blocking, and stops the
+            # drain as soon as the socket has nothing left to give.
             self._single_read()
             count = 9
             retry_wait = 0.05  # can improve responsiveness to delay the retry
 
-            while count and self._sock is not None and self._sock.can_read:
+            while count and self._sock is not None:
                 # If the connection has been closed, bail out, but retry
                 # on transient errors.
                 try:
-                    self._single_read()
+                    if self._single_read(block=False) is None:
+                        break
                 except ConnectionResetError:
                     break
                 except ssl.SSLError as e:  # pragma: no cover
@@ -850,11 +1419,26 @@ class HTTP20Connection(object):
         """
         Called by a stream when it is closing, so that state can be cleared.
         """
-        try:
-            del self.streams[stream_id]
-            self.recent_recv_streams.discard(stream_id)
-        except KeyError:
-            pass
+        # Concurrency
+        #
+        # Hold _lock: threads waiting on this stream must be woken before
+        # its read condition is forgotten.
+        with self._lock:
+            try:
+                del self.streams[stream_id]
+                self.recent_recv_streams.discard(stream_id)
+            except KeyError:
+                pass
+            self._unopened_streams.discard(stream_id)
+
+            condition = self._read_conditions.pop(stream_id, None)
+            if condition is not None:
+                condition.notify_all()
+
+            # Requests waiting for a stream wait on the connection.
+            condition = self._read_conditions.get(0)
+            if condition is not None:
+                condition.notify_all()
 
     # The following two methods are the implementation of the context manager
     # protocol.
@@ -49,3 +49,11 @@ class StreamResetError(HTTP20Error):
     A stream was forcefully reset by the remote party.
     """
     pass
+
+
+class TooManyStreamsError(HTTP20Error):
+    """
+    A request could not be sent because the remote party's limit on
+    concurrent streams was reached, and no stream closed in time.
+    """
+    pass
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+hyper/http20/pool
+~~~~~~~~~~~~~~~~~
+
+Pools of HTTP/2 connections. A single connection is limited by the number of
+concurrent streams the server allows it and by its flow control window, so
+requests to busy origins are spread across several connections.
+"""
+import logging
+import threading
+import time
+
+from ..common.util import to_host_port_tuple
+from ..compat import urlsplit
+from .connection import HTTP20Connection
+
+log = logging.getLogger(__name__)
+
+# A connection is busy once it is using this fraction of the concurrent
+# streams that the server allows it.
+BUSY_STREAM_FRACTION = 0.75
+
+
+class HTTP20ConnectionPool(object):
+    """
+    A pool of HTTP/2 connections to a single origin.
+
+    Each request is sent on the connection that is using the smallest
+    fraction of the concurrent streams the server allows it. When every
+    connection is busy, because it is using most of its streams or because
+    its flow control window has no room left for request data, another
+    connection is opened. Connections that have been closed, by either end,
+    and connections that have had no open streams for ``idle_timeout``
+    seconds are retired from the pool.
+
+    Concurrency
+    -----------
+
+    This class is thread-safe.
+
+    :param host: The host to connect to. This may be an IP address or a
+        hostname, and optionally may include a port.
+    :param port: (optional) The port to connect to.
+    :param secure: (optional) Whether the connections should use TLS.
+    :param max_connections: (optional) The most connections to open at once.
+        Once they are all busy, requests are sent on the least busy one,
+        where they wait for a stream if they have to. Defaults to 4.
+    :param idle_timeout: (optional) How long, in seconds, to keep a
+        connection that has no open streams. ``None`` keeps connections until
+        they are closed. Defaults to 60.
+    :param kwargs: Any other arguments are passed to each
+        :class:`HTTP20Connection <hyper.HTTP20Connection>`.
+    """
+    #: The class of the connections in the pool.
+    connection_class = HTTP20Connection
+
+    def __init__(self, host, port=None, secure=None, max_connections=4,
+                 idle_timeout=60, **kwargs):
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._connection_kwargs = kwargs
+
+        # The connections in the pool, and when each was last handed out.
+        self._connections = []
+        self._last_used = {}
+
+        # Concurrency
+        #
+        # Use one lock (_lock) to synchronize all access to the connections.
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        """
+        Returns the connection to send the next request on, opening a new one
+        if every connection in the pool is busy.
+
+        :returns: A connected :class:`HTTP20Connection
+            <hyper.HTTP20Connection>`.
+        """
+        # Concurrency
+        #
+        # Hold _lock: the connections must not change between choosing the
+        # least busy one and deciding whether to open another.
+        #
+        # I/O occurs while the lock is held, when connections are closed or
+        # opened; waiting threads will see a delay.
+        with self._lock:
+            self._retire_connections()
+
+            conn = None
+            if self._connections:
+                conn = min(self._connections, key=self._load)
+
+            if conn is None or (self._load(conn) >= BUSY_STREAM_FRACTION and
+                                len(self._connections) < self.max_connections):
+                conn = self._new_connection()
+
+            self._last_used[conn] = time.time()
+            return conn
+
+    def request(self, method, url, body=None, headers=None):
+        """
+        Sends a request on one of the pool's connections, and returns the
+        response once its headers have arrived.
+
+        :param method: The request method, e.g. ``'GET'``.
+        :param url: The URL to contact, e.g. ``'/path/segment'``.
+        :param body: (optional) The request body to send. Must be a bytestring
+            or a file-like object.
+        :param headers: (optional) The headers to send on the request.
+        :returns: A :class:`HTTP20Response <hyper.HTTP20Response>` object.
+        """
+        conn = self.get_connection()
+        stream_id = conn.request(method, url, body, headers)
+        return conn.get_response(stream_id)
+
+    def close(self):
+        """
+        Closes every connection in the pool.
+
+        :returns: Nothing.
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+
+            self._connections = []
+            self._last_used = {}
+
+    def _new_connection(self):
+        """
+        Opens a new connection and adds it to the pool.
+        """
+        conn = self.connection_class(
+            self.host, self.port, self.secure, **self._connection_kwargs
+        )
+        conn.connect()
+
+        log.debug(
+            "Opened connection %d to %s:%s",
+            len(self._connections) + 1, conn.host, conn.port
+        )
+        self._connections.append(conn)
+        return conn
+
+    def _retire_connections(self):
+        """
+        Removes the connections that have been closed, and closes and removes
+        those that have been idle for too long.
+        """
+        now = time.time()
+
+        for conn in list(self._connections):
+            broken = conn._sock is None or conn._reader_error is not None
+            idle = (
+                self.idle_timeout is not None and not conn.streams and
+                now - self._last_used[conn] >= self.idle_timeout
+            )
+            if not (broken or idle):
+                continue
+
+            self._connections.remove(conn)
+            del self._last_used[conn]
+            if not broken:
+                conn.close()
+
+    @staticmethod
+    def _load(conn):
+        """
+        How busy a connection is: the fraction of the concurrent streams it is
+        allowed that it's using, or 1 if it can't send any more data.
+        """
+        if conn._send_window() <= 0:
+            return 1.0
+
+        open_streams, limit = conn._stream_usage()
+        return float(open_streams) / limit
+
+
+class PoolManager(object):
+    """
+    Keeps a :class:`HTTP20ConnectionPool <hyper.HTTP20ConnectionPool>` for
+    each origin that requests are sent to.
+
+    Concurrency
+    -----------
+
+    This class is thread-safe.
+
+    :param kwargs: Any arguments are passed to each
+        :class:`HTTP20ConnectionPool <hyper.HTTP20ConnectionPool>` and from
+        there to each connection.
+    """
+    #: The class of the connection pools.
+    pool_class = HTTP20ConnectionPool
+
+    def __init__(self, **kwargs):
+        self._pool_kwargs = kwargs
+
+        # The pools, keyed by their host, port and whether they use TLS.
+        self._pools = {}
+
+        # Concurrency
+        #
+        # Use one lock (_lock) to synchronize all access to the pools.
+        self._lock = threading.Lock()
+
+    def connection_pool(self, host, port=None, secure=None):
+        """
+        Returns the pool of connections to an origin, creating it if needed.
+
+        :param host: The host to connect to. This may be an IP address or a
+            hostname, and optionally may include a port.
+        :param port: (optional) The port to connect to. If not provided and
+            one also isn't provided in the ``host`` parameter, defaults to
+            443.
+        :param secure: (optional) Whether the connections should use TLS.
+            Defaults to ``True`` for port 443, and ``False`` otherwise.
+        :returns: A :class:`HTTP20ConnectionPool
+            <hyper.HTTP20ConnectionPool>`.
+        """
+        if port is None:
+            host, port = to_host_port_tuple(host, default_port=443)
+        if secure is None:
+            secure = (port == 443)
+
+        key = (host, port, secure)
+
+        with self._lock:
+            try:
+                return self._pools[key]
+            except KeyError:
+                pool = self.pool_class(host, port, secure, **self._pool_kwargs)
+                self._pools[key] = pool
+                return pool
+
+    def request(self, method, url, body=None, headers=None):
+        """
+        Sends a request to an absolute URL, on a connection from the pool for
+        its origin, and returns the response once its headers have arrived.
+
+        :param method: The request method, e.g. ``'GET'``.
+        :param url: The URL to contact, e.g.
+            ``'https://http2bin.org/get'``.
+        :param body: (optional) The request body to send. Must be a bytestring
+            or a file-like object.
+        :param headers: (optional) The headers to send on the request.
+        :returns: A :class:`HTTP20Response <hyper.HTTP20Response>` object.
+        """
+        parsed = urlsplit(url)
+        secure = (parsed.scheme == 'https')
+        port = parsed.port or (443 if secure else 80)
+
+        selector = parsed.path or '/'
+        if parsed.query:
+            selector += '?' + parsed.query
+
+        pool = self.connection_pool(parsed.hostname, port, secure)
+        return pool.request(method, selector, body, headers)
+
+    def close(self):
+        """
+        Closes every connection in every pool.
+
+        :returns: Nothing.
+        """
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+
+            self._pools = {}
@@ -11,7 +11,7 @@ import zlib
 import brotli
 
 from ..common.decoder import DeflateDecoder
-from ..common.headers import HTTPHeaderMap
+from ..common.headers import FrozenHTTPHeaderMap
 from ..common.util import HTTPVersion
 
 log = logging.getLogger(__name__)
@@ -48,6 +48,8 @@ class HTTP20Response(object):
 
     version = HTTPVersion.http20
     _decompressobj = None
+    _closed = False
+    _stream_closed = False
 
     def __init__(self, headers, stream):
         #: The reason phrase returned by the server. This is not used in
@@ -61,8 +63,8 @@ class HTTP20Response(object):
         self.status = int(status)
 
         #: The response headers. These are determined upon creation, assigned
-        #: once, and never assigned again.
-        self.headers = headers
+        #: once, and never assigned again. They are read-only.
+        self.headers = FrozenHTTPHeaderMap(headers.iter_raw())
 
         # The response trailers. These are always intially ``None``.
         self._trailers = None
@@ -72,7 +74,10 @@ class HTTP20Response(object):
 
         # We always read in one-data-frame increments from the stream, so we
         # may need to buffer some for incomplete reads.
-        self._data_buffer = b''
+        self._data_buffer = bytearray()
+
+        # Data decoded by readinto() that didn't fit in its buffer.
+        self._decoded_data = b''
 
         # This object is used for decompressing gzipped request bodies. Right
         # now we only support gzip because that's all the RFC mandates of us.
@@ -96,8 +101,9 @@ class HTTP20Response(object):
                      read into memory.
         """
         if self._trailers is None:
-            self._trailers = self._stream.gettrailers() or HTTPHeaderMap()
-            strip_headers(self._trailers)
+            trailers = self._stream.gettrailers() or FrozenHTTPHeaderMap()
+            strip_headers(trailers)
+            self._trailers = FrozenHTTPHeaderMap(trailers.iter_raw())
 
         return self._trailers
 
@@ -113,18 +119,21 @@ class HTTP20Response(object):
             ``True``, the actual amount of data returned may be different to
             the amount requested.
         """
+        if self._decoded_data:
+            return self._read_decoded(amt, decode_content)
+
         if amt is not None and amt <= len(self._data_buffer):
-            data = self._data_buffer[:amt]
-            self._data_buffer = self._data_buffer[amt:]
+            data = self._read_buffered(amt)
             response_complete = False
         elif amt is not None:
-            read_amt = amt - len(self._data_buffer)
-            self._data_buffer += self._stream._read(read_amt)
-            data = self._data_buffer[:amt]
-            self._data_buffer = self._data_buffer[amt:]
+            data = self._read_stream(amt)
             response_complete = len(data) < amt
-        else:
+        elif self._data_buffer:
             data = b''.join([self._data_buffer, self._stream._read()])
+            self._data_buffer = bytearray()
+            response_complete = True
+        else:
+            data = self._stream._read()
             response_complete = True
 
         # We may need to decode the body.
@@ -137,15 +146,89 @@ class HTTP20Response(object):
             if decode_content and self._decompressobj:
                 data += self._decompressobj.flush()
 
-            if self._stream.response_headers:
-                self.headers.merge(self._stream.response_headers)
-
         # We're at the end, close the connection.
         if response_complete:
-            self.close()
+            self._release()
 
         return data
 
+    def readinto(self, b):
+        """
+        Reads up to ``len(b)`` bytes of the response body into ``b``, which
+        must be a writable bytes-like object such as a ``bytearray``. The body
+        is decoded, as it is by ``read()``.
+
+        This allows the response to be used as a raw stream by
+        :class:`io.BufferedReader`.
+
+        :param b: The buffer to read into.
+        :returns: The number of bytes read into ``b``. This is only ``0`` at
+            the end of the body, or if ``b`` is empty.
+        """
+        view = memoryview(b)
+        if not len(view):
+            return 0
+
+        # Decoded data can't be read straight into the buffer: it's decoded
+        # and then copied, keeping any data that doesn't fit.
+        if self._decoded_data or self._decompressobj is not None:
+            data = self._decoded_data
+            while not data and not self._body_complete:
+                data = self.read(len(view))
+
+            return self._readinto_decoded(view, data)
+
+        # Otherwise, data frames are copied straight into the buffer unless
+        # they don't fit.
+        data = self._data_buffer
+        while not data:
+            data = self._stream._read_one_frame()
+            if data is None:
+                self._release()
+                return 0
+
+        count = min(len(view), len(data))
+        view[:count] = data[:count]
+
+        if data is self._data_buffer:
+            del self._data_buffer[:count]
+        else:
+            self._data_buffer += data[count:]
+
+        return count
+
+    def readable(self):
+        """
+        Whether the response body can be read, which it always can.
+
+        :returns: ``True``.
+        """
+        return True
+
+    def seekable(self):
+        """
+        Whether the response body supports random access, which it doesn't.
+
+        :returns: ``False``.
+        """
+        return False
+
+    def flush(self):
+        """
+        Does nothing, as responses can't be written to. This is defined so
+        that the response can be closed by :mod:`io` wrappers.
+
+        :returns: Nothing.
+        """
+        pass
+
+    @property
+    def closed(self):
+        """
+        Whether the response has been closed by calling ``close()``.
+        """
+        return self._closed
+
     def read_chunked(self, decode_content=True):
         """
         Reads chunked transfer encoded bodies. This method returns a generator:
@@ -170,10 +253,65 @@ class HTTP20Response(object):
         if decode_content and self._decompressobj:
             yield self._decompressobj.flush()
 
-        self.close()
+        self._release()
 
         return
 
+    @property
+    def _body_complete(self):
+        """
+        Whether every byte of the body has been taken from the stream.
+        """
+        return (
+            self._stream.remote_closed and
+            not self._stream.data and
+            not self._data_buffer
+        )
+
+    def _read_buffered(self, amt):
+        """
+        Takes up to ``amt`` bytes of buffered data.
+        """
+        data = bytes(self._data_buffer[:amt])
+        del self._data_buffer[:amt]
+        return data
+
+    def _read_stream(self, amt):
+        """
+        Reads up to ``amt`` bytes, some of which have to come from the stream.
+        When nothing is buffered, the stream's data is returned as it is
+        rather than being copied through the buffer.
+        """
+        if self._data_buffer:
+            read_amt = amt - len(self._data_buffer)
+            data = b''.join([self._data_buffer, self._stream._read(read_amt)])
+            self._data_buffer = bytearray()
+            return data
+
+        return self._stream._read(amt)
+
+    def _read_decoded(self, amt, decode_content):
+        """
+        Implements the logic for calling ``read()`` when ``readinto()`` has
+        decoded more data than it could return.
+        """
+        if amt is None:
+            data, self._decoded_data = self._decoded_data, b''
+            return data + self.read(decode_content=decode_content)
+
+        data = self._decoded_data[:amt]
+        self._decoded_data = self._decoded_data[amt:]
+        return data
+
+    def _readinto_decoded(self, view, data):
+        """
+        Copies decoded data into a buffer, keeping whatever doesn't fit.
+        """
+        count = min(len(view), len(data))
+        view[:count] = data[:count]
+        self._decoded_data = data[count:]
+        return count
+
     def fileno(self):
         """
         Return the ``fileno`` of the underlying socket. This function is
@@ -187,7 +325,18 @@ class HTTP20Response(object):
 
         :returns: Nothing.
         """
-        self._stream.close()
+        self._closed = True
+        self._release()
+
+    def _release(self):
+        """
+        Closes the backing stream, as happens when the body has been read.
+        Unlike ``close()``, this doesn't mark the response as closed, so
+        reading it goes on reporting the end of the body.
+        """
+        if not self._stream_closed:
+            self._stream_closed = True
+            self._stream.close()
 
     # The following methods implement the context manager protocol.
     def __enter__(self):
@@ -16,15 +16,18 @@ the stream by the endpoint that initiated the stream.
 import h2.exceptions
 
 from ..common.headers import HTTPHeaderMap
+from ..compat import is_py2
 from .util import h2_safe_headers
+import collections
 import logging
+import threading
 
 log = logging.getLogger(__name__)
 
-# Define the largest chunk of data we'll send in one go. Realistically, we
-# should take the MSS into account but that's pretty dull, so let's just say
-# 1kB and call it a day.
-MAX_CHUNK = 1024
+# The size of the blocks read from file-like request bodies. Each block is
+# sent in frames as large as the flow control window and the maximum frame
+# size allow.
+FILE_BLOCK_SIZE = 65536
 
 
 class Stream(object):
@@ -42,7 +45,8 @@ class Stream(object):
                  connection,
                  send_outstanding_data,
                  recv_cb,
-                 close_cb):
+                 close_cb,
+                 consume_cb=None):
         self.stream_id = stream_id
         self.headers = HTTPHeaderMap()
 
@@ -59,8 +63,12 @@ class Stream(object):
         # PUSH_PROMISE..CONTINUATION frame sequence finishes.
         self.promised_headers = {}
 
-        # Unconsumed response data chunks. Empties after every call to _read().
-        self.data = []
+        # Unconsumed response data chunks, and their total size. A background
+        # reader thread may add chunks while another thread takes them, so
+        # they are only changed with _data_lock held.
+        self.data = collections.deque()
+        self._data_size = 0
+        self._data_lock = threading.Lock()
 
         # Whether the remote side has completed the stream.
         self.remote_closed = False
@@ -80,6 +88,12 @@ class Stream(object):
         self._recv_cb = recv_cb
         self._close_cb = close_cb
 
+        # If set, flow control credit is returned as the response data is
+        # read, rather than as it arrives, and this callback is called with
+        # the number of bytes read so that the connection can return its
+        # share of the credit.
+        self._consume_cb = consume_cb
+
     def add_header(self, name, value, replace=False):
         """
         Adds a single HTTP header to the headers to be sent on the request.
@@ -110,17 +124,17 @@ class Stream(object):
         # Define a utility iterator for file objects.
         def file_iterator(fobj):
             while True:
-                data = fobj.read(MAX_CHUNK)
+                data = fobj.read(FILE_BLOCK_SIZE)
                 yield data
-                if len(data) < MAX_CHUNK:
+                if len(data) < FILE_BLOCK_SIZE:
                     break
 
-        # Build the appropriate iterator for the data, in chunks of CHUNK_SIZE.
+        # Build the appropriate iterator for the data. Data that's already in
+        # memory is sent in one go.
         if hasattr(data, 'read'):
             chunks = file_iterator(data)
         else:
-            chunks = (data[i:i+MAX_CHUNK]
-                      for i in range(0, len(data), MAX_CHUNK))
+            chunks = iter([data] if len(data) else [])
 
         # since we need to know when we have a last package we need to know
         # if there is another package in advance
@@ -137,20 +151,28 @@ class Stream(object):
 
     def _read(self, amt=None):
         """
-        Read data from the stream. Unlike a normal read behaviour, this
-        function returns _at least_ ``amt`` data, but may return more.
+        Read data from the stream. Returns ``amt`` bytes, or all the data if
+        ``amt`` is not provided, unless the stream ends first.
         """
-        def listlen(list):
-            return sum(map(len, list))
+        chunks = []
+        size = 0
+
+        # Keep reading until the stream is closed or we get enough data. The
+        # data is taken as it arrives, so that its flow control credit is
+        # returned while we wait for the rest.
+        while True:
+            done = self.remote_closed
+
+            data = self._take_data(None if amt is None else amt - size)
+            chunks.extend(data)
+            size += sum(map(len, data))
+
+            if done or (amt is not None and size >= amt):
+                break
 
-        # Keep reading until the stream is closed or we get enough data.
-        while (not self.remote_closed and
-                (amt is None or listlen(self.data) < amt)):
             self._recv_cb(stream_id=self.stream_id)
 
-        result = b''.join(self.data)
-        self.data = []
-        return result
+        return b''.join(chunks)
 
     def _read_one_frame(self):
         """
@@ -160,10 +182,60 @@ class Stream(object):
         while not self.remote_closed and not self.data:
             self._recv_cb(stream_id=self.stream_id)
 
-        try:
-            return self.data.pop(0)
-        except IndexError:
-            return None
+        return self._take_frame()
+
+    def _take_data(self, amt=None):
+        """
+        Takes up to ``amt`` bytes of the data that has already arrived, or all
+        of it if ``amt`` is not provided, without waiting for more. A chunk
+        that is only partly taken is split, and the rest of it is left for
+        the next read.
+
+        :returns: A list of the chunks taken.
+        """
+        with self._data_lock:
+            if amt is None or amt >= self._data_size:
+                data, self.data = list(self.data), collections.deque()
+                size, self._data_size = self._data_size, 0
+            else:
+                data = []
+                size = 0
+                while size < amt:
+                    chunk = self.data.popleft()
+                    if size + len(chunk) > amt:
+                        view = chunk if is_py2 else memoryview(chunk)
+                        chunk = view[:amt - size]
+                        self.data.appendleft(view[amt - size:])
+
+                    data.append(chunk)
+                    size += len(chunk)
+
+                self._data_size -= size
+
+        self._data_consumed(size)
+        return data
+
+    def _take_frame(self):
+        """
+        Takes the oldest chunk of data that has already arrived, without
+        waiting for more.
+
+        :returns: The chunk, or ``None`` if there is no data.
+        """
+        with self._data_lock:
+            try:
+                data = self.data.popleft()
+            except IndexError:
+                return None
+
+            self._data_size -= len(data)
+
+        # What's left of a split chunk is a view of it.
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+
+        self._data_consumed(len(data))
+        return data
 
     def receive_response(self, event):
         """
@@ -174,6 +246,17 @@ class Stream(object):
         # big uploads are almost always a problem.
         self.response_headers = HTTPHeaderMap(event.headers)
 
+        # Find the Content-Length header if present, and give the window
+        # manager the chance to open the window to fit the body.
+        try:
+            self._in_window_manager.document_size = int(
+                self.response_headers.get(b'content-length', [0])[0]
+            )
+        except ValueError:
+            pass
+        else:
+            self._return_credit(0)
+
     def receive_trailers(self, event):
         """
         Receive response trailers.
@@ -190,11 +273,38 @@ class Stream(object):
         """
         Receive a chunk of data.
         """
+        # Append the data to the buffer.
+        with self._data_lock:
+            self.data.append(event.data)
+            self._data_size += len(event.data)
+
+        # Padding is never read, so its credit is always returned straight
+        # away.
         size = event.flow_controlled_length
-        increment = self._in_window_manager._handle_frame(size)
+        if self._consume_cb is not None:
+            size -= len(event.data)
 
-        # Append the data to the buffer.
-        self.data.append(event.data)
+        if size:
+            self._return_credit(size)
+
+    def _data_consumed(self, size):
+        """
+        Called when ``size`` bytes of response data have been read from the
+        stream. Returns their flow control credit, if it is returned on read.
+        """
+        if self._consume_cb is not None and size:
+            self._return_credit(size)
+            self._consume_cb(size)
+
+    def _return_credit(self, size):
+        """
+        Hands ``size`` bytes of flow control credit to the stream's window
+        manager, and sends the WINDOWUPDATE frame it asks for, if any.
+        """
+        # Data may arrive on one thread while it is read on another, so the
+        # window manager is only updated with _data_lock held.
+        with self._data_lock:
+            increment = self._in_window_manager._handle_frame(size)
 
         if increment:
             try:
@@ -239,11 +349,6 @@ class Stream(object):
         while self.response_headers is None:
             self._recv_cb(stream_id=self.stream_id)
 
-        # Find the Content-Length header if present.
-        self._in_window_manager.document_size = (
-            int(self.response_headers.get(b'content-length', [0])[0])
-        )
-
         return self.response_headers
 
     def gettrailers(self):
@@ -308,37 +413,62 @@ class Stream(object):
             self.remote_closed = True
             self.local_closed = True
 
-        self._close_cb(self.stream_id)
+        # Nobody will read the data that's left, so the connection can have
+        # its credit back.
+        if self._consume_cb is not None:
+            with self._data_lock:
+                self.data = collections.deque()
+                size, self._data_size = self._data_size, 0
+            if size:
+                self._consume_cb(size)
 
-    @property
-    def _out_flow_control_window(self):
-        """
-        The size of our outbound flow control window.
-        """
-
-        with self._conn as conn:
-            return conn.local_flow_control_window(self.stream_id)
+        self._close_cb(self.stream_id)
 
     def _send_chunk(self, data, final):
         """
         Implements most of the sending logic.
 
-        Takes a single chunk of size at most MAX_CHUNK, wraps it in a frame and
-        sends it. Optionally sets the END_STREAM flag if this is the last chunk
-        (determined by being of size less than MAX_CHUNK) and no more data is
-        to be sent.
+        Takes a single chunk of data, splits it into frames as large as the
+        flow control window and the maximum frame size allow, and sends them.
+        Optionally sets the END_STREAM flag on the last frame, if no more data
+        is to be sent. Frames are slices of the data rather than copies of it.
         """
-        # If we don't fit in the connection window, try popping frames off the
-        # connection in hope that one might be a window update frame.
-        while len(data) > self._out_flow_control_window:
-            self._recv_cb()
+        view = data if is_py2 else memoryview(data)
+        position = 0
 
-        # Send the frame and decrement the flow control window.
-        with self._conn as conn:
-            conn.send_data(
-                stream_id=self.stream_id, data=data, end_stream=final
-            )
-        self._send_outstanding_data()
+        while True:
+            # Queue up as many frames as the window allows. The window is
+            # checked and used up under the same lock, so that other streams
+            # can't take it in between.
+            with self._conn as conn:
+                while True:
+                    size = min(
+                        len(data) - position,
+                        conn.local_flow_control_window(self.stream_id),
+                        conn.max_outbound_frame_size,
+                    )
+                    if size <= 0 and position < len(data):
+                        break
+
+                    frame = view[position:position + size]
+                    position += size
+                    conn.send_data(
+                        stream_id=self.stream_id,
+                        data=frame,
+                        end_stream=(final and position == len(data)),
+                    )
+
+                    if position == len(data):
+                        break
+
+            self._send_outstanding_data()
+
+            if position == len(data):
+                break
+
+            # If we don't fit in the window, try popping frames off the
+            # connection in hope that one might be a window update frame.
+            self._recv_cb()
 
         if final:
             self.local_closed = True
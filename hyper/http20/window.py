@@ -103,6 +103,37 @@ class BaseFlowControlManager(object):
             "FlowControlManager is an abstract base class"
         )
 
+    def wants_probe(self):
+        """
+        Called on the connection's flow control manager whenever a DATA frame
+        arrives while no probe is under way. Returning ``True`` starts a
+        probe: the connection sends a PING frame, and calls
+        :meth:`probe_started` and, once the PING is acknowledged,
+        :meth:`probe_finished` on the managers of the connection and of every
+        open stream.
+
+        :returns: Whether to start a probe. This implementation never does.
+        """
+        return False
+
+    def probe_started(self):
+        """
+        Called when a probe starts, before the DATA frame that prompted it is
+        handled. This implementation does nothing.
+
+        :returns: Nothing.
+        """
+        pass
+
+    def probe_finished(self, rtt):
+        """
+        Called when a probe finishes. This implementation does nothing.
+
+        :param rtt: The round trip time of the probe's PING frame, in seconds.
+        :returns: Nothing.
+        """
+        pass
+
     def _handle_frame(self, frame_size):
         """
         This internal method is called by the connection or stream that owns
@@ -152,3 +183,148 @@ class FlowControlManager(BaseFlowControlManager):
 
     def blocked(self):
         return self.initial_window_size - self.window_size
+
+
+class BDPFlowControlManager(FlowControlManager):
+    """
+    A flow control manager that sizes the window to the bandwidth-delay
+    product of the connection, which it estimates as it goes.
+
+    The window is managed as it is by :class:`FlowControlManager`, but is
+    refilled to a *target* size that starts at the initial window size.
+    Every so often the connection measures the round trip time with a PING
+    frame, and the manager counts the data that arrives in the meantime:
+    this is how much the sender managed to send in one round trip.
+
+    - If the sender used at least two thirds of the target window in that
+      time, and the bandwidth is the highest seen so far, the sender is
+      limited by the window: the target doubles the amount received, up to
+      ``max_window_size``.
+    - If the sender used less than a quarter of the target window, the
+      target halves, down to the initial window size. This happens when the
+      application isn't reading a response whose window is only reopened as
+      it's read, and when the sender has less to send.
+
+    A larger target is opened on the next DATA frame. HTTP/2 windows can't be
+    taken back once they have been opened, so a smaller target only takes
+    effect as the window is refilled.
+    """
+    #: The largest size the target window may grow to. Defaults to 16MB.
+    max_window_size = 16777216
+
+    #: The number of DATA frames received between probes.
+    probe_interval = 16
+
+    def __init__(self, initial_window_size, document_size=None):
+        super(BDPFlowControlManager, self).__init__(
+            initial_window_size, document_size
+        )
+
+        #: The size the window is refilled to.
+        self.target_window_size = initial_window_size
+
+        #: The highest bandwidth seen, in bytes per second.
+        self.bandwidth = 0
+
+        # The data received since the current probe started, or None if no
+        # probe is under way.
+        self._probe_size = None
+
+        # The number of frames received since the last probe.
+        self._frames = 0
+
+        # Whether the target has grown since the window was last refilled.
+        self._grown = False
+
+    def increase_window_size(self, frame_size):
+        self._frames += 1
+        if self._probe_size is not None:
+            self._probe_size += frame_size
+
+        future_window_size = self.window_size - frame_size
+
+        if ((future_window_size < (self.target_window_size / 4)) or
+                (future_window_size < 1000) or self._grown):
+            self._grown = False
+            return max(self.target_window_size - future_window_size, 0)
+
+        return 0
+
+    def blocked(self):
+        return max(self.target_window_size - self.window_size, 0)
+
+    def wants_probe(self):
+        return self._frames >= self.probe_interval or not self.bandwidth
+
+    def probe_started(self):
+        self._probe_size = 0
+        self._frames = 0
+
+    def probe_finished(self, rtt):
+        size, self._probe_size = self._probe_size, None
+        if not size or rtt <= 0:
+            return
+
+        bandwidth = size / float(rtt)
+        if (size >= self.target_window_size * 2 / 3 and
+                bandwidth >= self.bandwidth):
+            target_window_size = min(size * 2, self.max_window_size)
+            self._grown = target_window_size > self.target_window_size
+            self.target_window_size = target_window_size
+        elif size < self.target_window_size / 4:
+            self.target_window_size = max(
+                self.target_window_size // 2, self.initial_window_size
+            )
+
+        self.bandwidth = max(self.bandwidth, bandwidth)
+
+
+class DocumentSizeFlowControlManager(FlowControlManager):
+    """
+    A flow control manager that opens the window to fit the whole response
+    body, when the size of the body is known.
+
+    When the response headers arrive with a Content-Length, the window is
+    opened with a single WINDOWUPDATE frame to cover the rest of the body, up
+    to ``max_window_size``. A body that fits is then received without any more
+    WINDOWUPDATE frames. A larger body is received in windows of
+    ``max_window_size``, refilled when they get less than a quarter full.
+
+    Responses without a Content-Length, and any data received beyond it, are
+    managed as they are by :class:`FlowControlManager`. Only the windows of
+    streams are opened this way: the connection window still limits how much
+    of a body can be sent at once.
+    """
+    #: The largest size the window is opened to. Defaults to 16MB.
+    max_window_size = 16777216
+
+    def __init__(self, initial_window_size, document_size=None):
+        super(DocumentSizeFlowControlManager, self).__init__(
+            initial_window_size, document_size
+        )
+
+        # The flow-controlled data received so far.
+        self._received = 0
+
+        # Whether the window has been opened to fit the document yet.
+        self._opened = False
+
+    def increase_window_size(self, frame_size):
+        self._received += frame_size
+        remaining = (self.document_size or 0) - self._received
+        if not self.document_size or remaining < 0:
+            return super(
+                DocumentSizeFlowControlManager, self
+            ).increase_window_size(frame_size)
+
+        future_window_size = self.window_size - frame_size
+        if future_window_size >= remaining:
+            return 0
+
+        target_window_size = min(remaining, self.max_window_size)
+        if (not self._opened or remaining <= self.max_window_size or
+                future_window_size < target_window_size / 4):
+            self._opened = True
+            return max(target_window_size - future_window_size, 0)
+
+        return 0
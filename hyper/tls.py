@@ -30,16 +30,7 @@ def wrap_socket(sock, server_hostname, ssl_context=None, force_proto=None):
     do more things later.
     """
 
-    global _context
-
-    if ssl_context:
-        # if an SSLContext is provided then use it instead of default context
-        _ssl_context = ssl_context
-    else:
-        # create the singleton SSLContext we use
-        if _context is None:  # pragma: no cover
-            _context = init_context()
-        _ssl_context = _context
+    _ssl_context = ssl_context or _default_context()
 
     # the spec requires SNI support
     ssl_sock = _ssl_context.wrap_socket(sock, server_hostname=server_hostname)
@@ -68,6 +59,19 @@ def wrap_socket(sock, server_hostname, ssl_context=None, force_proto=None):
     return (ssl_sock, proto)
 
 
+def _default_context():
+    """
+    Returns the singleton ``SSLContext`` used when the user doesn't provide
+    one, creating it if necessary.
+    """
+    global _context
+
+    if _context is None:  # pragma: no cover
+        _context = init_context()
+
+    return _context
+
+
 def init_context(cert_path=None, cert=None, cert_password=None):
     """
     Create a new ``SSLContext`` that is correctly set up for an HTTP/2
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# The asyncio tests use syntax that older Pythons can't even parse.
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
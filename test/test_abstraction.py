@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import threading
+import time
+
 import hyper.common.connection
 
 from hyper.common.connection import HTTPConnection
@@ -78,6 +81,30 @@ class TestHTTPConnection(object):
         assert isinstance(c._conn, DummyH2Connection)
         assert c._conn._sock == 'totally a non-secure socket'
 
+    def test_concurrent_requests_upgrade_once(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.connection, 'HTTP11Connection', SlowH1Connection
+        )
+        monkeypatch.setattr(
+            hyper.common.connection, 'HTTP20Connection', DummyH2Connection
+        )
+        c = HTTPConnection('test', 443)
+        results = []
+
+        def request():
+            results.append((c.request('GET', '/'), c._conn))
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Both requests went to the one HTTP/2 connection.
+        assert len(results) == 2
+        assert results[0] == results[1] == ('h2', c._conn)
+        assert SlowH1Connection.connects == 1
+
 
 class DummyH1Connection(object):
     def __init__(self,  host, port=None, secure=None, **kwargs):
@@ -128,3 +155,15 @@ class DummyH2Connection(object):
     def get_response(self, *args, **kwargs):
         if not self.secure:
             return 'h2c'
+
+
+class SlowH1Connection(DummyH1Connection):
+    """
+    Takes a while to connect, so that concurrent requests overlap.
+    """
+    connects = 0
+
+    def request(self, *args, **kwargs):
+        SlowH1Connection.connects += 1
+        time.sleep(0.1)
+        return super(SlowH1Connection, self).request(*args, **kwargs)
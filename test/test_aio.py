@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for hyper's asyncio-native HTTP/2 connection.
+"""
+import asyncio
+import gzip
+
+import h2.connection
+import h2.events
+import pytest
+
+from hyper.common.util import HTTPVersion
+from hyper.http20.aio import AsyncHTTP20Connection, AsyncHTTP20Response
+from hyper.http20.exceptions import ConnectionError
+
+
+class H2Server(object):
+    """
+    A tiny HTTP/2 server, running on the test's event loop, that answers each
+    request with the response provided by ``handler``.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.handle, '127.0.0.1', 0
+        )
+        return self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        conn = h2.connection.H2Connection(client_side=False)
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        bodies = {}
+
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                break
+
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    bodies[event.stream_id] = b''
+                    self.requests.append(dict(event.headers))
+                elif isinstance(event, h2.events.DataReceived):
+                    bodies[event.stream_id] += event.data
+                    conn.increment_flow_control_window(
+                        event.flow_controlled_length
+                    )
+                    conn.increment_flow_control_window(
+                        event.flow_controlled_length, event.stream_id
+                    )
+                elif isinstance(event, h2.events.StreamEnded):
+                    body = bodies.pop(event.stream_id)
+                    headers, chunks, trailers = self.handler(
+                        event.stream_id, body
+                    )
+                    conn.send_headers(event.stream_id, headers)
+                    for chunk in chunks:
+                        conn.send_data(event.stream_id, chunk)
+                    if trailers:
+                        conn.send_headers(
+                            event.stream_id, trailers, end_stream=True
+                        )
+                    else:
+                        conn.end_stream(event.stream_id)
+
+            writer.write(conn.data_to_send())
+
+        writer.close()
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Let the tasks the test leaves behind wind down before closing.
+        all_tasks = getattr(asyncio, 'all_tasks', None) or \
+            asyncio.Task.all_tasks
+        pending = all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(
+            asyncio.gather(*pending, return_exceptions=True)
+        )
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def echo(stream_id, body):
+    chunks = [b'stream ', str(stream_id).encode('ascii'), body]
+    return [(':status', '200')], chunks, []
+
+
+class TestAsyncHTTP20Connection(object):
+    def test_connection_version(self):
+        c = AsyncHTTP20Connection('www.google.com')
+        assert c.version is HTTPVersion.http20
+        assert c.secure
+
+    def test_simple_request(self):
+        async def go():
+            server = H2Server(echo)
+            port = await server.start()
+
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+            stream_id = await conn.request('GET', '/get')
+            resp = await conn.get_response(stream_id)
+
+            assert isinstance(resp, AsyncHTTP20Response)
+            assert resp.status == 200
+            assert await resp.read() == b'stream 1'
+            assert server.requests[0][':path'] == '/get'
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_many_concurrent_streams(self):
+        async def go():
+            server = H2Server(echo)
+            port = await server.start()
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+
+            async def fetch(body):
+                stream_id = await conn.request('POST', '/', body=body)
+                resp = await conn.get_response(stream_id)
+                return stream_id, await resp.read()
+
+            results = await asyncio.gather(
+                *[fetch(b' %d' % i) for i in range(50)]
+            )
+
+            for i, (stream_id, data) in enumerate(results):
+                assert data == b'stream %d %d' % (stream_id, i)
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_upload_larger_than_window(self):
+        body = b'x' * 200000
+
+        def handler(stream_id, received):
+            return [(':status', '200')], [str(len(received)).encode()], []
+
+        async def go():
+            server = H2Server(handler)
+            port = await server.start()
+
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+            stream_id = await conn.request('POST', '/', body=body)
+            resp = await conn.get_response(stream_id)
+            assert await resp.read() == b'200000'
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_bounded_reads_chunks_and_trailers(self):
+        def handler(stream_id, body):
+            return (
+                [(':status', '200')],
+                [b'hello', b'there', b'world'],
+                [('x-trailer', 'yes')],
+            )
+
+        async def go():
+            server = H2Server(handler)
+            port = await server.start()
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+
+            stream_id = await conn.request('GET', '/')
+            resp = await conn.get_response(stream_id)
+            assert await resp.read(7) == b'helloth'
+            assert await resp.read() == b'ereworld'
+            assert (await resp.trailers())[b'x-trailer'] == [b'yes']
+
+            stream_id = await conn.request('GET', '/')
+            resp = await conn.get_response(stream_id)
+            chunks = [chunk async for chunk in resp.read_chunked()]
+            assert chunks == [b'hello', b'there', b'world']
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_readinto(self):
+        def handler(stream_id, body):
+            return (
+                [(':status', '200'), ('content-encoding', 'gzip')],
+                [gzip.compress(b'hello there world')],
+                [],
+            )
+
+        async def go():
+            server = H2Server(handler)
+            port = await server.start()
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+
+            stream_id = await conn.request('GET', '/')
+            resp = await conn.get_response(stream_id)
+            b = bytearray(5)
+            assert await resp.readinto(bytearray()) == 0
+
+            received = b''
+            while True:
+                count = await resp.readinto(b)
+                if not count:
+                    break
+                assert count <= 5
+                received += bytes(b[:count])
+
+            assert received == b'hello there world'
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_responses_are_decompressed(self):
+        def handler(stream_id, body):
+            return (
+                [(':status', '200'), ('content-encoding', 'gzip')],
+                [gzip.compress(b'compressed')],
+                [],
+            )
+
+        async def go():
+            server = H2Server(handler)
+            port = await server.start()
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+
+            stream_id = await conn.request('GET', '/')
+            resp = await conn.get_response(stream_id)
+            assert await resp.read() == b'compressed'
+
+            conn.close()
+            server.close()
+
+        run(go())
+
+    def test_reading_after_server_hangs_up(self):
+        async def hang_up(reader, writer):
+            conn = h2.connection.H2Connection(client_side=False)
+            conn.initiate_connection()
+            writer.write(conn.data_to_send())
+            await reader.read(65535)
+            writer.close()
+
+        async def go():
+            server = await asyncio.start_server(hang_up, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+
+            conn = AsyncHTTP20Connection('127.0.0.1', port, secure=False)
+            stream_id = await conn.request('GET', '/')
+
+            with pytest.raises(ConnectionResetError):
+                await conn.get_response(stream_id)
+
+            conn.close()
+            with pytest.raises(ConnectionError):
+                await conn._wait_for_data(0)
+
+            server.close()
+
+        run(go())
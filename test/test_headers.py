@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
-from hyper.common.headers import HTTPHeaderMap
+from hyper.common.headers import (
+    HTTPHeaderMap, FrozenHTTPHeaderMap, LazyHTTPHeaderMap
+)
 
 import pytest
 
@@ -277,3 +279,161 @@ class TestHTTPHeaderMap(object):
             (b'name3', b'value3'),
             (b'name4', b'other_value'),
         ]
+
+    def test_replacing_keeps_lookups_in_sync(self):
+        h = HTTPHeaderMap([
+            (b'Name', b'a, b'),
+            (b'other', b'value'),
+            (b'NAME', b'c'),
+        ])
+
+        h.replace(b'name', b'd')
+
+        assert h[b'name'] == [b'd']
+        assert len(h) == 2
+        assert list(h.iter_raw()) == [(b'name', b'd'), (b'other', b'value')]
+
+    def test_length_tracks_deletion(self):
+        h = HTTPHeaderMap([
+            (b'name', b'a, b'),
+            (b'Set-Cookie', b'c=d, e=f'),
+            (b'other', b'value'),
+        ])
+        assert len(h) == 4
+
+        del h[b'NAME']
+        assert len(h) == 2
+        assert b'name' not in h
+        assert b'set-cookie' in h
+
+        del h[b'set-cookie']
+        assert len(h) == 1
+        assert list(h.iter_raw()) == [(b'other', b'value')]
+
+    def test_length_tracks_merging(self):
+        h = HTTPHeaderMap([(b'name', b'a, b')])
+        h.merge(HTTPHeaderMap([(b'Name', b'c')]))
+        h.merge({b'other': b'value'})
+
+        assert len(h) == 4
+        assert len(h) == len(list(h))
+        assert h[b'name'] == [b'a', b'b', b'c']
+
+    def test_cached_values_follow_mutation(self):
+        h = HTTPHeaderMap([(b'name', b'a, b'), (b'other', b'c')])
+        assert h[b'name'] == [b'a', b'b']
+        assert list(h) == [(b'name', b'a'), (b'name', b'b'), (b'other', b'c')]
+
+        h[b'Name'] = b'd'
+        assert h[b'name'] == [b'a', b'b', b'd']
+        assert list(h)[-1] == (b'name', b'd')
+
+        h.replace(b'name', b'e')
+        assert h[b'name'] == [b'e']
+
+        del h[b'name']
+        assert b'name' not in h
+        assert list(h) == [(b'other', b'c')]
+
+    def test_looked_up_values_can_be_modified_safely(self):
+        h = HTTPHeaderMap([(b'name', b'a, b')])
+        h[b'name'].append(b'c')
+
+        assert h[b'name'] == [b'a', b'b']
+
+
+class TestFrozenHTTPHeaderMap(object):
+    def test_lookups_behave_like_header_map(self):
+        items = [(b'Name', b'a, b'), (b'Set-Cookie', b'c=d, e=f')]
+        h = FrozenHTTPHeaderMap(items)
+
+        assert h == HTTPHeaderMap(items)
+        assert h[b'name'] == [b'a', b'b']
+        assert h.get(b'SET-COOKIE') == [b'c=d, e=f']
+        assert len(h) == 3
+        assert list(h.iter_raw()) == items
+
+    def test_cannot_be_modified(self):
+        h = FrozenHTTPHeaderMap([(b'name', b'value')])
+
+        with pytest.raises(TypeError):
+            h[b'name'] = b'other'
+
+        with pytest.raises(TypeError):
+            del h[b'name']
+
+        with pytest.raises(TypeError):
+            h.replace(b'name', b'other')
+
+        with pytest.raises(TypeError):
+            h.merge({b'name': b'other'})
+
+        with pytest.raises(TypeError):
+            h.pop(b'name')
+
+        assert h[b'name'] == [b'value']
+
+    def test_is_hashable(self):
+        a = FrozenHTTPHeaderMap([(b'name', b'value')])
+        b = FrozenHTTPHeaderMap([(b'name', b'value')])
+
+        assert hash(a) == hash(b)
+        assert len(set([a, b])) == 1
+
+
+class TestLazyHTTPHeaderMap(object):
+    head = (
+        b'HTTP/1.1 200 OK\r\n'
+        b'Server: test\r\n'
+        b'Content-Length: 2\r\n'
+        b'Vary: Accept, Cookie\r\n'
+        b'Set-Cookie: a=b, c=d\r\n'
+        b'vary: Accept-Encoding\r\n'
+        b'\r\n'
+    )
+
+    def test_lookups_do_not_parse_head(self):
+        h = LazyHTTPHeaderMap(self.head)
+
+        assert h[b'content-length'] == [b'2']
+        assert h.get('VARY') == [b'Accept', b'Cookie', b'Accept-Encoding']
+        assert h[b'set-cookie'] == [b'a=b, c=d']
+        assert h.get(b'content-type') is None
+        assert b'server' in h
+        assert b'content-type' not in h
+
+        with pytest.raises(KeyError):
+            h[b'content-type']
+
+        assert '_items' not in h.__dict__
+
+    def test_status_line_is_not_a_header(self):
+        h = LazyHTTPHeaderMap(self.head)
+
+        assert b'http/1.1 200 ok' not in h
+        assert len(h) == 6
+
+    def test_parses_head_when_needed(self):
+        h = LazyHTTPHeaderMap(self.head)
+        expected = HTTPHeaderMap([
+            (b'Server', b'test'),
+            (b'Content-Length', b'2'),
+            (b'Vary', b'Accept, Cookie'),
+            (b'Set-Cookie', b'a=b, c=d'),
+            (b'vary', b'Accept-Encoding'),
+        ])
+
+        assert list(h) == list(expected)
+        assert h == expected
+        assert len(h) == len(expected)
+        assert h[b'vary'] == [b'Accept', b'Cookie', b'Accept-Encoding']
+        assert b'server' in h
+
+    def test_is_read_only(self):
+        h = LazyHTTPHeaderMap(self.head)
+
+        with pytest.raises(TypeError):
+            h[b'name'] = b'value'
+
+        with pytest.raises(TypeError):
+            del h[b'server']
@@ -10,13 +10,14 @@ import zlib
 import brotli
 
 from collections import namedtuple
-from io import BytesIO, StringIO
+from io import BufferedReader, BytesIO, StringIO
 
 import mock
 import pytest
 
 import hyper
 from hyper.http11.connection import HTTP11Connection
+from hyper.http11.parser import Parser
 from hyper.http11.response import HTTP11Response
 from hyper.common.headers import HTTPHeaderMap
 from hyper.common.exceptions import ChunkedDecodeError, ConnectionResetError
@@ -439,6 +440,29 @@ class TestHTTP11Connection(object):
         ]
         assert r.read() == b''
 
+    def test_get_response_with_lazy_headers(self):
+        c = HTTP11Connection('httpbin.org', lazy_headers=True)
+        c._sock = sock = DummySocket()
+
+        sock._buffer = BytesIO(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Server: Socket\r\n"
+            b"Content-Length: 2\r\n"
+            b"\r\n"
+            b"hi"
+        )
+
+        r = c.get_response()
+
+        assert r.status == 200
+        assert r.reason == b'OK'
+        assert r.headers[b'content-length'] == [b'2']
+        assert list(r.headers.iter_raw()) == [
+            (b'Server', b'Socket'),
+            (b'Content-Length', b'2')
+        ]
+        assert r.read() == b'hi'
+
     def test_response_short_reads(self):
         c = HTTP11Connection('httpbin.org')
         c._sock = sock = DummySocket()
@@ -599,10 +623,31 @@ class TestHTTP11Connection(object):
         assert 'File-like bodies must return bytestrings. ' \
                'Got: {}'.format(int) in str(exc_info)
 
+    def test_parser_backend_selection(self):
+        c = HTTP11Connection('httpbin.org', parser_backend='python')
+
+        assert c.parser_backend == 'python'
+        assert isinstance(c.parser, Parser)
+
+        with pytest.raises(ValueError):
+            HTTP11Connection('httpbin.org', parser_backend='nonexistent')
+
     def test_close_with_uninitialized_socket(self):
         c = HTTP11Connection('httpbin.org')
         c.close()
 
+    def test_close_resets_parser(self):
+        c = HTTP11Connection('httpbin.org')
+        c._sock = DummySocket()
+
+        head = b"HTTP/1.1 200 OK\r\nServer: Socket\r\n"
+        assert c.parser.parse_response(memoryview(head)) is None
+
+        c.close()
+
+        head = b"HTTP/1.1 204 No Content\r\n\r\n"
+        assert c.parser.parse_response(memoryview(head)).status == 204
+
 
 class TestHTTP11Response(object):
     def test_short_circuit_read(self):
@@ -709,6 +754,191 @@ class TestHTTP11Response(object):
 
         assert not list(r.read_chunked())
 
+    def test_chunked_read_with_extensions_and_trailers(self):
+        d = DummySocket()
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+
+        data = (
+            b'4;name=value\r\nwell\r\n'
+            b'4 ; name="quoted;value"\r\nwhat\r\n'
+            b'0;last\r\n'
+            b'Expires: never\r\n'
+            b'X-Checksum:1234 \r\n'
+            b'\r\n'
+        )
+        d._buffer = BytesIO(data)
+
+        chunks = list(r.read_chunked())
+        assert chunks == [b'well', b'what']
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert list(r.trailers.iter_raw()) == [
+            (b'Expires', b'never'), (b'X-Checksum', b'1234')
+        ]
+
+    def test_chunked_read_without_trailers(self):
+        d = DummySocket()
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+        d._buffer = BytesIO(b'4\r\nwell\r\n0\r\n\r\n')
+
+        assert r.read() == b'well'
+        assert r.trailers is None
+
+    def test_chunks_larger_than_socket_reads(self):
+        d = ShortReadSocket(3)
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+        d._buffer = BytesIO(b'a\r\nhereabouts\r\n2\r\nwe\r\n0\r\n\r\n')
+
+        assert list(r.read_chunked()) == [b'her', b'eab', b'out', b's', b'we']
+
+    def test_bounded_reads_of_large_chunks(self):
+        d = ShortReadSocket(3)
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+        d._buffer = BytesIO(b'a\r\nhereabouts\r\n2\r\nwe\r\n0\r\n\r\n')
+
+        assert r.read(4) == b'here'
+        assert r.read(7) == b'aboutsw'
+        assert r.read() == b'e'
+
+    @pytest.mark.parametrize('data', [
+        b'x\r\nwell\r\n0\r\n\r\n',
+        b'-4\r\nwell\r\n0\r\n\r\n',
+        b'+4\r\nwell\r\n0\r\n\r\n',
+        b'0x4\r\nwell\r\n0\r\n\r\n',
+        b'0_4\r\nwell\r\n0\r\n\r\n',
+        b'\r\nwell\r\n0\r\n\r\n',
+        b'2\r\nwell\r\n0\r\n\r\n',
+        b'4\r\nwell\r\n0\r\nbad trailer\r\n\r\n',
+    ])
+    def test_invalid_chunked_bodies(self, data):
+        d = DummySocket()
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+        d._buffer = BytesIO(data)
+
+        with pytest.raises(ChunkedDecodeError):
+            r.read()
+
+    def test_readinto_with_content_length(self):
+        d = DummySocket()
+        r = HTTP11Response(200, 'OK', {b'content-length': [b'10']}, d, None)
+        d._buffer = BytesIO(b'0123456789extra')
+        b = bytearray(4)
+
+        assert r.readinto(b) == 4
+        assert b == b'0123'
+        assert r.readinto(b) == 4
+        assert b == b'4567'
+        assert r.readinto(b) == 2
+        assert b[:2] == b'89'
+        assert r.readinto(b) == 0
+        assert not r.closed
+
+    @pytest.mark.parametrize('headers,body', [
+        ({b'content-length': [b'5']}, b'hello'),
+        ({b'transfer-encoding': [b'chunked']}, b'5\r\nhello\r\n0\r\n\r\n'),
+    ])
+    def test_readinto_empty_buffer(self, headers, body):
+        d = DummySocket()
+        r = HTTP11Response(200, 'OK', headers, d, None)
+        d._buffer = BytesIO(body)
+
+        assert r.readinto(bytearray()) == 0
+        assert r._sock is d
+        assert r.read() == b'hello'
+
+    def test_readinto_aborted(self):
+        d = DummySocket()
+        r = HTTP11Response(200, 'OK', {b'content-length': [b'15']}, d, None)
+        d._buffer = BytesIO(b'hi')
+        b = bytearray(10)
+
+        assert r.readinto(b) == 2
+        with pytest.raises(ConnectionResetError):
+            r.readinto(b)
+
+    def test_readinto_expect_close(self):
+        d = DummySocket()
+        r = HTTP11Response(200, 'OK', {b'connection': [b'close']}, d, None)
+        d._buffer = BytesIO(b'hello')
+        b = bytearray(10)
+
+        assert r.readinto(b) == 5
+        assert b[:5] == b'hello'
+        assert r.readinto(b) == 0
+
+    def test_readinto_chunked(self):
+        d = DummySocket()
+        r = HTTP11Response(
+            200, 'OK', {b'transfer-encoding': [b'chunked']}, d, None
+        )
+        d._buffer = BytesIO(
+            b'4\r\nwell\r\n6\r\nwhat s\r\n0\r\nX-T: 1\r\n\r\n'
+        )
+        b = bytearray(4)
+
+        received = []
+        while True:
+            count = r.readinto(b)
+            if not count:
+                break
+            received.append(bytes(b[:count]))
+
+        assert received == [b'well', b'what', b' s']
+        assert r.trailers[b'x-t'] == [b'1']
+
+    def test_readinto_compressed_keeps_excess_data(self):
+        d = DummySocket()
+        c = zlib_compressobj(wbits=25)
+        body = c.compress(b'this is test data' * 10) + c.flush()
+        headers = {
+            b'content-encoding': [b'gzip'],
+            b'content-length': [str(len(body)).encode('ascii')],
+        }
+        r = HTTP11Response(200, 'OK', headers, d, None)
+        d._buffer = BytesIO(body)
+        b = bytearray(5)
+
+        received = b''
+        while len(received) < 50:
+            count = r.readinto(b)
+            assert 0 < count <= 5
+            received += bytes(b[:count])
+
+        assert received + r.read() == b'this is test data' * 10
+        assert r.readinto(b) == 0
+
+    def test_response_as_buffered_reader(self):
+        d = DummySocket()
+        r = HTTP11Response(200, 'OK', {b'content-length': [b'21']}, d, None)
+        d._buffer = BytesIO(b'line one\nline two\nend')
+        reader = BufferedReader(r)
+
+        assert r.readable()
+        assert list(reader) == [b'line one\n', b'line two\n', b'end']
+
+        reader.close()
+        assert r.closed
+
+    def test_large_read_is_received_into_one_buffer(self):
+        d = DummySocket()
+        body = b'a' * 100000
+        r = HTTP11Response(
+            200, 'OK', {b'content-length': [b'100000']}, d, None
+        )
+        d._buffer = BytesIO(body)
+        d.recv = None
+
+        assert r.read() == body
+
     def test_chunked_read_of_non_chunked(self):
         r = HTTP11Response(200, 'OK', {b'content-length': [b'0']}, None, None)
 
@@ -994,6 +1224,12 @@ class DummySocket(object):
     def close(self):
         pass
 
+    def recv_into(self, b):
+        data = self._buffer.read(len(b))
+        self._read_counter += len(data)
+        b[:len(data)] = data
+        return len(data)
+
     def readline(self):
         line = self._buffer.readline()
         self._read_counter += len(line)
@@ -1003,6 +1239,18 @@ class DummySocket(object):
         pass
 
 
+class ShortReadSocket(DummySocket):
+    """
+    A DummySocket whose reads return at most ``size`` bytes.
+    """
+    def __init__(self, size):
+        super(ShortReadSocket, self).__init__()
+        self.size = size
+
+    def recv(self, l):
+        return super(ShortReadSocket, self).recv(min(l, self.size))
+
+
 class DummyFile(object):
     def __init__(self, data):
         self.buffer = BytesIO(data)
@@ -12,7 +12,13 @@ from hpack.hpack_compat import Encoder
 from hyper.common.connection import HTTPConnection
 from hyper.http20.connection import HTTP20Connection
 from hyper.http20.response import HTTP20Response, HTTP20Push
-from hyper.http20.exceptions import ConnectionError, StreamResetError
+from hyper.http20.exceptions import (
+    ConnectionError, StreamResetError, TooManyStreamsError
+)
+from hyper.http20.window import (
+    BaseFlowControlManager, BDPFlowControlManager,
+    DocumentSizeFlowControlManager
+)
 from hyper.http20.util import (
     combine_repeated_headers, split_repeated_headers, h2_safe_headers
 )
@@ -27,7 +33,7 @@ import pytest
 import socket
 import zlib
 import brotli
-from io import BytesIO
+from io import BufferedReader, BytesIO
 
 TEST_DIR = os.path.abspath(os.path.dirname(__file__))
 TEST_CERTS_DIR = os.path.join(TEST_DIR, 'certs')
@@ -215,7 +221,7 @@ class TestHyperConnection(object):
     def test_request_correctly_sent_max_chunk(self, frame_buffer):
         """
         Test that request correctly sent when data length multiple
-        max chunk. We check last chunk has a end flag and correct number
+        max frame size. We check last chunk has a end flag and correct number
         of chunks.
         """
         def data_callback(chunk, **kwargs):
@@ -226,7 +232,7 @@ class TestHyperConnection(object):
         c._sock = DummySocket()
         c._send_cb = data_callback
         c.putrequest('GET', '/')
-        c.endheaders(message_body=b'1'*1024, final=True)
+        c.endheaders(message_body=b'1'*16384, final=True)
 
         frames = list(frame_buffer)
         assert len(frames) == 2
@@ -238,23 +244,24 @@ class TestHyperConnection(object):
         c._sock = DummySocket()
         c._send_cb = data_callback
         c.putrequest('GET', '/')
-        c.endheaders(message_body=b'1' * 2024, final=True)
+        c.endheaders(message_body=b'1' * 32768, final=True)
 
         frames = list(frame_buffer)
         assert len(frames) == 3
         assert isinstance(frames[1], DataFrame)
         assert frames[2].flags == set(['END_STREAM'])
 
-        # two chunks with last chunk < 1024
+        # two chunks with last chunk < max frame size
         c = HTTP20Connection('www.google.com')
         c._sock = DummySocket()
         c._send_cb = data_callback
         c.putrequest('GET', '/')
-        c.endheaders(message_body=b'1' * 2000, final=True)
+        c.endheaders(message_body=b'1' * 20000, final=True)
 
         frames = list(frame_buffer)
         assert len(frames) == 3
         assert isinstance(frames[1], DataFrame)
+        assert len(frames[1].data) == 16384
         assert frames[2].flags == set(['END_STREAM'])
 
         # no chunks
@@ -267,6 +274,93 @@ class TestHyperConnection(object):
         frames = list(frame_buffer)
         assert len(frames) == 1
 
+    def test_request_body_is_sent_in_one_write(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.request('POST', '/', body=b'1' * 50000)
+
+        assert len(sock.queue) == 1
+
+        frame_buffer.add_data(sock.queue[0])
+        frames = list(frame_buffer)
+        assert [len(f.data) for f in frames[1:]] == [16384, 16384, 16384, 848]
+        assert frames[-1].flags == set(['END_STREAM'])
+
+    def test_request_body_frames_use_max_frame_size(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.connect()
+        with c._conn as conn:
+            conn.max_outbound_frame_size = 40000
+        c.request('POST', '/', body=b'1' * 50000)
+
+        frame_buffer.add_data(b''.join(sock.queue))
+        frames = [f for f in frame_buffer if isinstance(f, DataFrame)]
+        assert [len(f.data) for f in frames] == [40000, 10000]
+
+    def test_file_bodies_are_read_in_blocks(self, frame_buffer):
+        class RecordingFile(BytesIO):
+            def read(self, size=-1):
+                sizes.append(size)
+                return BytesIO.read(self, size)
+
+        sizes = []
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.request('POST', '/', body=RecordingFile(b'1' * 40000))
+
+        assert sizes == [65536]
+
+        frame_buffer.add_data(b''.join(sock.queue))
+        frames = list(frame_buffer)
+        assert [len(f.data) for f in frames[1:]] == [16384, 16384, 7232]
+        assert frames[-1].flags == set(['END_STREAM'])
+
+    def test_request_many_sends_headers_in_one_write(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        stream_ids = c.request_many([
+            ('GET', '/a', None, None),
+            ('GET', '/b', None, {'x-header': 'b'}),
+            ('HEAD', '/c', None, None),
+        ])
+
+        assert stream_ids == [1, 3, 5]
+        assert len(sock.queue) == 1
+
+        frame_buffer.add_data(sock.queue[0])
+        frames = list(frame_buffer)
+        assert [f.stream_id for f in frames] == [1, 3, 5]
+        assert all(isinstance(f, HeadersFrame) for f in frames)
+        assert all('END_STREAM' in f.flags for f in frames)
+        assert c.streams[3].headers[b'x-header'] == [b'b']
+
+    def test_request_many_sends_bodies_after_headers(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        stream_ids = c.request_many([
+            ('POST', '/a', b'hello', None),
+            ('GET', '/b', None, None),
+        ])
+
+        frame_buffer.add_data(b''.join(sock.queue))
+        frames = list(frame_buffer)
+        assert stream_ids == [1, 3]
+        assert isinstance(frames[0], HeadersFrame)
+        assert 'END_STREAM' not in frames[0].flags
+        assert isinstance(frames[1], HeadersFrame)
+        assert 'END_STREAM' in frames[1].flags
+        assert isinstance(frames[2], DataFrame)
+        assert frames[2].data == b'hello'
+        assert frames[2].flags == set(['END_STREAM'])
+
     def test_that_we_correctly_send_over_the_socket(self):
         sock = DummySocket()
         c = HTTP20Connection('www.google.com')
@@ -275,8 +369,62 @@ class TestHyperConnection(object):
         c.endheaders(message_body=b'hello there', final=True)
 
         # Don't bother testing that the serialization was ok, that should be
-        # fine.
-        assert len(sock.queue) == 3
+        # fine. The headers and body are coalesced into a single write.
+        assert len(sock.queue) == 1
+
+    def test_corked_connection_writes_once(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        with c._corked():
+            c.ping(b'\x00' * 8)
+            with c._corked():
+                c.ping(b'\x01' * 8)
+            assert not sock.queue
+            c.ping(b'\x02' * 8)
+            assert not sock.queue
+
+        assert len(sock.queue) == 1
+        frame_buffer.add_data(sock.queue[0])
+        frames = list(frame_buffer)
+        assert [f.opaque_data for f in frames] == [
+            b'\x00' * 8, b'\x01' * 8, b'\x02' * 8
+        ]
+
+    def test_uncorking_flushes_before_reading(self):
+        sock = DummySocket()
+        sock.buffer = BytesIO(b'\x00\x00\x08\x00\x01\x00\x00\x00\x01testdata')
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.putrequest('GET', '/')
+        c.endheaders()
+        sock.queue = []
+
+        with c._corked():
+            c.ping(b'\x00' * 8)
+            c._recv_cb()
+
+            # The ping must be on the wire before we wait for the server.
+            assert len(sock.queue) == 1
+            assert c._cork_depth == 1
+
+    def test_close_sends_resets_and_goaway_together(self, frame_buffer):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.request('GET', '/a')
+        c.request('GET', '/b')
+        sock.queue = []
+
+        c.close()
+
+        assert len(sock.queue) == 1
+        frame_buffer.add_data(sock.queue[0])
+        frames = list(frame_buffer)
+        assert [type(f) for f in frames] == [
+            RstStreamFrame, RstStreamFrame, GoAwayFrame
+        ]
 
     def test_we_can_read_from_the_socket(self):
         sock = DummySocket()
@@ -289,7 +437,7 @@ class TestHyperConnection(object):
         c._recv_cb()
 
         s = c.recent_stream
-        assert s.data == [b'testdata']
+        assert list(s.data) == [b'testdata']
 
     def test_putrequest_sends_data(self):
         sock = DummySocket()
@@ -303,9 +451,9 @@ class TestHyperConnection(object):
             headers={'Content-Type': 'application/json'}
         )
 
-        # The socket should have received one headers frame and two body
-        # frames.
-        assert len(sock.queue) == 3
+        # The socket should have received one headers frame and one body
+        # frame, in a single write.
+        assert len(sock.queue) == 1
 
     def test_request_with_utf8_bytes_body(self):
         c = HTTP20Connection('www.google.com')
@@ -616,6 +764,44 @@ class TestHyperConnection(object):
         assert isinstance(queue[2], WindowUpdateFrame)
         assert queue[2].window_increment == len(b'hi there sir again')
 
+    def test_flow_control_probes(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'hi there sir'
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com', window_manager=BDPFlowControlManager
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        c._single_read()
+
+        # The first DATA frame starts a probe, which sends a PING.
+        frame_buffer.add_data(b''.join(sock.queue))
+        pings = [f for f in frame_buffer if isinstance(f, PingFrame)]
+        assert [p.opaque_data for p in pings] == [b'hyperbdp']
+
+        stream_manager = c.streams[1]._in_window_manager
+        assert c.window_manager._probe_size == len(b'hi there sir')
+        assert stream_manager._probe_size == len(b'hi there sir')
+
+        # The acknowledgement finishes it.
+        f = PingFrame(0)
+        f.flags.add('ACK')
+        f.opaque_data = b'hyperbdp'
+        sock.buffer = BytesIO(f.serialize())
+        c._single_read()
+
+        assert c._probe_sent_at is None
+        assert c.window_manager._probe_size is None
+        assert c.window_manager.bandwidth > 0
+        assert stream_manager.bandwidth > 0
+
     def test_stream_window_increments_appropriately(self, frame_buffer):
         e = Encoder()
         h = HeadersFrame(1)
@@ -645,6 +831,231 @@ class TestHyperConnection(object):
         assert isinstance(queue[2], WindowUpdateFrame)
         assert queue[2].window_increment == len(b'hi there sir again')
 
+    def test_requests_wait_for_stream_limit(self):
+        f = SettingsFrame(0)
+        f.settings[SettingsFrame.MAX_CONCURRENT_STREAMS] = 1
+        sock = DummySocket()
+        sock.buffer = BytesIO(f.serialize())
+
+        c = HTTP20Connection('www.google.com', stream_wait_timeout=0.1)
+        c._sock = sock
+        c._single_read()
+        c.request('GET', '/')
+
+        with pytest.raises(TooManyStreamsError):
+            c.request('GET', '/')
+
+        # Once the first response has ended, the second request is sent.
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200)])
+        h.flags = set(['END_HEADERS', 'END_STREAM'])
+        sock.buffer = BytesIO(h.serialize())
+
+        assert c.request('GET', '/') == 3
+        assert c.get_response(1).status == 200
+
+    def test_unsent_requests_count_against_stream_limit(self):
+        f = SettingsFrame(0)
+        f.settings[SettingsFrame.MAX_CONCURRENT_STREAMS] = 1
+        sock = DummySocket()
+        sock.buffer = BytesIO(f.serialize())
+
+        c = HTTP20Connection('www.google.com', stream_wait_timeout=0)
+        c._sock = sock
+        c._single_read()
+        stream_id = c.putrequest('GET', '/')
+
+        with pytest.raises(TooManyStreamsError):
+            c.putrequest('GET', '/')
+
+        # Closing the stream frees it up.
+        c.streams[stream_id].close()
+        assert c.putrequest('GET', '/') == 3
+
+    def test_reads_are_exact(self):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'hi there sir'
+        d2 = DataFrame(1)
+        d2.data = b'hi there sir again'
+        d2.flags = set(['END_STREAM'])
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize() + d2.serialize())
+
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.request('GET', '/')
+        resp = c.get_response()
+        stream = c.streams[1]
+
+        # Chunks are split to return exactly what was asked for, and the rest
+        # is left on the stream.
+        assert resp.read(5) == b'hi th'
+        assert stream._data_size == 25
+        assert resp.read(10) == b'ere sirhi '
+        assert stream._data_size == 15
+        assert not resp._data_buffer
+
+        # Whole frames are bytes, even once they've been split.
+        chunks = list(resp.read_chunked())
+        assert chunks == [b'there sir again']
+        assert isinstance(chunks[0], bytes)
+
+    def test_stream_window_opened_for_document(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-length', '100000')])
+        h.flags = set(['END_HEADERS'])
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com', window_manager=DocumentSizeFlowControlManager
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        c._single_read()
+
+        # The stream window is opened as soon as the headers arrive, before
+        # the response is asked for.
+        frame_buffer.add_data(b''.join(sock.queue))
+        queue = [f for f in frame_buffer if isinstance(f, WindowUpdateFrame)]
+        assert len(queue) == 1
+        assert queue[0].stream_id == 1
+        assert queue[0].window_increment == 100000 - 65535
+        assert c.streams[1]._in_window_manager.document_size == 100000
+
+    def test_credit_returned_on_read(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'hi there sir'
+        d2 = DataFrame(1)
+        d2.data = b'hi there sir again'
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize() + d2.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com',
+            window_manager=EagerFlowControlManager,
+            credit_on_read=True,
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        resp = c.get_response()
+
+        # All the data has arrived, but none of it has been read.
+        assert len(c.streams[1].data) == 2
+        frame_buffer.add_data(b''.join(sock.queue))
+        queue = list(frame_buffer)
+        assert len(queue) == 1
+        assert isinstance(queue[0], HeadersFrame)
+
+        sock.queue = []
+        assert next(resp.read_chunked()) == b'hi there sir'
+
+        frame_buffer.add_data(b''.join(sock.queue))
+        queue = list(frame_buffer)
+        assert len(queue) == 2
+        assert all(isinstance(f, WindowUpdateFrame) for f in queue)
+        assert set(f.stream_id for f in queue) == set([0, 1])
+        assert all(
+            f.window_increment == len(b'hi there sir') for f in queue
+        )
+
+    def test_padding_credit_returned_on_arrival(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'hi there sir'
+        d.flags.add('PADDED')
+        d.pad_length = 9
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com',
+            window_manager=EagerFlowControlManager,
+            credit_on_read=True,
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        c.get_response()
+
+        # The padding and its length byte are credited straight away.
+        frame_buffer.add_data(b''.join(sock.queue))
+        queue = [f for f in frame_buffer if isinstance(f, WindowUpdateFrame)]
+        assert set(f.stream_id for f in queue) == set([0, 1])
+        assert all(f.window_increment == 10 for f in queue)
+
+    def test_closing_stream_returns_connection_credit(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'hi there sir'
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com',
+            window_manager=EagerFlowControlManager,
+            credit_on_read=True,
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        resp = c.get_response()
+        sock.queue = []
+        resp.close()
+
+        frame_buffer.add_data(b''.join(sock.queue))
+        queue = [f for f in frame_buffer if isinstance(f, WindowUpdateFrame)]
+        assert len(queue) == 1
+        assert queue[0].stream_id == 0
+        assert queue[0].window_increment == len(b'hi there sir')
+
+    def test_max_buffered_bytes_limits_connection_window(self, frame_buffer):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200), ('content-type', 'foo/bar')])
+        h.flags = set(['END_HEADERS'])
+        d = DataFrame(1)
+        d.data = b'a' * 16384
+        sock = DummySocket()
+        sock.buffer = BytesIO(h.serialize() + d.serialize())
+
+        c = HTTP20Connection(
+            'www.google.com',
+            window_manager=GreedyFlowControlManager,
+            max_buffered_bytes=100000,
+        )
+        c._sock = sock
+        c.request('GET', '/')
+        resp = c.get_response()
+        resp.read(16384)
+
+        # The manager asks for far more, but the connection window only
+        # grows to the limit.
+        frame_buffer.add_data(b''.join(sock.queue))
+        increments = [
+            f.window_increment for f in frame_buffer
+            if isinstance(f, WindowUpdateFrame) and f.stream_id == 0
+        ]
+        assert sum(increments) == 100000 - 65535 + 16384
+
+    def test_max_buffered_bytes_below_initial_window(self):
+        with pytest.raises(ValueError):
+            HTTP20Connection('www.google.com', max_buffered_bytes=65534)
+
     def test_that_using_proxy_keeps_http_headers_intact(self):
         sock = DummySocket()
         c = HTTP20Connection(
@@ -698,20 +1109,114 @@ class TestHyperConnection(object):
 
     def test_recv_cb_n_times(self):
         sock = DummySocket()
-        sock.can_read = True
 
         c = HTTP20Connection('www.google.com')
         c._sock = sock
 
-        mutable = {'counter': 0}
+        calls = []
 
-        def consume_single_frame():
-            mutable['counter'] += 1
+        def consume_single_frame(block=True):
+            calls.append(block)
+            return set()
 
         c._single_read = consume_single_frame
         c._recv_cb()
 
-        assert mutable['counter'] == 10
+        # One blocking read, then a drain of non-blocking ones.
+        assert calls == [True] + [False] * 9
+
+    def test_recv_cb_stops_draining_when_nothing_to_read(self):
+        sock = DummySocket()
+
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        calls = []
+
+        def consume_single_frame(block=True):
+            calls.append(block)
+            if len(calls) > 2:
+                return None
+            return set()
+
+        c._single_read = consume_single_frame
+        c._recv_cb()
+
+        assert calls == [True, False, False]
+
+    def test_non_blocking_single_read_with_nothing_to_read(self):
+        sock = DummySocket()
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        assert c._single_read(block=False) is None
+
+    def test_single_read_from_replaced_socket_does_nothing(self):
+        sock = DummySocket()
+        sock.buffer = BytesIO(SettingsFrame(0).serialize())
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+
+        assert c._single_read(sock=DummySocket()) == set()
+        assert sock.buffer.tobytes() == SettingsFrame(0).serialize()
+
+    def test_received_data_is_fed_to_h2_a_frame_at_a_time(self):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200)])
+        h.flags.add('END_HEADERS')
+        frames = [h.serialize()]
+        for chunk in (b'a' * 10, b'b' * 2000, b'c'):
+            f = DataFrame(1)
+            f.data = chunk
+            frames.append(f.serialize())
+
+        sock = DummySocket()
+        sock.buffer = BytesIO(b''.join(frames))
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        c.request('GET', '/')
+
+        fed = []
+        with c._conn as conn:
+            receive_data = conn.receive_data
+
+            def record(data):
+                fed.append(data)
+                return receive_data(data)
+
+            conn.receive_data = record
+
+        c._single_read()
+
+        assert [bytes(data) for data in fed] == frames
+        assert all(isinstance(data, memoryview) for data in fed) or is_py2
+
+    @pytest.mark.parametrize('size', [1, 5, 9, 10, 100, 1000, 100000])
+    def test_frames_split_across_reads(self, size):
+        e = Encoder()
+        h = HeadersFrame(1)
+        h.data = e.encode([(':status', 200)])
+        h.flags.add('END_HEADERS')
+        frames = [h.serialize()]
+        body = b''
+        for chunk in (b'a' * 10, b'b' * 2000, b'', b'c' * 300):
+            f = DataFrame(1)
+            f.data = chunk
+            frames.append(f.serialize())
+            body += chunk
+        f = DataFrame(1)
+        f.flags.add('END_STREAM')
+        frames.append(f.serialize())
+
+        sock = TrickleSocket(b''.join(frames), size)
+        c = HTTP20Connection('www.google.com')
+        c._sock = sock
+        r = c.request('GET', '/')
+        resp = c.get_response(r)
+
+        assert resp.read() == body
+        assert c._partial_frame_length == 0
 
     def test_sending_file(self, frame_buffer):
         # Prepare a socket so we can open a stream.
@@ -719,9 +1224,10 @@ class TestHyperConnection(object):
         c = HTTP20Connection('www.google.com')
         c._sock = sock
 
-        # Send a request that involves uploading a file handle.
-        with open(__file__, 'rb') as f:
-            c.request('GET', '/', body=f)
+        # Send a request that involves uploading a file handle. The body fits
+        # in the initial flow control window.
+        body = os.urandom(50000)
+        c.request('GET', '/', body=BytesIO(body))
 
         # Get all the frames
         frame_buffer.add_data(b''.join(sock.queue))
@@ -732,8 +1238,7 @@ class TestHyperConnection(object):
             f.data for f in frames if isinstance(f, DataFrame)
         )
 
-        with open(__file__, 'rb') as f:
-            assert f.read() == sent_data
+        assert sent_data == body
 
     def test_closing_incomplete_stream(self, frame_buffer):
         # Prepare a socket so we can open a stream.
@@ -1078,6 +1583,14 @@ class TestResponse(object):
         assert resp.status == 200
         assert not resp.headers
 
+    def test_response_headers_are_read_only(self):
+        headers = HTTPHeaderMap([(':status', '200'), ('name', 'value')])
+        resp = HTTP20Response(headers, None)
+
+        assert resp.headers == HTTPHeaderMap([('name', 'value')])
+        with pytest.raises(TypeError):
+            resp.headers[b'name'] = b'other'
+
     def test_response_transparently_decrypts_gzip(self):
         headers = HTTPHeaderMap(
             [(':status', '200'), ('content-encoding', 'gzip')]
@@ -1162,13 +1675,36 @@ class TestResponse(object):
         stream = DummyStream(b'1234567890')
         chunks = [b'12', b'34', b'56', b'78', b'90'] * 2
         resp = HTTP20Response(headers, stream)
-        resp._data_buffer = b'1234567890'
+        resp._data_buffer = bytearray(b'1234567890')
 
         for chunk in chunks:
             assert resp.read(2) == chunk
 
         assert resp.read() == b''
 
+    def test_read_whole_frames(self):
+        class FrameStream(DummyStream):
+            def _read(self, amt=None):
+                d, self.data = self.data, b''
+                self._remote_closed = True
+                return d
+
+        frame = b'1234567890'
+
+        # Data that's read in full isn't copied.
+        headers = HTTPHeaderMap([(':status', '200')])
+        resp = HTTP20Response(headers, FrameStream(frame))
+        assert resp.read() is frame
+
+        # Nor is data that's read in part.
+        headers = HTTPHeaderMap([(':status', '200')])
+        stream = DummyStream(frame)
+        resp = HTTP20Response(headers, stream)
+        assert resp.read(4) == b'1234'
+        assert not resp._data_buffer
+        assert resp.read(10) == b'567890'
+        assert stream.closed
+
     def test_getheader(self):
         headers = HTTPHeaderMap(
             [(':status', '200'), ('content-type', 'application/json')]
@@ -1233,6 +1769,72 @@ class TestResponse(object):
 
         assert received == b'this is test data'
 
+    def test_readinto_frames(self):
+        headers = HTTPHeaderMap([(':status', '200')])
+        stream = DummyStream(None)
+        stream.data_frames = [b'12', b'3456', b'', b'78', b'9']
+        resp = HTTP20Response(headers, stream)
+        b = bytearray(3)
+
+        received = []
+        while True:
+            count = resp.readinto(b)
+            if not count:
+                break
+            received.append(bytes(b[:count]))
+
+        assert received == [b'12', b'345', b'6', b'78', b'9']
+        assert stream.closed
+
+    def test_readinto_empty_buffer(self):
+        headers = HTTPHeaderMap(
+            [(':status', '200'), ('content-encoding', 'gzip')]
+        )
+        c = zlib_compressobj(wbits=25)
+        body = c.compress(b'this is test data') + c.flush()
+        stream = DummyStream(body)
+        resp = HTTP20Response(headers, stream)
+
+        assert resp.readinto(bytearray()) == 0
+        assert not stream.closed
+        assert resp.read() == b'this is test data'
+
+    def test_readinto_compressed_data(self):
+        headers = HTTPHeaderMap(
+            [(':status', '200'), ('content-encoding', 'gzip')]
+        )
+        c = zlib_compressobj(wbits=25)
+        body = c.compress(b'this is test data')
+        body += c.flush()
+        stream = DummyStream(body)
+        resp = HTTP20Response(headers, stream)
+        b = bytearray(4)
+
+        received = b''
+        while len(received) < 7:
+            count = resp.readinto(b)
+            assert 0 < count <= 4
+            received += bytes(b[:count])
+
+        assert received.startswith(b'this is')
+        assert received + resp.read() == b'this is test data'
+        assert resp.readinto(b) == 0
+        assert stream.closed
+        assert not resp.closed
+
+    def test_response_as_buffered_reader(self):
+        headers = HTTPHeaderMap([(':status', '200')])
+        stream = DummyStream(None)
+        stream.data_frames = [b'line one\n', b'line ', b'two\n', b'end']
+        resp = HTTP20Response(headers, stream)
+        reader = BufferedReader(resp)
+
+        assert resp.readable()
+        assert list(reader) == [b'line one\n', b'line two\n', b'end']
+
+        reader.close()
+        assert resp.closed
+
     def test_response_version(self):
         r = HTTP20Response(HTTPHeaderMap([(':status', '200')]), None)
         assert r.version is HTTPVersion.http20
@@ -1283,6 +1885,112 @@ class TestHTTP20Adapter(object):
         assert conn._conn.ssl_context.check_hostname
         assert conn._conn.ssl_context.verify_mode == ssl.CERT_REQUIRED
 
+    def test_adapter_evicts_least_recently_used(self):
+        a = HTTP20Adapter(pool_connections=2)
+        conn1 = a.get_connection('http2bin.org', 80, 'http')
+        conn2 = a.get_connection('www.google.com', 80, 'http')
+
+        # Reusing the first connection makes the second the oldest.
+        assert a.get_connection('http2bin.org', 80, 'http') is conn1
+        conn3 = a.get_connection('example.com', 80, 'http')
+
+        assert list(a.connections.values()) == [conn1, conn3]
+        assert a.get_connection('www.google.com', 80, 'http') is not conn2
+
+    def test_adapter_closes_evicted_connections_when_idle(self):
+        a = HTTP20Adapter(pool_connections=1)
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+        sock = conn._sock
+        conn.streams[1] = object()
+
+        a.get_connection('www.google.com', 80, 'http')
+        assert not sock.closed
+
+        del conn.streams[1]
+        a.get_connection('www.google.com', 80, 'http')
+        assert sock.closed
+
+    def test_adapter_closes_idle_connections(self):
+        a = HTTP20Adapter(idle_timeout=0)
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+        sock = conn._sock
+        conn.streams[1] = object()
+
+        # A connection with open streams isn't idle.
+        assert a.get_connection('http2bin.org', 443, 'https') is conn
+
+        del conn.streams[1]
+        assert a.get_connection('http2bin.org', 443, 'https') is not conn
+        assert sock.closed
+
+    def test_adapter_keeps_idle_connections_without_timeout(self):
+        a = HTTP20Adapter(idle_timeout=None)
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+
+        assert a.get_connection('http2bin.org', 443, 'https') is conn
+
+    def test_adapter_replaces_closed_connections(self):
+        a = HTTP20Adapter()
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+        conn._conn._sock = None
+
+        assert a.get_connection('http2bin.org', 443, 'https') is not conn
+
+    def test_adapter_replaces_failed_connections(self):
+        a = HTTP20Adapter()
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+        conn._conn._reader_error = socket.error()
+
+        assert a.get_connection('http2bin.org', 443, 'https') is not conn
+
+    def test_adapter_replaces_connections_sent_goaway(self):
+        a = HTTP20Adapter()
+        conn = self.h2_connection(
+            a, 'http2bin.org', IdleSocket(GoAwayFrame(0).serialize())
+        )
+
+        assert a.get_connection('http2bin.org', 443, 'https') is not conn
+
+    def test_adapter_reuses_connections_sent_other_frames(self):
+        a = HTTP20Adapter()
+        conn = self.h2_connection(
+            a, 'http2bin.org', IdleSocket(SettingsFrame(0).serialize())
+        )
+
+        assert a.get_connection('http2bin.org', 443, 'https') is conn
+        assert not conn._sock.wait_readable(0)
+
+    def test_adapter_replaces_http11_connections_closed_by_server(self):
+        a = HTTP20Adapter()
+        conn = a.get_connection('http2bin.org', 80, 'http')
+        conn._conn._sock = IdleSocket(b'')
+
+        assert a.get_connection('http2bin.org', 80, 'http') is conn
+
+        conn._conn._sock = IdleSocket(b'HTTP/1.1 408')
+        assert a.get_connection('http2bin.org', 80, 'http') is not conn
+
+    def test_adapter_close_closes_evicted_connections(self):
+        a = HTTP20Adapter(pool_connections=1)
+        conn = self.h2_connection(a, 'http2bin.org', IdleSocket())
+        sock = conn._sock
+        conn.putrequest('GET', '/')
+        a.get_connection('www.google.com', 80, 'http')
+
+        a.close()
+        assert sock.closed
+        assert not a.connections
+
+    def h2_connection(self, adapter, host, sock):
+        """
+        Gets a connection from the adapter, and makes it an HTTP/2 connection
+        using the given socket.
+        """
+        conn = adapter.get_connection(host, 443, 'https')
+        conn._conn = HTTP20Connection(host, 443)
+        conn._conn._sock = sock
+        return conn
+
 
 class TestUtilities(object):
     def test_combining_repeated_headers(self):
@@ -1640,7 +2348,6 @@ class DummySocket(object):
         self.queue = []
         self._buffer = BytesIO()
         self._read_counter = 0
-        self.can_read = False
 
     @property
     def buffer(self):
@@ -1668,8 +2375,66 @@ class DummySocket(object):
     def close(self):
         pass
 
-    def fill(self):
-        pass
+    def fill(self, block=True):
+        return 0
+
+
+class IdleSocket(DummySocket):
+    """
+    A socket with ``data`` waiting to be read.
+    """
+    def __init__(self, data=b''):
+        super(IdleSocket, self).__init__()
+        self.buffer = BytesIO(data)
+        self.closed = False
+
+    def wait_readable(self, timeout=None, buffered=True):
+        return bool(len(self.buffer))
+
+    def fill(self, block=True):
+        return len(self.buffer)
+
+    def close(self):
+        self.closed = True
+
+
+class TrickleSocket(DummySocket):
+    """
+    A socket that receives ``data`` at most ``size`` bytes per read.
+    """
+    def __init__(self, data, size):
+        super(TrickleSocket, self).__init__()
+        self._data = data
+        self._size = size
+        self._received = 0
+
+    @property
+    def buffer(self):
+        return memoryview(self._data[self._read_counter:self._received])
+
+    def advance_buffer(self, amt):
+        self._read_counter += amt
+
+    def fill(self, block=True):
+        amt = min(self._size, len(self._data) - self._received)
+        self._received += amt
+        return amt
+
+
+class EagerFlowControlManager(BaseFlowControlManager):
+    """
+    A window manager that returns all of its credit straight away.
+    """
+    def increase_window_size(self, frame_size):
+        return frame_size
+
+
+class GreedyFlowControlManager(BaseFlowControlManager):
+    """
+    A window manager that asks for much more credit than it is owed.
+    """
+    def increase_window_size(self, frame_size):
+        return frame_size + 1000000
 
 
 class DummyStream(object):
@@ -1704,6 +2469,10 @@ class DummyStream(object):
         except IndexError:
             return None
 
+    @property
+    def remote_closed(self):
+        return self._remote_closed
+
     def close(self):
         if not self.closed:
             self.closed = True
@@ -10,6 +10,7 @@ import base64
 import requests
 import threading
 import time
+import h2.settings
 import hyper
 import hyper.http11.connection
 import pytest
@@ -20,13 +21,13 @@ from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from h2.frame_buffer import FrameBuffer
 from hyper.compat import ssl
 from hyper.contrib import HTTP20Adapter
-from hyper.common.exceptions import ProxyError
+from hyper.common.exceptions import ProxyError, ConnectionResetError
 from hyper.common.util import HTTPVersion, to_bytestring
 from hyperframe.frame import (
     Frame, SettingsFrame, WindowUpdateFrame, DataFrame, HeadersFrame,
     GoAwayFrame, RstStreamFrame
 )
-from hpack.hpack import Encoder
+from hpack.hpack import Decoder, Encoder
 from hpack.huffman import HuffmanEncoder
 from hpack.huffman_constants import (
     REQUEST_CODES, REQUEST_CODES_LENGTH
@@ -175,11 +176,73 @@ class TestHyperIntegration(SocketLevelTest):
 
         self.tear_down()
 
-    def test_stream_level_window_management(self):
+    def test_configured_settings(self, frame_buffer):
         self.set_up()
+
         data = []
         send_event = threading.Event()
 
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # We get one big chunk.
+            data.append(sock.recv(65535))
+
+            # We need to send back a SettingsFrame.
+            f = SettingsFrame(0)
+            sock.send(f.serialize())
+
+            send_event.set()
+            sock.close()
+
+        self._start_server(socket_handler)
+        conn = hyper.HTTP20Connection(
+            self.host, self.port, self.secure, settings={
+                h2.settings.INITIAL_WINDOW_SIZE: 1048576,
+                h2.settings.MAX_FRAME_SIZE: 65536,
+                h2.settings.MAX_CONCURRENT_STREAMS: 10,
+            }
+        )
+        conn.connect()
+        send_event.wait(5)
+
+        # The settings are followed by a single WINDOW_UPDATE that opens the
+        # connection window to match the stream windows.
+        preamble_size = len(b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n')
+        frame_buffer.add_data(data[0][preamble_size:])
+        frames = list(frame_buffer)
+
+        assert isinstance(frames[1], SettingsFrame)
+        assert frames[1].settings == {
+            SettingsFrame.ENABLE_PUSH: 0,
+            SettingsFrame.INITIAL_WINDOW_SIZE: 1048576,
+            SettingsFrame.MAX_FRAME_SIZE: 65536,
+            SettingsFrame.MAX_CONCURRENT_STREAMS: 10,
+        }
+        assert isinstance(frames[2], WindowUpdateFrame)
+        assert frames[2].stream_id == 0
+        assert frames[2].window_increment == 1048576 - 65535
+        assert len(frames) == 3
+
+        assert conn.window_manager.initial_window_size == 1048576
+        assert conn._new_stream()._in_window_manager.initial_window_size == (
+            1048576
+        )
+
+        self.tear_down()
+
+    def test_stream_level_window_management(self, frame_buffer):
+        self.set_up()
+        frames = []
+        send_event = threading.Event()
+
+        def receive_data(sock, amount):
+            # Receive frames until ``amount`` bytes of data have arrived.
+            while sum(len(f.data) for f in frames
+                      if type(f) is DataFrame) < amount:
+                frame_buffer.add_data(sock.recv(65535))
+                frames.extend(frame_buffer)
+
         def socket_handler(listener):
             sock = listener.accept()[0]
 
@@ -192,10 +255,9 @@ class TestHyperIntegration(SocketLevelTest):
             f.settings[SettingsFrame.INITIAL_WINDOW_SIZE] = 64
             sock.send(f.serialize())
 
-            # Grab three frames, the settings ACK, the initial headers frame,
-            # and the first data frame.
-            for x in range(0, 3):
-                data.append(sock.recv(65535))
+            # Receive data until the window is used up: the first chunk, and
+            # as much of the second as fits.
+            receive_data(sock, 64)
 
             # Send a WindowUpdate giving more window room to the stream.
             f = WindowUpdateFrame(1)
@@ -207,8 +269,8 @@ class TestHyperIntegration(SocketLevelTest):
             f.window_increment = 64
             sock.send(f.serialize())
 
-            # Reeive the remaining frame.
-            data.append(sock.recv(65535))
+            # Receive the rest of the data.
+            receive_data(sock, 96)
             send_event.set()
 
             # We're done.
@@ -224,25 +286,74 @@ class TestHyperIntegration(SocketLevelTest):
         sd = b'a' * 32
         conn.send(sd)
 
-        # Send the second one. This should block until the WindowUpdate comes
-        # in.
+        # Send the second one. Half of it fits in the window, and the rest
+        # should block until the WindowUpdate comes in.
         sd = sd * 2
         conn.send(sd, final=True)
         assert send_event.wait(0.3)
 
-        # Decode the frames.
-        frames = [decode_frame(d) for d in data]
+        # The second chunk was split to fit the window.
+        data_frames = [f for f in frames if type(f) is DataFrame]
+        assert [len(f.data) for f in data_frames] == [32, 32, 32]
+        assert 'END_STREAM' not in data_frames[1].flags
+        assert 'END_STREAM' in data_frames[2].flags
 
-        # We care about the last two. The first should be a data frame
-        # containing 32 bytes.
-        assert (isinstance(frames[-2], DataFrame) and
-                not isinstance(frames[-2], HeadersFrame))
-        assert len(frames[-2].data) == 32
+        self.tear_down()
 
-        # The second should be a data frame containing 64 bytes.
-        assert isinstance(frames[-1], DataFrame)
-        assert len(frames[-1].data) == 64
+    def test_credit_returned_while_reading(self, frame_buffer):
+        self.set_up()
 
+        req_event = threading.Event()
+        recv_event = threading.Event()
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            e = Encoder()
+
+            # We get two messages for the connection open and then a HEADERS
+            # frame.
+            receive_preamble(sock)
+            sock.recv(65535)
+
+            # Wait for the request, then send the headers and enough data to
+            # fill the windows.
+            req_event.wait(5)
+            f = build_headers_frame([(':status', '200')], e)
+            f.stream_id = 1
+            sock.send(f.serialize())
+
+            for size in (16384, 16384, 16384, 16383):
+                f = DataFrame(1)
+                f.data = b'a' * size
+                sock.send(f.serialize())
+
+            # The rest is only sent once the client returns some credit.
+            while not any(isinstance(f, WindowUpdateFrame) and
+                          f.stream_id == 1 for f in frame_buffer):
+                frame_buffer.add_data(sock.recv(65535))
+
+            f = DataFrame(1)
+            f.data = b'a' * 16384
+            f.flags.add('END_STREAM')
+            sock.send(f.serialize())
+
+            recv_event.wait(5)
+            sock.close()
+
+        self._start_server(socket_handler)
+        conn = hyper.HTTP20Connection(
+            self.host, self.port, self.secure, credit_on_read=True
+        )
+        conn.request('GET', '/')
+        req_event.set()
+        resp = conn.get_response()
+
+        # More is asked for than the window allows, so the credit has to be
+        # returned before the read finishes.
+        assert resp.read(65535 + 16384) == b'a' * (65535 + 16384)
+
+        recv_event.set()
         self.tear_down()
 
     def test_connection_context_manager(self):
@@ -1013,6 +1124,82 @@ class TestHyperIntegration(SocketLevelTest):
         recv_event.set()
         self.tear_down()
 
+    def test_reader_thread_dispatches_to_waiting_streams(self):
+        self.set_up()
+
+        req_event = threading.Event()
+        recv_event = threading.Event()
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            receive_preamble(sock)
+
+            # Wait for both requests, then answer them in reverse order.
+            req_event.wait(5)
+            e = self.get_encoder()
+            for stream_id in (3, 1):
+                f = build_headers_frame([(':status', '200')], e)
+                f.stream_id = stream_id
+                sock.sendall(f.serialize())
+
+                f = DataFrame(stream_id)
+                f.data = ('stream %d' % stream_id).encode('ascii')
+                f.flags.add('END_STREAM')
+                sock.sendall(f.serialize())
+
+            recv_event.wait(5)
+            sock.close()
+
+        self._start_server(socket_handler)
+        conn = hyper.HTTP20Connection(
+            self.host, self.port, self.secure, reader_thread=True
+        )
+        first = conn.request('GET', '/')
+        second = conn.request('GET', '/')
+        assert conn._reader.is_alive()
+        req_event.set()
+
+        def read(stream_id):
+            return conn.get_response(stream_id).read()
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        futures = [pool.submit(read, first), pool.submit(read, second)]
+
+        assert futures[0].result(timeout=5) == b'stream 1'
+        assert futures[1].result(timeout=5) == b'stream 3'
+
+        recv_event.set()
+        conn.close()
+        self.tear_down()
+
+    def test_reader_thread_errors_reach_waiting_streams(self):
+        self.set_up()
+
+        req_event = threading.Event()
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            receive_preamble(sock)
+            sock.recv(65535)
+
+            # Hang up without responding.
+            req_event.wait(5)
+            sock.close()
+
+        self._start_server(socket_handler)
+        conn = hyper.HTTP20Connection(
+            self.host, self.port, self.secure, reader_thread=True
+        )
+        stream_id = conn.request('GET', '/')
+        req_event.set()
+
+        with pytest.raises((ConnectionResetError, ssl.SSLError)):
+            conn.get_response(stream_id)
+
+        self.tear_down()
+
     def test_upgrade(self):
         self.set_up(secure=False)
 
@@ -1476,6 +1663,88 @@ class TestRequestsAdapter(SocketLevelTest):
         recv_event.set()
         self.tear_down()
 
+    def test_adapter_multiplexes_concurrent_requests(self, monkeypatch,
+                                                     frame_buffer):
+        self.set_up()
+
+        # We need to patch the ssl_wrap_socket method to ensure that we
+        # forcefully upgrade.
+        old_wrap_socket = hyper.http11.connection.wrap_socket
+
+        def wrap(*args):
+            sock, _ = old_wrap_socket(*args)
+            return sock, 'h2'
+
+        monkeypatch.setattr(hyper.http11.connection, 'wrap_socket', wrap)
+
+        recv_event = threading.Event()
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # Do the handshake: conn header, settings, send settings, recv ack.
+            frame_buffer.add_data(receive_preamble(sock))
+
+            # Wait for both requests, noting the path of each.
+            decoder = Decoder()
+            paths = {}
+            while len(paths) < 2:
+                frame_buffer.add_data(sock.recv(65535))
+                for f in frame_buffer:
+                    if isinstance(f, HeadersFrame):
+                        headers = dict(decoder.decode(f.data, raw=True))
+                        paths[f.stream_id] = headers[b':path']
+
+            # Answer the later request first.
+            for stream_id in sorted(paths, reverse=True):
+                h = HeadersFrame(stream_id)
+                h.data = self.get_encoder().encode(
+                    [(':status', 200), ('content-length', 4)]
+                )
+                h.flags.add('END_HEADERS')
+                sock.send(h.serialize())
+                d = DataFrame(stream_id)
+                d.data = paths[stream_id]
+                d.flags.add('END_STREAM')
+                sock.send(d.serialize())
+
+            # keep the socket open for clean shutdown
+            recv_event.wait(5)
+            sock.close()
+
+        self._start_server(socket_handler)
+
+        # Don't read until both requests have been sent: the server answers
+        # them together, and a read holds the connection until it's done.
+        sent = []
+        all_sent = threading.Event()
+        old_get_response = hyper.HTTPConnection.get_response
+
+        def get_response(conn, *args, **kwargs):
+            sent.append(None)
+            if len(sent) == 2:
+                all_sent.set()
+            all_sent.wait(5)
+            return old_get_response(conn, *args, **kwargs)
+
+        monkeypatch.setattr(hyper.HTTPConnection, 'get_response', get_response)
+
+        s = requests.Session()
+        s.mount('https://%s' % self.host, HTTP20Adapter())
+
+        def get(path):
+            url = 'https://%s:%s%s' % (self.host, self.port, path)
+            return s.get(url, timeout=5).content
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            bodies = list(executor.map(get, ['/one', '/two']))
+
+        # Each response reached the thread that sent its request.
+        assert bodies == [b'/one', b'/two']
+
+        recv_event.set()
+        self.tear_down()
+
     def test_adapter_uses_proxies(self):
         self.set_up(secure=SocketSecuritySetting.SECURE_NO_AUTO_WRAP,
                     proxy=True)
@@ -359,6 +359,180 @@ class TestHyperH11Integration(SocketLevelTest):
 
         assert r.read() == b'hellotherehello'
 
+    def test_large_response_bodies(self):
+        self.set_up()
+
+        send_event = threading.Event()
+        body = b'abcdefghij' * 50000
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # We should get the initial requests.
+            data = b''
+            while data.count(b'\r\n\r\n') < 2:
+                data += sock.recv(65535)
+
+            send_event.wait()
+
+            # We need to send back two responses.
+            resp = (
+                b'HTTP/1.1 200 OK\r\n'
+                b'Server: socket-level-server\r\n'
+                b'Content-Length: 500000\r\n'
+                b'\r\n'
+            )
+            sock.sendall(resp + body + resp + body)
+            sock.close()
+
+        self._start_server(socket_handler)
+        c = self.get_connection()
+        c.network_buffer_size = 1024
+        c.request('GET', '/')
+        c.request('GET', '/')
+        send_event.set()
+
+        r = c.get_response()
+        assert r.read() == body
+
+        r = c.get_response()
+        b = bytearray(len(body))
+        view = memoryview(b)
+        received = 0
+        while received < len(body):
+            received += r.readinto(view[received:])
+
+        assert b == body
+        assert r.readinto(view) == 0
+
+        c.close()
+
+    def test_response_head_larger_than_buffer(self):
+        self.set_up()
+
+        send_event = threading.Event()
+        cookie = b'a' * 5000
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # We should get the initial request.
+            data = b''
+            while not data.endswith(b'\r\n\r\n'):
+                data += sock.recv(65535)
+
+            send_event.wait()
+
+            # We need to send back a response.
+            resp = (
+                b'HTTP/1.1 200 OK\r\n'
+                b'Server: socket-level-server\r\n'
+                b'Set-Cookie: ' + cookie + b'\r\n'
+                b'Content-Length: 5\r\n'
+                b'\r\n'
+                b'hello'
+            )
+            sock.sendall(resp)
+            sock.close()
+
+        self._start_server(socket_handler)
+        c = self.get_connection()
+        c.network_buffer_size = 1024
+        c.request('GET', '/')
+        send_event.set()
+        r = c.get_response()
+
+        assert r.status == 200
+        assert r.headers[b'set-cookie'] == [cookie]
+        assert r.read() == b'hello'
+
+        c.close()
+
+    def test_response_head_larger_than_64kb(self):
+        self.set_up()
+
+        send_event = threading.Event()
+        cookie = b'a' * 100000
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # We should get the initial request.
+            data = b''
+            while not data.endswith(b'\r\n\r\n'):
+                data += sock.recv(65535)
+
+            send_event.wait()
+
+            # We need to send back a response.
+            resp = (
+                b'HTTP/1.1 200 OK\r\n'
+                b'Server: socket-level-server\r\n'
+                b'Set-Cookie: ' + cookie + b'\r\n'
+                b'Content-Length: 5\r\n'
+                b'\r\n'
+                b'hello'
+            )
+            sock.sendall(resp)
+            sock.close()
+
+        self._start_server(socket_handler)
+        c = self.get_connection()
+        c.request('GET', '/')
+        send_event.set()
+        r = c.get_response()
+
+        assert r.status == 200
+        assert r.headers[b'set-cookie'] == [cookie]
+        assert r.read() == b'hello'
+
+        c.close()
+
+    def test_chunked_response_larger_than_buffer(self):
+        self.set_up()
+
+        send_event = threading.Event()
+        body = b'abcdefghij' * 1000
+
+        def socket_handler(listener):
+            sock = listener.accept()[0]
+
+            # We should get the initial request.
+            data = b''
+            while not data.endswith(b'\r\n\r\n'):
+                data += sock.recv(65535)
+
+            send_event.wait()
+
+            # We need to send back a response, with chunks that are larger
+            # than the network buffer.
+            resp = (
+                b'HTTP/1.1 200 OK\r\n'
+                b'Server: socket-level-server\r\n'
+                b'Transfer-Encoding: chunked\r\n'
+                b'\r\n'
+            )
+            resp += b'1388;ext=1\r\n' + body[:5000] + b'\r\n'
+            resp += b'1388\r\n' + body[5000:] + b'\r\n'
+            resp += b'0\r\nX-Checksum: 1234\r\n\r\n'
+            sock.sendall(resp)
+
+            sock.close()
+
+        self._start_server(socket_handler)
+        c = self.get_connection()
+        c.network_buffer_size = 1024
+        c.request('GET', '/')
+        send_event.set()
+        r = c.get_response()
+
+        assert r.status == 200
+        assert r.read(7000) == body[:7000]
+        assert r.read() == body[7000:]
+        assert r.trailers[b'x-checksum'] == [b'1234']
+
+        c.close()
+
     def test_connection_context_manager(self):
         self.set_up()
 
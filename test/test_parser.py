@@ -7,7 +7,10 @@ Unit tests for hyper's HTTP/1.1 parser.
 """
 import pytest
 
-from hyper.http11.parser import Parser, ParseError
+from hyper.http11.parser import (
+    Parser, ParseError, available_backends, get_backend, register_backend,
+    DEFAULT_BACKENDS, _backends
+)
 
 
 class TestHTTP11Parser(object):
@@ -83,3 +86,286 @@ class TestHTTP11Parser(object):
 
         with pytest.raises(ParseError):
             c.parse_response(m)
+
+    def test_lazy_parsing(self):
+        data = (
+            b"HTTP/1.1 200 OK\r\n"
+            b"Server: h2o\r\n"
+            b"content-length: 2\r\n"
+            b"Vary: accept-encoding\r\n"
+            b"\r\n"
+            b"hi"
+        )
+        m = memoryview(data)
+
+        c = Parser()
+        eager = c.parse_response(m)
+        r = c.parse_response(m, lazy=True)
+
+        assert r.status == 200
+        assert r.msg.tobytes() == b'OK'
+        assert r.minor_version == 1
+        assert r.consumed == eager.consumed == len(data) - 2
+
+        assert r.headers[b'content-length'] == [b'2']
+        assert list(r.headers.iter_raw()) == [
+            (n.tobytes(), v.tobytes()) for n, v in eager.headers
+        ]
+
+    def test_lazy_parsing_short_response(self):
+        data = (
+            b"HTTP/1.1 200 OK\r\n"
+            b"Server: h2o\r\n"
+        )
+        m = memoryview(data)
+
+        c = Parser()
+        r = c.parse_response(m, lazy=True)
+
+        assert r is None
+
+    def test_lazy_parsing_invalid_version(self):
+        data = (
+            b"SQP/1 200 OK\r\n"
+            b"Server: h2o\r\n"
+            b"content-length: 2\r\n"
+            b"\r\n"
+            b"hi"
+        )
+        m = memoryview(data)
+
+        c = Parser()
+        with pytest.raises(ParseError):
+            c.parse_response(m, lazy=True)
+
+    @pytest.mark.parametrize('lazy', [False, True])
+    def test_parsing_resumes_where_it_stopped(self, lazy):
+        data = (
+            b"HTTP/1.1 200 OK\r\n"
+            b"Server: h2o\r\n"
+            b"content-length: 2\r\n"
+            b"Vary: accept-encoding\r\n"
+            b"\r\n"
+            b"hi"
+        )
+        c = Parser()
+
+        # Feed the response in a byte at a time, as it might arrive.
+        for i in range(1, len(data) - 2):
+            assert c.parse_response(memoryview(data[:i]), lazy=lazy) is None
+
+        r = c.parse_response(memoryview(data), lazy=lazy)
+
+        assert r.status == 200
+        assert r.msg.tobytes() == b'OK'
+        assert r.consumed == len(data) - 2
+
+        if lazy:
+            headers = list(r.headers.iter_raw())
+        else:
+            headers = [(n.tobytes(), v.tobytes()) for n, v in r.headers]
+
+        assert headers == [
+            (b'Server', b'h2o'),
+            (b'content-length', b'2'),
+            (b'Vary', b'accept-encoding'),
+        ]
+
+    def test_parsing_does_not_reparse_complete_lines(self):
+        c = Parser()
+        data = b"HTTP/1.1 200 OK\r\nServer: h2o\r\ncontent-le"
+
+        assert c.parse_response(memoryview(data)) is None
+        assert c._offset == len(b"HTTP/1.1 200 OK\r\nServer: h2o\r\n")
+        assert len(c._headers) == 1
+
+        data += b"ngth: 0\r\n\r\n"
+        r = c.parse_response(memoryview(data))
+
+        assert len(r.headers) == 2
+        assert r.consumed == len(data)
+
+    @pytest.mark.parametrize('lazy', [False, True])
+    def test_parser_is_reset_after_a_response(self, lazy):
+        data = b"HTTP/1.1 200 OK\r\nServer: h2o\r\n\r\n"
+        c = Parser()
+
+        assert c.parse_response(memoryview(data[:20]), lazy=lazy) is None
+        assert c.parse_response(memoryview(data), lazy=lazy).status == 200
+
+        data = b"HTTP/1.1 404 Not Found\r\n\r\n"
+        r = c.parse_response(memoryview(data), lazy=lazy)
+
+        assert r.status == 404
+        assert r.consumed == len(data)
+
+    def test_reset_discards_partial_response(self):
+        c = Parser()
+
+        data = b"HTTP/1.1 200 OK\r\nA: b\r\n"
+        assert c.parse_response(memoryview(data)) is None
+        c.reset()
+
+        data = b"HTTP/1.1 204 No Content\r\n\r\n"
+        r = c.parse_response(memoryview(data))
+
+        assert r.status == 204
+        assert r.headers == []
+
+    @pytest.mark.parametrize('lazy', [False, True])
+    def test_too_many_headers(self, lazy):
+        data = (
+            b"HTTP/1.1 200 OK\r\n" +
+            b"X-Header: value\r\n" * 11 +
+            b"\r\n"
+        )
+
+        assert Parser(max_headers=11).parse_response(
+            memoryview(data), lazy=lazy
+        )
+
+        with pytest.raises(ParseError):
+            Parser(max_headers=10).parse_response(memoryview(data), lazy=lazy)
+
+    @pytest.mark.parametrize('lazy', [False, True])
+    def test_head_too_large(self, lazy):
+        data = b"HTTP/1.1 200 OK\r\nX-Header: value\r\n\r\nbody"
+        head_size = len(data) - 4
+
+        r = Parser(max_head_size=head_size).parse_response(
+            memoryview(data), lazy=lazy
+        )
+        assert r.consumed == head_size
+
+        with pytest.raises(ParseError):
+            Parser(max_head_size=head_size - 1).parse_response(
+                memoryview(data), lazy=lazy
+            )
+
+    @pytest.mark.parametrize('lazy', [False, True])
+    def test_incomplete_head_too_large(self, lazy):
+        c = Parser(max_head_size=100)
+        data = b"HTTP/1.1 200 OK\r\nX-Header: " + b"a" * 100
+
+        with pytest.raises(ParseError):
+            c.parse_response(memoryview(data), lazy=lazy)
+
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    return get_backend(request.param)[1]
+
+
+class TestParserBackends(object):
+    def test_basic_parsing(self, backend):
+        data = (
+            b"HTTP/1.1 200 OK\r\n"
+            b"Server: h2o\r\n"
+            b"content-length: 2\r\n"
+            b"Vary: accept-encoding\r\n"
+            b"\r\n"
+            b"hi"
+        )
+
+        r = backend().parse_response(memoryview(data))
+
+        assert r.status == 200
+        assert r.msg.tobytes() == b'OK'
+        assert r.minor_version == 1
+        assert r.consumed == len(data) - 2
+        assert [(n.tobytes(), v.tobytes()) for n, v in r.headers] == [
+            (b'Server', b'h2o'),
+            (b'content-length', b'2'),
+            (b'Vary', b'accept-encoding'),
+        ]
+
+    def test_short_response(self, backend):
+        data = b"HTTP/1.0 200 OK\r\nServer: h2o\r\n"
+
+        assert backend().parse_response(memoryview(data)) is None
+
+    def test_invalid_version(self, backend):
+        data = b"SQP/1 200 OK\r\nServer: h2o\r\n\r\n"
+
+        with pytest.raises(ParseError):
+            backend().parse_response(memoryview(data))
+
+    def test_lazy_parsing(self, backend):
+        data = b"HTTP/1.0 404 Not Found\r\nServer: h2o\r\n\r\nhi"
+
+        r = backend().parse_response(memoryview(data), lazy=True)
+
+        assert r.status == 404
+        assert r.msg.tobytes() == b'Not Found'
+        assert r.minor_version == 0
+        assert r.consumed == len(data) - 2
+        assert r.headers[b'server'] == [b'h2o']
+
+    def test_upgrade_response(self, backend):
+        data = (
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Upgrade: h2c\r\n"
+            b"\r\n"
+            b"\x00\x00\x00\x04"
+        )
+
+        r = backend().parse_response(memoryview(data))
+
+        assert r.status == 101
+        assert r.consumed == len(data) - 4
+        assert len(r.headers) == 2
+
+    def test_limits(self, backend):
+        data = b"HTTP/1.1 200 OK\r\n" + b"X-Header: value\r\n" * 3 + b"\r\n"
+
+        assert backend(max_headers=3).parse_response(memoryview(data))
+
+        with pytest.raises(ParseError):
+            backend(max_headers=2).parse_response(memoryview(data))
+
+        with pytest.raises(ParseError):
+            backend(max_head_size=len(data) - 1).parse_response(
+                memoryview(data)
+            )
+
+        with pytest.raises(ParseError):
+            backend(max_head_size=10).parse_response(memoryview(data[:20]))
+
+
+class TestBackendRegistry(object):
+    def test_python_backend_is_always_available(self):
+        assert 'python' in available_backends()
+        assert get_backend('python') == ('python', Parser)
+
+    def test_default_backend(self):
+        name, parser_class = get_backend()
+
+        assert name in DEFAULT_BACKENDS
+        assert name == [n for n in DEFAULT_BACKENDS
+                        if n in available_backends()][0]
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            get_backend('nonexistent')
+
+    def test_uninstalled_backend(self, monkeypatch):
+        def missing():
+            raise ImportError()
+
+        monkeypatch.setitem(_backends, 'missing', missing)
+
+        assert 'missing' not in available_backends()
+
+        with pytest.raises(ImportError):
+            get_backend('missing')
+
+    def test_register_backend(self, monkeypatch):
+        monkeypatch.setattr(
+            'hyper.http11.parser._backends', _backends.copy()
+        )
+
+        register_backend('custom', lambda: Parser)
+
+        assert get_backend('custom') == ('custom', Parser)
+        assert 'custom' in available_backends()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the HTTP/2 connection pools.
+"""
+from hyper.http20.connection import HTTP20Connection
+from hyper.http20.pool import HTTP20ConnectionPool, PoolManager
+
+
+class DummyConnection(object):
+    """
+    Stands in for an HTTP20Connection, with settable load.
+    """
+    def __init__(self, host, port=None, secure=None, **kwargs):
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.kwargs = kwargs
+        self.streams = {}
+        self.requests = []
+        self.open_streams = 0
+        self.max_streams = 100
+        self.send_window = 65535
+        self.closed = False
+        self._sock = None
+        self._reader_error = None
+
+    def connect(self):
+        self._sock = object()
+
+    def close(self):
+        self.closed = True
+        self._sock = None
+
+    def request(self, method, url, body=None, headers=None):
+        self.requests.append((method, url, body, headers))
+        return 1
+
+    def get_response(self, stream_id):
+        return (self, stream_id)
+
+    def _stream_usage(self):
+        return self.open_streams, self.max_streams
+
+    def _send_window(self):
+        return self.send_window
+
+
+class DummyPool(HTTP20ConnectionPool):
+    connection_class = DummyConnection
+
+
+class DummyPoolManager(PoolManager):
+    pool_class = DummyPool
+
+
+class TestHTTP20ConnectionPool(object):
+    def test_pool_opens_connected_connection(self):
+        p = DummyPool('www.google.com', 443, True, enable_push=True)
+        c = p.get_connection()
+
+        assert c._sock is not None
+        assert (c.host, c.port, c.secure) == ('www.google.com', 443, True)
+        assert c.kwargs == {'enable_push': True}
+
+    def test_pool_reuses_connections_that_arent_busy(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c.open_streams = 74
+
+        assert p.get_connection() is c
+
+    def test_pool_opens_connection_when_streams_run_low(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c.open_streams = 75
+
+        c2 = p.get_connection()
+        assert c2 is not c
+
+        # New requests go to whichever connection is least busy.
+        c.open_streams = 10
+        c2.open_streams = 20
+        assert p.get_connection() is c
+        c2.open_streams = 5
+        assert p.get_connection() is c2
+
+    def test_pool_opens_connection_when_send_window_is_full(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c.send_window = 0
+
+        assert p.get_connection() is not c
+
+    def test_pool_uses_least_busy_connection_at_limit(self):
+        p = DummyPool('www.google.com', max_connections=2)
+        c = p.get_connection()
+        c.open_streams = 100
+        c2 = p.get_connection()
+        c2.open_streams = 90
+
+        assert p.get_connection() is c2
+        assert len(p._connections) == 2
+
+    def test_pool_retires_closed_connections(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c._sock = None
+
+        assert p.get_connection() is not c
+        assert p._connections == [p.get_connection()]
+        assert not c.closed
+
+    def test_pool_retires_failed_connections(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c._reader_error = IOError()
+
+        assert p.get_connection() is not c
+
+    def test_pool_closes_idle_connections(self):
+        p = DummyPool('www.google.com', idle_timeout=0)
+        c = p.get_connection()
+        c.streams[1] = object()
+
+        # A connection with open streams isn't idle.
+        assert p.get_connection() is c
+
+        c.streams = {}
+        assert p.get_connection() is not c
+        assert c.closed
+
+    def test_pool_keeps_idle_connections_without_timeout(self):
+        p = DummyPool('www.google.com', idle_timeout=None)
+        c = p.get_connection()
+
+        assert p.get_connection() is c
+
+    def test_pool_measures_real_connections(self):
+        c = HTTP20Connection('www.google.com')
+        assert HTTP20ConnectionPool._load(c) < 0.01
+
+        c.putrequest('GET', '/')
+        open_streams, limit = c._stream_usage()
+        assert open_streams == 1
+
+    def test_pool_request(self):
+        p = DummyPool('www.google.com')
+        c, stream_id = p.request('GET', '/', None, {'a': 'b'})
+
+        assert c.requests == [('GET', '/', None, {'a': 'b'})]
+        assert stream_id == 1
+
+    def test_pool_close(self):
+        p = DummyPool('www.google.com')
+        c = p.get_connection()
+        c.open_streams = 100
+        c2 = p.get_connection()
+        p.close()
+
+        assert c.closed and c2.closed
+        assert p.get_connection() not in (c, c2)
+
+
+class TestPoolManager(object):
+    def test_manager_keeps_pool_per_origin(self):
+        m = DummyPoolManager(max_connections=2)
+        p = m.connection_pool('www.google.com')
+
+        assert p is m.connection_pool('www.google.com', 443, True)
+        assert p is m.connection_pool('www.google.com:443')
+        assert p is not m.connection_pool('www.google.com', 80)
+        assert p is not m.connection_pool('www.google.com', 443, False)
+        assert p.max_connections == 2
+
+    def test_manager_request(self):
+        m = DummyPoolManager()
+        c, _ = m.request('GET', 'http://www.google.com:8080/get?a=b#c')
+
+        assert (c.host, c.port, c.secure) == ('www.google.com', 8080, False)
+        assert c.requests == [('GET', '/get?a=b', None, None)]
+
+        c, _ = m.request('POST', 'https://www.google.com', b'hi')
+        assert (c.host, c.port, c.secure) == ('www.google.com', 443, True)
+        assert c.requests == [('POST', '/', b'hi', None)]
+
+    def test_manager_close(self):
+        m = DummyPoolManager()
+        c = m.connection_pool('www.google.com').get_connection()
+        m.close()
+
+        assert c.closed
+        assert m.connection_pool('www.google.com').get_connection() is not c
@@ -5,6 +5,10 @@ test/socket
 
 Test the BufferedSocket implementation in hyper.
 """
+import os
+import select
+import socket
+
 import pytest
 
 import hyper.common.bufsocket
@@ -12,10 +16,10 @@ from hyper.common.bufsocket import BufferedSocket
 from hyper.common.exceptions import ConnectionResetError, LineTooLongError
 
 
-# Patch the select method in bufsocket to make sure that it always returns
+# Patch the readiness check in bufsocket to make sure that it always reports
 # the dummy socket as readable.
-def dummy_select(a, b, c, d):
-    return a
+def dummy_wait_for_read(sck, timeout):
+    return True
 
 
 class TestBufferedSocket(object):
@@ -24,7 +28,7 @@ class TestBufferedSocket(object):
     """
     def test_can_create_buffered_sockets(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -34,7 +38,7 @@ class TestBufferedSocket(object):
 
     def test_can_send_on_buffered_socket(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -45,7 +49,7 @@ class TestBufferedSocket(object):
 
     def test_receive_single_packet(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -56,7 +60,7 @@ class TestBufferedSocket(object):
 
     def test_receive_multiple_packets_one_at_a_time(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -70,7 +74,7 @@ class TestBufferedSocket(object):
 
     def test_receive_small_packets(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -84,7 +88,7 @@ class TestBufferedSocket(object):
 
     def test_receive_multiple_packets_at_once(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -101,7 +105,7 @@ class TestBufferedSocket(object):
 
     def test_filling_the_buffer(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -118,7 +122,7 @@ class TestBufferedSocket(object):
 
     def test_oversized_read(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -127,9 +131,55 @@ class TestBufferedSocket(object):
         d = b.recv(1200).tobytes()
         assert d == b'a' * 600
 
+    def test_recv_into_copies_buffered_data_first(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=100)
+        b._buffer_view[0:10] = b'abcdefghij'
+        b._bytes_in_buffer += 10
+        s.inbound_packets.append(b'k' * 1000)
+
+        target = bytearray(500)
+        assert b.recv_into(target) == 10
+        assert target[:10] == b'abcdefghij'
+
+    def test_large_recv_into_bypasses_the_buffer(self):
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=100)
+        s.inbound_packets.append(b'a' * 300)
+
+        target = bytearray(500)
+        assert b.recv_into(target) == 300
+        assert target[:300] == b'a' * 300
+        assert not b._bytes_in_buffer
+
+    def test_small_recv_into_uses_the_buffer(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=100)
+        s.inbound_packets.append(b'abcdefghij')
+
+        target = bytearray(4)
+        assert b.recv_into(target) == 4
+        assert target == b'abcd'
+        assert b._bytes_in_buffer == 6
+
+    def test_recv_into_raises_connection_errors(self):
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=100)
+
+        with pytest.raises(ConnectionResetError):
+            b.recv_into(bytearray(500))
+
+        assert b.recv_into(bytearray()) == 0
+
     def test_readline_from_buffer(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -147,7 +197,7 @@ class TestBufferedSocket(object):
 
     def test_readline_from_socket(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -166,7 +216,7 @@ class TestBufferedSocket(object):
 
     def test_readline_both(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -190,7 +240,7 @@ class TestBufferedSocket(object):
 
     def test_socket_error_on_readline(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -200,7 +250,7 @@ class TestBufferedSocket(object):
 
     def test_socket_readline_too_long(self, monkeypatch):
         monkeypatch.setattr(
-            hyper.common.bufsocket.select, 'select', dummy_select
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
         )
         s = DummySocket()
         b = BufferedSocket(s)
@@ -211,6 +261,66 @@ class TestBufferedSocket(object):
         with pytest.raises(LineTooLongError):
             b.readline()
 
+    def test_socket_readline_grows_the_buffer(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10, max_buffer_size=40)
+        s.inbound_packets = [b'0' * 8, b'0' * 8, b'0' * 8, b'0\nrest']
+
+        line = b.readline().tobytes()
+
+        assert line == b'0' * 25 + b'\n'
+        assert b._buffer_size == 40
+        assert b.buffer.tobytes() == b'rest'
+
+    def test_socket_readline_too_long_for_the_maximum(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10, max_buffer_size=20)
+        s.inbound_packets = [b'0' * 8] * 4
+
+        with pytest.raises(LineTooLongError):
+            b.readline()
+
+        assert b._buffer_size == 20
+
+    def test_buffer_shrinks_once_consumed(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10, max_buffer_size=40)
+        s.inbound_packets = [b'0' * 15 + b'\nab', b'cd']
+
+        b.readline()
+        assert b._buffer_size == 20
+
+        # While data is buffered, the buffer stays large.
+        assert b.recv(1).tobytes() == b'a'
+        assert b._buffer_size == 20
+
+        assert b.recv(3).tobytes() == b'bcd'
+        s.inbound_packets = [b'efg']
+        assert b.recv(10).tobytes() == b'efg'
+        assert b._buffer_size == 10
+
+    def test_socket_fill_grows_full_buffer(self):
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10, max_buffer_size=20)
+        s.inbound_packets = [b'0' * 10, b'1' * 10, b'2']
+
+        b.fill()
+        b.fill()
+
+        assert b.buffer.tobytes() == b'0' * 10 + b'1' * 10
+
+        with pytest.raises(LineTooLongError):
+            b.fill()
+
     def test_socket_fill_basic(self):
         s = DummySocket()
         b = BufferedSocket(s)
@@ -239,6 +349,49 @@ class TestBufferedSocket(object):
         assert len(b.buffer) == 4
         assert b._index == 0
 
+    def test_compacting_reuses_the_backing_buffer(self):
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10)
+        backing_buffer = b._backing_buffer
+        s.inbound_packets = [b'abcdefgh', b'ijkl']
+
+        b.fill()
+        b.advance_buffer(6)
+        b.fill()
+
+        assert b.buffer.tobytes() == b'ghijkl'
+        assert b._index == 0
+        assert b._backing_buffer is backing_buffer
+
+    def test_fill_does_not_compact_with_enough_space(self):
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=10)
+        s.inbound_packets = [b'abc', b'de']
+
+        b.fill()
+        b.advance_buffer(2)
+        b.fill()
+
+        assert b._index == 2
+        assert b.buffer.tobytes() == b'cde'
+
+    def test_streaming_through_the_buffer(self, monkeypatch):
+        monkeypatch.setattr(
+            hyper.common.bufsocket, '_wait_for_read', dummy_wait_for_read
+        )
+        s = DummySocket()
+        b = BufferedSocket(s, buffer_size=16)
+        backing_buffer = b._backing_buffer
+        data = bytes(bytearray(range(256))) * 4
+        s.inbound_packets = [data[i:i+7] for i in range(0, len(data), 7)]
+
+        received = b''
+        while len(received) < len(data):
+            received += b.recv(5).tobytes()
+
+        assert received == data
+        assert b._backing_buffer is backing_buffer
+
     def test_socket_fill_raises_connection_errors(self):
         s = DummySocket()
         b = BufferedSocket(s)
@@ -259,6 +412,99 @@ class TestBufferedSocket(object):
 
         assert b.buffer.tobytes() == b'de'
 
+    def test_non_blocking_fill_with_no_data(self):
+        a, s = socket.socketpair()
+        try:
+            b = BufferedSocket(s)
+
+            assert b.fill(block=False) == 0
+            assert not b.can_read
+        finally:
+            a.close()
+            s.close()
+
+    def test_non_blocking_fill_reads_available_data(self):
+        a, s = socket.socketpair()
+        try:
+            b = BufferedSocket(s)
+            a.sendall(b'test data')
+
+            assert b.can_read
+            assert b.fill(block=False) == 9
+            assert b.buffer.tobytes() == b'test data'
+        finally:
+            a.close()
+            s.close()
+
+    def test_non_blocking_fill_with_timeout(self):
+        a, s = socket.socketpair()
+        s.settimeout(5)
+        try:
+            b = BufferedSocket(s)
+            assert b.fill(block=False) == 0
+
+            a.sendall(b'test data')
+            assert b.fill(block=False) == 9
+        finally:
+            a.close()
+            s.close()
+
+    def test_non_blocking_fill_raises_connection_errors(self):
+        a, s = socket.socketpair()
+        try:
+            b = BufferedSocket(s)
+            a.close()
+
+            with pytest.raises(ConnectionResetError):
+                b.fill(block=False)
+        finally:
+            s.close()
+
+    def test_readiness_ignoring_buffered_data(self):
+        a, s = socket.socketpair()
+        s.settimeout(5)
+        try:
+            b = BufferedSocket(s)
+            a.sendall(b'test data')
+            b.fill()
+
+            assert b.wait_readable(0)
+            assert not b.wait_readable(0, buffered=False)
+
+            a.sendall(b'more data')
+            assert b.wait_readable(1, buffered=False)
+        finally:
+            a.close()
+            s.close()
+
+    def test_readiness_with_large_file_descriptors(self):
+        resource = pytest.importorskip('resource')
+        high_fd = 4096
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft <= high_fd or not hasattr(select, 'poll'):
+            pytest.skip("can't allocate a file descriptor above 1024")
+
+        a, s = socket.socketpair()
+        os.dup2(s.fileno(), high_fd)
+        try:
+            b = BufferedSocket(HighFdSocket(high_fd))
+            assert not b.wait_readable(0)
+
+            a.sendall(b'test data')
+            assert b.wait_readable(1)
+        finally:
+            os.close(high_fd)
+            a.close()
+            s.close()
+
+
+class HighFdSocket(object):
+    def __init__(self, fd):
+        self.fd = fd
+
+    def fileno(self):
+        return self.fd
+
 
 class DummySocket(object):
     def __init__(self):
@@ -266,11 +512,18 @@ class DummySocket(object):
         self.outbound_packets = []
         self.read_count = 1
 
+    def gettimeout(self):
+        return 1.0
+
     def recv_into(self, buffer):
         index = 0
         try:
             for _ in range(self.read_count):
                 pkt = self.inbound_packets.pop(0)
+                space = len(buffer) - index
+                if len(pkt) > space:
+                    self.inbound_packets.insert(0, pkt[space:])
+                    pkt = pkt[:space]
                 buffer[index:index+len(pkt)] = pkt
                 index += len(pkt)
         except IndexError:
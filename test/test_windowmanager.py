@@ -2,7 +2,10 @@
 """
 Tests the hyper window manager.
 """
-from hyper.http20.window import BaseFlowControlManager, FlowControlManager
+from hyper.http20.window import (
+    BaseFlowControlManager, FlowControlManager, BDPFlowControlManager,
+    DocumentSizeFlowControlManager
+)
 import pytest
 
 
@@ -46,6 +49,12 @@ class TestBaseFCM(object):
         with pytest.raises(NotImplementedError):
             b.blocked()
 
+    def test_base_manager_never_probes(self):
+        b = BaseFlowControlManager(10, 10)
+        assert not b.wants_probe()
+        b.probe_started()
+        b.probe_finished(0.1)
+
     def test_base_manager_blocked_private_interface_doesnt_function(self):
         b = BaseFlowControlManager(10, 10)
         with pytest.raises(NotImplementedError):
@@ -86,3 +95,132 @@ class TestFCM(object):
 
         assert b._blocked() == 500
         assert b.window_size == 1500
+
+
+class TestBDPFCM(object):
+    """
+    Tests the bandwidth-delay product estimating flow control manager.
+    """
+    def test_bdp_probes_first_frame_and_then_periodically(self):
+        b = BDPFlowControlManager(65535)
+        assert b.wants_probe()
+
+        b.probe_started()
+        b._handle_frame(1000)
+        b.probe_finished(0.1)
+        for _ in range(b.probe_interval - 2):
+            b._handle_frame(10)
+        assert not b.wants_probe()
+
+        b._handle_frame(10)
+        assert b.wants_probe()
+
+    def test_bdp_grows_window_when_sender_is_window_limited(self):
+        b = BDPFlowControlManager(65535)
+
+        # The sender used the whole window in one round trip.
+        b.probe_started()
+        assert b._handle_frame(16384) == 0
+        assert b._handle_frame(16384) == 0
+        assert b._handle_frame(16384) == 49152
+        b.probe_finished(0.05)
+
+        assert b.target_window_size == 98304
+        assert b.bandwidth == 49152 / 0.05
+
+        # The window is refilled to the new target on the next frame.
+        assert b._handle_frame(16384) == 98304 - (65535 - 16384)
+        assert b.window_size == 98304
+
+    def test_bdp_window_growth_is_capped(self):
+        b = BDPFlowControlManager(65535)
+        b.max_window_size = 100000
+
+        b.probe_started()
+        b._handle_frame(60000)
+        b.probe_finished(0.05)
+
+        assert b.target_window_size == 100000
+
+    def test_bdp_doesnt_grow_window_when_bandwidth_falls(self):
+        b = BDPFlowControlManager(65535)
+        b.bandwidth = 10000000
+
+        b.probe_started()
+        b._handle_frame(60000)
+        b.probe_finished(0.05)
+
+        assert b.target_window_size == 65535
+
+    def test_bdp_shrinks_window_when_little_data_arrives(self):
+        b = BDPFlowControlManager(65535)
+        b.target_window_size = 1048576
+
+        b.probe_started()
+        b._handle_frame(1000)
+        b.probe_finished(0.05)
+        assert b.target_window_size == 524288
+
+        for _ in range(10):
+            b.probe_started()
+            b._handle_frame(1000)
+            b.probe_finished(0.05)
+        assert b.target_window_size == 65535
+
+    def test_bdp_ignores_probes_without_data(self):
+        b = BDPFlowControlManager(65535)
+        b.probe_started()
+        b.probe_finished(0.05)
+
+        assert b.target_window_size == 65535
+        assert b.bandwidth == 0
+
+
+class TestDocumentSizeFCM(object):
+    """
+    Tests the flow control manager that opens the window to fit the document.
+    """
+    def test_dsfcm_opens_window_to_fit_document(self):
+        b = DocumentSizeFlowControlManager(65535)
+        b.document_size = 1000000
+
+        assert b._handle_frame(0) == 1000000 - 65535
+        assert b.window_size == 1000000
+
+        # No more updates are needed to receive the rest.
+        for _ in range(61):
+            assert b._handle_frame(16384) == 0
+        assert b._handle_frame(1000000 - 61 * 16384) == 0
+        assert b.window_size == 0
+
+    def test_dsfcm_doesnt_open_window_for_small_documents(self):
+        b = DocumentSizeFlowControlManager(65535)
+        b.document_size = 65535
+
+        assert b._handle_frame(0) == 0
+        assert b._handle_frame(65535) == 0
+
+    def test_dsfcm_opening_is_capped(self):
+        b = DocumentSizeFlowControlManager(65535)
+        b.max_window_size = 100000
+        b.document_size = 1000000
+
+        assert b._handle_frame(0) == 100000 - 65535
+
+        # The window is refilled to the cap when it gets below a quarter.
+        assert b._handle_frame(70000) == 0
+        assert b._handle_frame(10000) == 100000 - 20000
+
+    def test_dsfcm_acts_like_fcm_without_document_size(self):
+        b = DocumentSizeFlowControlManager(65535)
+        b.document_size = 0
+
+        assert b._handle_frame(0) == 0
+        assert b._handle_frame(60000) == 60000
+
+    def test_dsfcm_acts_like_fcm_past_document_size(self):
+        b = DocumentSizeFlowControlManager(65535)
+        b.document_size = 10
+
+        assert b._handle_frame(10) == 0
+        assert b._handle_frame(60000) == 60010